@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from api import signals  # noqa: F401
+        # Map the shared ring, metrics and presence array before gunicorn
+        # forks the preloaded workers
+        from api import instrumentation, presence, recent_messages  # noqa: F401
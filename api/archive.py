@@ -0,0 +1,343 @@
+"""
+Retention of old messages in compressed archive segments.
+
+MessageArchiver moves messages older than the retention period out of the
+messages table into append-only segment files: gzip compressed NDJSON in the
+export format, one message per line, oldest first. A segment is written
+once and never changed; its id and time range are recorded in the
+ArchiveSegment index table before its rows are deleted, and readers skip
+the table rows of indexed ids, so every reader finds each message in
+exactly one of the two places.
+
+Messages are archived as a prefix of the id sequence, so every archived id
+is lower than every id in the table. The newest RECENT_MESSAGES['SIZE'] ids
+are always kept, which leaves the shared ring of recent messages and the
+feed ETag untouched by archiving.
+
+MessageArchive reads segments back for the history API: older feed pages,
+?after_id= deltas reaching into the archive and the export merge archived
+rows with the table rows. Parsed segments are kept in a per-process LRU
+cache. The index is reloaded when the archive directory's mtime changes,
+which the archiver bumps after indexing a segment, before deleting its rows.
+
+Archived messages leave the full-text search index with their rows, and
+stay archived when their member is deleted.
+"""
+
+import gzip
+import heapq
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import CharField, Max, Min
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from api.cache import LRUCache
+from api.models import ArchiveSegment, Message
+from api.rendering import (
+    ROW_CREATED_AT, ROW_ID, json_bytes, message_dicts, message_rows,
+    stored_created_at
+)
+
+logger = logging.getLogger(__name__)
+
+Segment = namedtuple(
+    'Segment', 'filename first_id last_id min_created_at max_created_at'
+)
+
+
+def row_key(row):
+    """Feed order of a message_rows() tuple: (created_at, id)"""
+    return row[ROW_CREATED_AT], row[ROW_ID]
+
+
+class MessageArchive:
+    """Read access to the archived messages, see the module docstring"""
+
+    def __init__(self, path, cache_size=16):
+        self.path = path
+        # Segments never change, so cached rows never expire
+        self._cache = LRUCache(cache_size, float('inf'))
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._segments = []
+
+    @property
+    def segments(self):
+        """Index of the segments, oldest first"""
+        self.refresh()
+        return self._segments
+
+    @property
+    def last_id(self):
+        """Newest archived id, 0 when nothing is archived"""
+        segments = self.segments
+        return segments[-1].last_id if segments else 0
+
+    def refresh(self):
+        """Reload the index if a segment was archived since the last load"""
+        mtime = self._stat()
+        if mtime != self._mtime:
+            self._load(mtime)
+
+    async def arefresh(self):
+        """Async version of refresh()"""
+        mtime = self._stat()
+        if mtime != self._mtime:
+            await sync_to_async(self._load)(mtime)
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self, mtime):
+        with self._lock:
+            if mtime is None:
+                segments = []
+            else:
+                segments = [
+                    Segment(*values) for values in
+                    ArchiveSegment.objects.order_by('first_id').annotate(
+                        min_text=Cast('min_created_at', CharField()),
+                        max_text=Cast('max_created_at', CharField()),
+                    ).values_list(
+                        'filename', 'first_id', 'last_id',
+                        'min_text', 'max_text'
+                    )
+                ]
+            self._segments = segments
+            self._mtime = mtime
+
+    def rows(self, segment):
+        """
+        All message_rows() tuples of a segment, as (by_id, by_key, keys):
+        the rows in id order, the rows in feed order and their row_key()s.
+        """
+        rows = self._cache.get(segment.filename)
+        if rows is None:
+            by_id = list(self.read_segment(segment.filename))
+            by_key = sorted(by_id, key=row_key)
+            rows = (by_id, by_key, [row_key(row) for row in by_key])
+            self._cache.set(segment.filename, rows)
+        return rows
+
+    def read_segment(self, filename):
+        with gzip.open(os.path.join(self.path, filename), 'rb') as stream:
+            for line in stream:
+                message = json.loads(line)
+                yield (
+                    message['id'], message['text'], message['author'],
+                    stored_created_at(message['created_at'])
+                )
+
+    def iter_rows(self):
+        """Yield every archived row in id order without caching them"""
+        for segment in self.segments:
+            yield from self.read_segment(segment.filename)
+
+    def merge_older(self, page, before, count):
+        """
+        Complete a newest-first page of table rows with archived rows.
+        `before` is the (created_at text, id) key the page started from, or
+        None, and `count` the number of rows wanted. Returns up to `count`
+        rows in feed order, newest first.
+        """
+        segments = self.segments
+        if not segments:
+            return page
+
+        # Rows of the newest segment can still be in the table
+        last_id = segments[-1].last_id
+        page = [row for row in page if row[ROW_ID] > last_id]
+        newest = max(
+            (segment.max_created_at, segment.last_id) for segment in segments
+        )
+        if len(page) >= count and row_key(page[-1]) > newest:
+            # Everything archived sorts after the oldest row of the page
+            return page
+
+        candidates = []
+        for segment in sorted(
+            segments, key=lambda segment: segment.max_created_at, reverse=True
+        ):
+            if before is not None and (
+                (segment.min_created_at, segment.first_id) >= before
+            ):
+                continue
+            if len(candidates) >= count and (
+                (segment.max_created_at, segment.last_id)
+                < row_key(candidates[-1])
+            ):
+                break
+            _, by_key, keys = self.rows(segment)
+            end = len(keys) if before is None else bisect_left(keys, before)
+            candidates = heapq.nlargest(
+                count, candidates + by_key[max(end - count, 0):end],
+                key=row_key
+            )
+
+        return heapq.nlargest(count, page + candidates, key=row_key)
+
+    async def amerge_older(self, page, before, count):
+        """Async version of merge_older(), reading segments in a thread"""
+        await self.arefresh()
+        if not self._segments:
+            return page
+        return await sync_to_async(self.merge_older)(page, before, count)
+
+    def merge_newer(self, rows, after_id, limit):
+        """
+        Put the archived rows with an id above after_id in front of the
+        ascending table rows of a ?after_id= delta.
+        """
+        last_id = self.last_id
+        if after_id >= last_id:
+            return rows
+
+        # Rows of the newest segment can still be in the table
+        rows = [row for row in rows if row[ROW_ID] > last_id]
+        archived = []
+        for segment in self.segments:
+            if segment.last_id <= after_id:
+                continue
+            by_id, _, _ = self.rows(segment)
+            archived.extend(row for row in by_id if row[ROW_ID] > after_id)
+            if len(archived) >= limit:
+                break
+        return (archived + list(rows))[:limit]
+
+    async def amerge_newer(self, rows, after_id, limit):
+        """Async version of merge_newer()"""
+        await self.arefresh()
+        if not self._segments or after_id >= self._segments[-1].last_id:
+            return rows
+        return await sync_to_async(self.merge_newer)(rows, after_id, limit)
+
+
+class MessageArchiver:
+    """
+    Moves messages older than `retention` into segments of up to
+    `segment_size` messages, see the module docstring.
+    """
+
+    def __init__(self, archive, retention, segment_size=10000,
+                 keep_latest=1024):
+        self.archive = archive
+        self.retention = retention
+        self.segment_size = segment_size
+        self.keep_latest = keep_latest
+
+    def archive_boundary(self, now=None):
+        """
+        Highest id that may be archived: the end of the longest run of ids
+        older than the retention period, short of the newest keep_latest.
+        """
+        cutoff = (now or timezone.now()) - self.retention
+        newest = Message.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        boundary = newest - self.keep_latest
+
+        first_recent = Message.objects.filter(
+            created_at__gte=cutoff
+        ).aggregate(first_id=Min('id'))['first_id']
+        if first_recent is not None:
+            boundary = min(boundary, first_recent - 1)
+        return boundary
+
+    def run(self, now=None):
+        """Archive everything up to the boundary, returns the message count"""
+        boundary = self.archive_boundary(now)
+        archived = 0
+        start = self.archive.last_id
+        # Left behind by a run that stopped between indexing and deleting
+        self.delete_archived(0, start)
+
+        while start < boundary:
+            rows = list(
+                message_rows(
+                    Message.objects.filter(id__gt=start, id__lte=boundary)
+                ).order_by('id')[:self.segment_size]
+            )
+            if not rows:
+                break
+            self.write_segment(start, rows)
+            archived += len(rows)
+            start = rows[-1][ROW_ID]
+        return archived
+
+    def write_segment(self, start, rows):
+        """
+        Write the rows to a new segment file, index it, tell the readers and
+        only then delete the rows from the table. A crash before the index
+        is committed leaves an unindexed file, which the next run
+        overwrites; a crash after it leaves rows that readers skip and the
+        next run deletes.
+        """
+        os.makedirs(self.archive.path, exist_ok=True)
+        first_id, last_id = rows[0][ROW_ID], rows[-1][ROW_ID]
+        filename = f'messages-{first_id:012d}-{last_id:012d}.ndjson.gz'
+        path = os.path.join(self.archive.path, filename)
+
+        body = b''.join(
+            json_bytes(message) + b'\n' for message in message_dicts(rows)
+        )
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as stream:
+            with gzip.GzipFile(
+                fileobj=stream, mode='wb', compresslevel=6, mtime=0
+            ) as gz:
+                gz.write(body)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(temporary, path)
+
+        created_at = sorted(row[ROW_CREATED_AT] for row in rows)
+        ArchiveSegment.objects.create(
+            filename=filename,
+            first_id=first_id,
+            last_id=last_id,
+            min_created_at=self.parse(created_at[0]),
+            max_created_at=self.parse(created_at[-1]),
+            count=len(rows),
+            size=os.path.getsize(path),
+        )
+        # Readers of every process reload the index, and from then on skip
+        # the table rows it covers
+        os.utime(self.archive.path)
+        self.delete_archived(start, last_id)
+        logger.info('Archived %d messages into %s', len(rows), filename)
+
+    def delete_archived(self, start, last_id):
+        """Delete the table rows with start < id <= last_id"""
+        # Archived ids are older than the ring, whose post_delete handler
+        # would otherwise load every row to evict it
+        Message.objects.filter(
+            id__gt=start, id__lte=last_id
+        )._raw_delete(Message.objects.db)
+
+    def parse(self, value):
+        """Turn stored created_at text back into an aware datetime"""
+        return datetime.fromisoformat(value).replace(tzinfo=dt_timezone.utc)
+
+
+config = settings.MESSAGE_ARCHIVE
+message_archive = MessageArchive(config['PATH'], config['CACHE_SIZE'])
+
+
+def get_archiver():
+    """Archiver configured from settings.MESSAGE_ARCHIVE"""
+    return MessageArchiver(
+        message_archive,
+        retention=timedelta(days=config['RETENTION_DAYS']),
+        segment_size=config['SEGMENT_SIZE'],
+        keep_latest=settings.RECENT_MESSAGES['SIZE'],
+    )
@@ -0,0 +1,42 @@
+from django.urls import path
+from api.views import (
+    RegisterView,
+    LoginView,
+    MessageReadView,
+    RoomListView,
+    RoomLeaveView,
+    RoomReadView,
+    MetricsView
+)
+from api.async_views import (
+    AsyncProfileView,
+    AsyncOnlineMembersView,
+    AsyncMessageListCreateView,
+    AsyncMessageWaitView,
+    AsyncMessageExportView,
+    AsyncMessageSearchView,
+    AsyncUnreadCountView,
+    AsyncRoomMessageListCreateView
+)
+
+# Used instead of api.urls when the project is served through config/asgi.py:
+# the polled endpoints run natively on the event loop, registration and login
+# stay on the DRF views, like room membership, acknowledgements and the
+# metrics endpoint.
+urlpatterns = [
+    path('register/', RegisterView.as_view(), name='register'),
+    path('login/', LoginView.as_view(), name='login'),
+    path('profile/', AsyncProfileView.as_view(), name='profile'),
+    path('members/online/', AsyncOnlineMembersView.as_view(), name='members-online'),
+    path('messages/', AsyncMessageListCreateView.as_view(), name='messages'),
+    path('messages/wait/', AsyncMessageWaitView.as_view(), name='messages-wait'),
+    path('messages/export/', AsyncMessageExportView.as_view(), name='messages-export'),
+    path('messages/search/', AsyncMessageSearchView.as_view(), name='messages-search'),
+    path('messages/unread/', AsyncUnreadCountView.as_view(), name='messages-unread'),
+    path('messages/read/', MessageReadView.as_view(), name='messages-read'),
+    path('rooms/', RoomListView.as_view(), name='rooms'),
+    path('rooms/<int:room_id>/leave/', RoomLeaveView.as_view(), name='rooms-leave'),
+    path('rooms/<int:room_id>/read/', RoomReadView.as_view(), name='rooms-read'),
+    path('rooms/<int:room_id>/messages/', AsyncRoomMessageListCreateView.as_view(), name='rooms-messages'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+]
@@ -0,0 +1,405 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+from django.http import (
+    HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+)
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import classonlymethod
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+from api.models import Message, Room, RoomMessage
+from api.serializers import MessageCreateSerializer
+from api.authentication import TokenAuthentication
+from api.compression import set_snapshot_key
+from api.export import MessageExport
+from api.feeds import (
+    FeedViewMixin, MessageWaitMixin, create_message, created_message_data,
+    fetched_position, room_access_error,
+)
+from api.notifications import message_notifier
+from api.pagination import MessageKeysetPagination, RoomMessagePagination
+from api.presence import aonline_members
+from api.read_cursors import aunread_counts, read_positions
+from api.recent_messages import recent_messages
+from api.rooms import RoomAccessDenied, RoomFeed
+from api.search import MessageSearch
+from api.rendering import (
+    ROW_ID, json_bytes, json_response, message_dicts, message_rows,
+    raw_json_response
+)
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of DRF's APIView for the hot endpoints.
+    DRF views are sync only, so under ASGI they would run in a thread pool;
+    these views authenticate with the async ORM and stay on the event loop.
+    Errors use the same JSON bodies as the DRF views.
+    """
+    authentication_class = TokenAuthentication
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        authenticator = self.authentication_class()
+        try:
+            result = await authenticator.aauthenticate(request)
+        except AuthenticationFailed as exc:
+            return self.unauthorized(authenticator, exc.detail)
+
+        if result is None:
+            return self.unauthorized(
+                authenticator, 'Authentication credentials were not provided.'
+            )
+
+        request.user, request.auth = result
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except ParseError as exc:
+            return JsonResponse(
+                {'detail': exc.detail}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+    def read_json(self, request):
+        """Decode the JSON body, raising ParseError like DRF's JSONParser"""
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+    def unauthorized(self, authenticator, detail):
+        response = JsonResponse(
+            {'detail': detail}, status=status.HTTP_401_UNAUTHORIZED
+        )
+        response['WWW-Authenticate'] = authenticator.authenticate_header(None)
+        return response
+
+
+class AsyncProfileView(AsyncAPIView):
+    """
+    Async version of ProfileView.
+    GET /api/profile/
+    Requires authentication.
+    """
+
+    async def get(self, request):
+        member = request.user
+        user_data = {
+            'id': member.id,
+            'username': member.username
+        }
+        return json_response(user_data, status=status.HTTP_200_OK)
+
+
+class AsyncOnlineMembersView(AsyncAPIView):
+    """
+    Async version of OnlineMembersView.
+    GET /api/members/online/
+    Requires authentication.
+    """
+
+    async def get(self, request):
+        try:
+            limit = MessageKeysetPagination().get_limit(request)
+        except ValueError:
+            return JsonResponse(
+                {'error': 'Invalid limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return json_response(await aonline_members(limit))
+
+
+class AsyncMessageListCreateView(FeedViewMixin, AsyncAPIView):
+    """
+    Async version of MessageListCreateView with the same query parameters,
+    ETag handling and response format.
+    GET /api/messages/
+    POST /api/messages/
+    Both require authentication.
+    """
+
+    async def get(self, request):
+        if settings.RECENT_MESSAGES['ENABLED']:
+            response = await self.get_recent(request)
+            if response is not None:
+                return response
+
+        result = await Message.objects.aaggregate(last_id=Max('id'))
+        last_id = result['last_id'] or 0
+        etag = self.feed_etag(last_id)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self.add_feed_cache_headers(HttpResponseNotModified(), etag)
+
+        pagination = MessageKeysetPagination()
+        rows = message_rows(Message.objects.all())
+
+        try:
+            limit, after_id = self.get_feed_params(request)
+            if after_id is None:
+                rows, next_cursor = await pagination.apaginate_queryset(
+                    rows, request
+                )
+            else:
+                rows = await pagination.aget_delta(after_id, limit)
+        except ValueError:
+            return JsonResponse(
+                {'error': 'Invalid pagination parameters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if after_id is not None:
+            await read_positions.amark_read(
+                request.user.id, fetched_position(after_id, last_id)
+            )
+        elif rows and not request.GET.get('before'):
+            await read_positions.amark_read(
+                request.user.id, max(row[ROW_ID] for row in rows)
+            )
+
+        messages_data = message_dicts(rows)
+
+        if after_id is not None:
+            response = json_response(messages_data)
+        else:
+            response = json_response({
+                'results': messages_data,
+                'next_cursor': next_cursor
+            })
+        return self.add_feed_cache_headers(response, etag)
+
+    async def get_recent(self, request):
+        """Async version of MessageListCreateView.get_recent()"""
+        if request.GET.get('before'):
+            return None
+
+        try:
+            limit, after_id = self.get_feed_params(request)
+        except ValueError:
+            return None
+
+        if after_id is None:
+            result = await recent_messages.apage(limit)
+        else:
+            result = await recent_messages.adelta(after_id, limit)
+        if result is None:
+            return None
+
+        last_id, body = result
+        await read_positions.amark_read(
+            request.user.id, fetched_position(after_id, last_id)
+        )
+        etag = self.feed_etag(last_id)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self.add_feed_cache_headers(HttpResponseNotModified(), etag)
+        return self.add_feed_cache_headers(raw_json_response(body), etag)
+
+    async def post(self, request):
+        serializer = MessageCreateSerializer(data=self.read_json(request))
+        if serializer.is_valid():
+            # The insert and the ring's process-shared lock block, so they
+            # stay off the event loop. Concurrent requests form a write
+            # batch only if each of them waits in its own thread.
+            create = sync_to_async(
+                create_message,
+                thread_sensitive=not settings.MESSAGE_WRITE_BATCHING['ENABLED']
+            )
+            response_data = await create(
+                request.user, serializer.validated_data['text']
+            )
+            return JsonResponse(response_data, status=status.HTTP_201_CREATED)
+
+        return JsonResponse(
+            {'error': 'Message text is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+class AsyncMessageWaitView(MessageWaitMixin, AsyncAPIView):
+    """
+    Async version of MessageWaitView. Waiting clients only hold a coroutine,
+    so one ASGI process can keep thousands of them parked.
+    GET /api/messages/wait/?after_id=<id>&timeout=<seconds>
+    Requires authentication.
+    """
+
+    async def get(self, request):
+        try:
+            after_id, timeout, limit = self.get_wait_params(request)
+        except ValueError:
+            return JsonResponse(
+                {'error': 'Invalid after_id or timeout'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        has_new = await message_notifier.await_message(after_id, timeout)
+        await read_positions.amark_read(
+            request.user.id,
+            fetched_position(after_id, message_notifier.last_id)
+        )
+        if not has_new:
+            return json_response([])
+
+        if settings.RECENT_MESSAGES['ENABLED']:
+            result = await recent_messages.adelta(after_id, limit)
+            if result is not None:
+                return set_snapshot_key(
+                    raw_json_response(result[1]),
+                    'messages-delta', result[0], after_id, limit
+                )
+
+        rows = await MessageKeysetPagination().aget_delta(after_id, limit)
+
+        return json_response(message_dicts(rows))
+
+
+class AsyncMessageExportView(AsyncAPIView):
+    """
+    Async version of MessageExportView, streaming from the async ORM.
+    GET /api/messages/export/?output=ndjson|json
+    Requires authentication.
+    """
+
+    async def get(self, request):
+        try:
+            export = MessageExport(request.GET.get('output', 'ndjson'))
+        except ValueError:
+            return JsonResponse(
+                {'error': 'output must be ndjson or json'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            export.aiter_bytes(), content_type=export.content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{export.filename}"'
+        )
+        return response
+
+
+class AsyncMessageSearchView(AsyncAPIView):
+    """
+    Async version of MessageSearchView.
+    GET /api/messages/search/?q=<words>&cursor=<cursor>&limit=<n>
+    Requires authentication.
+    """
+
+    async def get(self, request):
+        try:
+            search = MessageSearch(request.GET.get('q'))
+        except ValueError:
+            return JsonResponse(
+                {'error': 'Search query is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = MessageKeysetPagination().get_limit(request)
+            rows, next_cursor = await search.asearch(
+                limit, request.GET.get('cursor')
+            )
+        except ValueError:
+            return JsonResponse(
+                {'error': 'Invalid pagination parameters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return json_response({
+            'results': search.result_dicts(rows),
+            'next_cursor': next_cursor
+        })
+
+
+class AsyncUnreadCountView(AsyncAPIView):
+    """
+    Async version of UnreadCountView.
+    GET /api/messages/unread/
+    Requires authentication.
+    """
+
+    async def get(self, request):
+        return json_response(await aunread_counts(request.user))
+
+
+class AsyncRoomMessageListCreateView(FeedViewMixin, AsyncAPIView):
+    """
+    Async version of RoomMessageListCreateView.
+    GET /api/rooms/<room_id>/messages/
+    POST /api/rooms/<room_id>/messages/
+    Both require authentication and membership of the room.
+    """
+
+    async def get(self, request, room_id):
+        feed = RoomFeed(room_id, request.user)
+        try:
+            last_id = await feed.aget_last_message_id()
+        except (Room.DoesNotExist, RoomAccessDenied) as exc:
+            return room_access_error(exc, JsonResponse)
+
+        etag = feed.etag(last_id)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self.add_feed_cache_headers(HttpResponseNotModified(), etag)
+
+        pagination = RoomMessagePagination(room_id)
+
+        try:
+            limit, after_id = self.get_feed_params(request)
+            if after_id is not None:
+                rows = []
+                if after_id < last_id:
+                    rows = await pagination.aget_delta(after_id, limit)
+                await feed.amark_delta_read(rows, limit)
+                body = json_bytes(message_dicts(rows))
+            elif request.GET.get('before'):
+                body = await self.render_page(pagination, feed, request)
+            else:
+                await feed.amark_read()
+                body = feed.get_cached_page(last_id, limit)
+                if body is None:
+                    body = await self.render_page(pagination, feed, request)
+                    feed.cache_page(last_id, limit, body)
+        except ValueError:
+            return JsonResponse(
+                {'error': 'Invalid pagination parameters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return self.add_feed_cache_headers(raw_json_response(body), etag)
+
+    async def render_page(self, pagination, feed, request):
+        rows = message_rows(RoomMessage.objects.filter(room_id=feed.room_id))
+        rows, next_cursor = await pagination.apaginate_queryset(rows, request)
+        return json_bytes({
+            'results': message_dicts(rows),
+            'next_cursor': next_cursor
+        })
+
+    async def post(self, request, room_id):
+        feed = RoomFeed(room_id, request.user)
+        try:
+            await feed.aget_last_message_id()
+        except (Room.DoesNotExist, RoomAccessDenied) as exc:
+            return room_access_error(exc, JsonResponse)
+
+        serializer = MessageCreateSerializer(data=self.read_json(request))
+        if not serializer.is_valid():
+            return JsonResponse(
+                {'error': 'Message text is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        message = await feed.apost(serializer.validated_data['text'])
+        return JsonResponse(
+            created_message_data(message), status=status.HTTP_201_CREATED
+        )
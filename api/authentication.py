@@ -1,32 +1,62 @@
-import hashlib
+import copy
+import secrets
+from django.conf import settings
+from django.utils.module_loading import import_string
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from api.cache import LRUCache
+from api.instrumentation import timed
 from api.models import Member
+from api.presence import presence
+
+# Members resolved by TokenAuthentication, keyed by member id. Entries are
+# dropped by the Member post_save/post_delete handlers in api/signals.py;
+# changes made by other workers are picked up once TTL expires.
+member_cache = LRUCache(
+    settings.MEMBER_CACHE['SIZE'], settings.MEMBER_CACHE['TTL']
+)
 
 
 class TokenStorage:
-    """Simple in-memory storage for authentication tokens"""
-    _tokens = {}
+    """
+    Storage for authentication tokens.
+    Delegates to the backend configured in settings.TOKEN_STORAGE, which is
+    created on first use.
+    """
+    _backend = None
+
+    @classmethod
+    def get_backend(cls):
+        """Return the configured token backend"""
+        if cls._backend is None:
+            options = dict(settings.TOKEN_STORAGE)
+            backend_class = import_string(options.pop('BACKEND'))
+            cls._backend = backend_class(
+                **{name.lower(): value for name, value in options.items()}
+            )
+        return cls._backend
 
     @classmethod
     def create_token(cls, member):
-        """Generate a simple token based on username hash"""
-        token = hashlib.sha256(
-            f"{member.username}_{member.id}_{member.created_at}".encode()
-        ).hexdigest()
-        cls._tokens[token] = member.id
+        """Issue a new random token for the member"""
+        token = secrets.token_hex(32)
+        cls.get_backend().save_token(token, member.id)
         return token
 
     @classmethod
     def get_member_id(cls, token):
         """Get member ID by token"""
-        return cls._tokens.get(token)
+        return cls.get_backend().get_member_id(token)
+
+    @classmethod
+    async def aget_member_id(cls, token):
+        """Async version of get_member_id()"""
+        return await cls.get_backend().aget_member_id(token)
 
     @classmethod
     def delete_token(cls, token):
         """Remove token from storage"""
-        if token in cls._tokens:
-            del cls._tokens[token]
+        cls.get_backend().delete_token(token)
 
 
 class TokenAuthentication(BaseAuthentication):
@@ -35,6 +65,32 @@ class TokenAuthentication(BaseAuthentication):
 
     def authenticate(self, request):
         """Authenticate user by token from Authorization header"""
+        token = self.get_token(request)
+
+        if token is None:
+            return None
+
+        with timed('auth'):
+            member, token = self.authenticate_credentials(token)
+        if settings.PRESENCE['ENABLED']:
+            presence.mark_seen(member.id)
+        return (member, token)
+
+    async def aauthenticate(self, request):
+        """Async version of authenticate() for async views"""
+        token = self.get_token(request)
+
+        if token is None:
+            return None
+
+        with timed('auth'):
+            member, token = await self.aauthenticate_credentials(token)
+        if settings.PRESENCE['ENABLED']:
+            await presence.amark_seen(member.id)
+        return (member, token)
+
+    def get_token(self, request):
+        """Extract the token from the Authorization header, if present"""
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
         if not auth_header:
@@ -50,13 +106,11 @@ class TokenAuthentication(BaseAuthentication):
             if parts[0] != self.keyword:
                 return None
             
-            token = parts[1]
+            return parts[1]
             
         except (ValueError, UnicodeDecodeError):
             raise AuthenticationFailed('Invalid token header')
 
-        return self.authenticate_credentials(token)
-
     def authenticate_credentials(self, token):
         """Validate token and return member instance"""
         member_id = TokenStorage.get_member_id(token)
@@ -64,12 +118,33 @@ class TokenAuthentication(BaseAuthentication):
         if not member_id:
             raise AuthenticationFailed('Invalid or expired token')
 
-        try:
-            member = Member.objects.get(id=member_id)
-        except Member.DoesNotExist:
-            raise AuthenticationFailed('User not found')
+        member = member_cache.get(member_id)
+        if member is None:
+            try:
+                member = Member.objects.get(id=member_id)
+            except Member.DoesNotExist:
+                raise AuthenticationFailed('User not found')
+            member_cache.set(member_id, member)
 
-        return (member, token)
+        # Hand out a copy so request code never mutates the cached instance
+        return (copy.copy(member), token)
+
+    async def aauthenticate_credentials(self, token):
+        """Async version of authenticate_credentials() using the async ORM"""
+        member_id = await TokenStorage.aget_member_id(token)
+
+        if not member_id:
+            raise AuthenticationFailed('Invalid or expired token')
+
+        member = member_cache.get(member_id)
+        if member is None:
+            try:
+                member = await Member.objects.aget(id=member_id)
+            except Member.DoesNotExist:
+                raise AuthenticationFailed('User not found')
+            member_cache.set(member_id, member)
+
+        return (copy.copy(member), token)
 
     def authenticate_header(self, request):
         """Return authentication header for 401 responses"""
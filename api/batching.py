@@ -0,0 +1,94 @@
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from api.models import Message
+
+
+class PendingMessage:
+    """A message waiting in a batch, with the outcome of its commit"""
+
+    def __init__(self, message):
+        self.message = message
+        self.done = threading.Event()
+        self.error = None
+
+
+class MessageWriteBatcher:
+    """
+    Group commit for message inserts.
+    The first request to arrive becomes the leader of a batch: it waits up
+    to `window` seconds (or until `max_size` messages are queued) and then
+    inserts the whole batch with one bulk_create in a single transaction.
+    The other requests of the batch just wait for that commit. Each message
+    still gets its own id and created_at, so callers see no difference
+    except fewer fsyncs and less contention on the SQLite write lock.
+    Batches are formed per process, from requests served by its threads.
+    """
+
+    def __init__(self, window, max_size):
+        self.window = window
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._full = threading.Event()
+        self._pending = []
+        self._leader_active = False
+        self.commits = 0
+        self.messages = 0
+
+    def create(self, member, text):
+        """Insert a message as part of the current batch and return it"""
+        # bulk_create() does not call save(), which fills in the author
+        entry = PendingMessage(
+            Message(member=member, author=member.username, text=text)
+        )
+
+        with self._lock:
+            self._pending.append(entry)
+            is_leader = not self._leader_active
+            self._leader_active = True
+            if len(self._pending) >= self.max_size:
+                self._full.set()
+
+        if is_leader:
+            self._full.wait(self.window)
+            self._flush()
+        else:
+            entry.done.wait()
+
+        if entry.error is not None:
+            raise entry.error
+        return entry.message
+
+    def _flush(self):
+        with self._lock:
+            batch = self._pending
+            self._pending = []
+            self._leader_active = False
+            self._full.clear()
+
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create([entry.message for entry in batch])
+        except Exception as exc:
+            for entry in batch:
+                entry.error = exc
+        else:
+            with self._lock:
+                self.commits += 1
+                self.messages += len(batch)
+        finally:
+            for entry in batch:
+                entry.done.set()
+
+    def stats(self):
+        """Return the number of commits and messages written so far"""
+        with self._lock:
+            return {'commits': self.commits, 'messages': self.messages}
+
+
+message_batcher = MessageWriteBatcher(
+    settings.MESSAGE_WRITE_BATCHING['WINDOW_MS'] / 1000,
+    settings.MESSAGE_WRITE_BATCHING['MAX_SIZE'],
+)
@@ -0,0 +1,173 @@
+"""
+Load generation helpers for the benchmark management commands.
+
+The client speaks plain HTTP/1.1 over asyncio streams with keep-alive, so a
+single process can hold thousands of concurrent connections against a running
+server (gunicorn with config.wsgi or any ASGI server with config.asgi).
+"""
+
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client connection"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port
+        )
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.writer = None
+
+    async def request(self, method, path, headers=None, body=None):
+        """Send one request and return (status, headers, body)"""
+        if self.writer is None:
+            await self.connect()
+
+        payload = b''
+        request_headers = {'Host': f'{self.host}:{self.port}'}
+        if body is not None:
+            payload = json.dumps(body).encode()
+            request_headers['Content-Type'] = 'application/json'
+        request_headers['Content-Length'] = str(len(payload))
+        request_headers.update(headers or {})
+
+        head = f'{method} {path} HTTP/1.1\r\n' + ''.join(
+            f'{name}: {value}\r\n' for name, value in request_headers.items()
+        )
+        self.writer.write(head.encode() + b'\r\n' + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by server')
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            content = await self._read_chunked()
+        else:
+            length = int(response_headers.get('content-length', 0))
+            content = await self.reader.readexactly(length) if length else b''
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+
+        return status, response_headers, content
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+
+async def obtain_token(url, username, password):
+    """Register the benchmark user if needed and log in"""
+    connection = HttpConnection(url)
+    credentials = {'username': username, 'password': password}
+    try:
+        await connection.request('POST', '/api/register/', body=credentials)
+        status, _, content = await connection.request(
+            'POST', '/api/login/', body=credentials
+        )
+    finally:
+        await connection.close()
+
+    if status != 200:
+        raise RuntimeError(f'Login failed with status {status}')
+    return json.loads(content)['token']
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, errors, elapsed):
+    """Aggregate raw samples into the report printed by the commands"""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'latency_ms': {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in (
+                ('p50', percentile(latencies, 0.50)),
+                ('p95', percentile(latencies, 0.95)),
+                ('p99', percentile(latencies, 0.99)),
+                ('max', latencies[-1] if latencies else None),
+            )
+        },
+    }
+
+
+async def run_load(url, method, path, concurrency, duration, headers=None,
+                   body=None):
+    """
+    Drive one endpoint with `concurrency` keep-alive clients for `duration`
+    seconds and return the summary. `body` may also be a callable that
+    returns a new body for every request, e.g. unique registrations.
+    """
+    latencies = []
+    statuses = {}
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        connection = HttpConnection(url)
+        try:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    status, _, _ = await connection.request(
+                        method, path, headers=headers,
+                        body=body() if callable(body) else body
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    errors += 1
+                    await connection.close()
+                    continue
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            await connection.close()
+
+    started = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, statuses, errors, time.monotonic() - started)
@@ -0,0 +1,216 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from api.models import Member, Message
+
+
+def chunked(iterable, size):
+    """Yield lists of up to `size` items"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create() keep the created_at values of imported records.
+    auto_now_add fields are overwritten on insert otherwise.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def deferred_indexes(model):
+    """
+    Drop the non-unique indexes of the model's table and recreate them from
+    their original definitions on exit. Building an index once over the
+    loaded rows is much cheaper than updating it for every insert.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = %s AND sql IS NOT NULL AND sql NOT LIKE %s",
+            [table, 'CREATE UNIQUE%']
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+    try:
+        yield [name for name, _ in indexes]
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+@contextmanager
+def deferred_search_index():
+    """
+    Stop indexing inserted messages for full-text search one by one and
+    index all messages added in the meantime in one statement on exit,
+    which is several times faster than the per-row trigger.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' "
+            "AND name = 'messages_fts_insert'"
+        )
+        (trigger,) = cursor.fetchone()
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM messages')
+        (last_id,) = cursor.fetchone()
+        cursor.execute('DROP TRIGGER messages_fts_insert')
+    try:
+        yield
+    finally:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(trigger)
+            cursor.execute(
+                'INSERT INTO messages_fts(rowid, text) '
+                'SELECT id, text FROM messages WHERE id > %s',
+                [last_id]
+            )
+
+
+class BulkImporter:
+    """
+    Chunked loading of members and messages from NDJSON-style records.
+    Member records are {"username", "password"} or {"username",
+    "password_hash"} with an already encoded Django hash, which skips the
+    PBKDF2 round per member. Message records use the export format
+    {"author", "text", "created_at"}; ids are assigned by the database, so
+    records should come oldest first. Every chunk is inserted in its own
+    transaction: members with bulk_create(), which returns their ids,
+    messages with a single executemany() of plain tuples, since building
+    and preparing a model instance per row costs several times more than
+    SQLite takes to insert it.
+    """
+
+    def __init__(self, chunk_size=10000, default_password=None,
+                 create_authors=False, progress=None):
+        self.chunk_size = chunk_size
+        self.create_authors = create_authors
+        self.progress = progress
+        # Hashed once and shared by every member imported without password
+        self.default_hash = make_password(default_password)
+        self.member_ids = dict(Member.objects.values_list('username', 'id'))
+        self.counts = {'members': 0, 'messages': 0}
+
+    def import_members(self, records):
+        return self._import('members', records, self._insert_members)
+
+    def import_messages(self, records):
+        return self._import('messages', records, self._insert_messages)
+
+    def _import(self, kind, records, insert):
+        started = time.monotonic()
+        with explicit_timestamps(Member):
+            for chunk in chunked(records, self.chunk_size):
+                with transaction.atomic():
+                    insert(chunk)
+                self.counts[kind] += len(chunk)
+                if self.progress:
+                    self.progress(kind, self.counts[kind], started)
+        return self.counts[kind]
+
+    def _insert_members(self, records):
+        now = timezone.now()
+        members = [self.build_member(record, now) for record in records]
+        Member.objects.bulk_create(members)
+        self.member_ids.update(
+            (member.username, member.id) for member in members
+        )
+
+    def _insert_messages(self, records):
+        if self.create_authors:
+            missing = {
+                record.get('author') for record in records
+            } - self.member_ids.keys() - {None}
+            self._insert_members([{'username': name} for name in missing])
+
+        adapt = connection.ops.adapt_datetimefield_value
+        now = adapt(timezone.now())
+        rows = [
+            self.build_message_row(record, now, adapt) for record in records
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(self.message_insert_sql, rows)
+
+    def build_member(self, record, now):
+        username = record.get('username')
+        if not username:
+            raise ValueError(f'Member record without username: {record}')
+        if username in self.member_ids:
+            raise ValueError(f'Member {username!r} already exists')
+
+        password = record.get('password_hash')
+        if password is not None:
+            identify_hasher(password)
+        elif record.get('password') is not None:
+            password = make_password(record['password'])
+        else:
+            password = self.default_hash
+
+        return Member(
+            username=username,
+            password=password,
+            created_at=self.parse_created_at(record, now)
+        )
+
+    def build_message_row(self, record, now, adapt):
+        """
+        Return the (member_id, author, text, created_at) values of a message,
+        with created_at converted by `adapt` to the stored text.
+        """
+        author = record.get('author')
+        member_id = self.member_ids.get(author)
+        if member_id is None:
+            raise ValueError(f'Unknown author in message record: {record}')
+        if not record.get('text'):
+            raise ValueError(f'Message record without text: {record}')
+
+        created_at = now
+        if record.get('created_at') is not None:
+            created_at = adapt(self.parse_created_at(record, now))
+        return member_id, author, record['text'], created_at
+
+    @cached_property
+    def message_insert_sql(self):
+        meta = Message._meta
+        quote = connection.ops.quote_name
+        columns = ', '.join(
+            quote(meta.get_field(name).column)
+            for name in ('member', 'author', 'text', 'created_at')
+        )
+        return (
+            f'INSERT INTO {quote(meta.db_table)} ({columns}) '
+            f'VALUES (%s, %s, %s, %s)'
+        )
+
+    def parse_created_at(self, record, now):
+        value = record.get('created_at')
+        if value is None:
+            return now
+
+        created_at = datetime.fromisoformat(value)
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at, dt_timezone.utc)
+        return created_at
@@ -0,0 +1,157 @@
+"""
+Compression of API responses.
+
+CompressionMiddleware compresses response bodies of at least MIN_SIZE bytes
+for clients that accept it: brotli when the optional brotli package is
+installed and the client prefers or accepts it, gzip otherwise. Compression
+is done once per response in Django, so nginx only passes bytes through.
+
+Feed responses are snapshots shared by every poller: the latest page and
+?after_id= deltas stay byte-identical until the next message is posted.
+Views mark such responses with set_snapshot_key() and a key that changes
+with the feed (it includes the newest message id); their compressed bytes
+are then kept in a per-process LRU cache and reused by every request for
+the same snapshot and encoding, so concurrent pollers do not recompress
+identical payloads. Compressed responses get a weak ETag, like Django's
+GZipMiddleware, so If-None-Match revalidation keeps working.
+
+Only responses under the API prefix of LEAN_API_MIDDLEWARE are compressed.
+The API authenticates with a header and has no secrets in its bodies, while
+the admin's pages carry CSRF tokens next to reflected input, which BREACH
+can recover from compressed sizes.
+"""
+
+import gzip
+import threading
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from api.cache import LRUCache
+from api.instrumentation import timed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+config = settings.RESPONSE_COMPRESSION
+
+
+def accepted_encodings(header):
+    """The content codings an Accept-Encoding header allows, by preference"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if coding and quality > 0:
+            accepted[coding.lower()] = quality
+    return sorted(accepted, key=accepted.get, reverse=True)
+
+
+def choose_encoding(header):
+    """Pick br or gzip for an Accept-Encoding header, or None"""
+    supported = ('br', 'gzip') if brotli is not None else ('gzip',)
+    for coding in accepted_encodings(header):
+        if coding in supported:
+            return coding
+        if coding == '*':
+            return supported[0]
+    return None
+
+
+def compress(body, encoding):
+    with timed('serialization'):
+        if encoding == 'br':
+            return brotli.compress(body, quality=config['BROTLI_QUALITY'])
+        return gzip.compress(body, compresslevel=config['GZIP_LEVEL'], mtime=0)
+
+
+def set_snapshot_key(response, *key):
+    """
+    Mark a response whose body is the same for every request with this key,
+    so its compressed body is cached. The key must change with the content.
+    """
+    response.snapshot_key = key
+    return response
+
+
+class SnapshotCache:
+    """Compressed snapshot bodies by (snapshot key, encoding)"""
+
+    def __init__(self, size):
+        self._cache = LRUCache(size, float('inf'))
+        # One compression per snapshot when many pollers miss at once
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(self, key, body, encoding):
+        key = (key, encoding)
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self.hits += 1
+            return compressed
+
+        with self._lock:
+            compressed = self._cache.get(key)
+            if compressed is None:
+                self.misses += 1
+                compressed = compress(body, encoding)
+                self._cache.set(key, compressed)
+            else:
+                self.hits += 1
+        return compressed
+
+    def clear(self):
+        self._cache.clear()
+
+
+snapshot_cache = SnapshotCache(config['CACHE_SIZE'])
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress API responses, see the module docstring"""
+
+    api_prefix = settings.LEAN_API_MIDDLEWARE['PREFIX']
+
+    def process_response(self, request, response):
+        if (
+            not config['ENABLED']
+            or not request.path_info.startswith(self.api_prefix)
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < config['MIN_SIZE']
+        ):
+            return response
+
+        # The body depends on Accept-Encoding whether it is compressed or not
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        key = getattr(response, 'snapshot_key', None)
+        if key is None:
+            compressed = compress(response.content, encoding)
+        else:
+            compressed = snapshot_cache.get_or_compress(
+                key, response.content, encoding
+            )
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,115 @@
+"""
+SQLite backend with a per-process pool of connections.
+
+Django opens one connection per thread and alias, so with gunicorn's 64
+threads a worker can hold 64 connections, each with its own page cache.
+With this backend a DatabaseWrapper borrows its connection from a pool of
+at most OPTIONS['pool_size'] connections per process and alias when it
+connects, and gives it back instead of closing it. Use it with
+CONN_MAX_AGE = 0, so that connections go back to the pool at the end of
+every request. Threads wait up to OPTIONS['pool_timeout'] seconds for a
+free connection when all are in use, then fail with OperationalError
+rather than hanging the request.
+"""
+
+import os
+import threading
+import time
+
+from django.db.backends.sqlite3 import base
+
+
+class ConnectionPool:
+    """Bounded pool of open sqlite3 connections"""
+
+    def __init__(self, size, timeout=None):
+        self.size = size
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._idle = []
+        self._open = 0
+        self._pid = os.getpid()
+
+    def acquire(self, connect):
+        """
+        Return an idle connection, or one from connect() while below size.
+        Raises OperationalError when none is free within the timeout.
+        """
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.monotonic() + self.timeout
+        with self._condition:
+            if self._pid != os.getpid():
+                # Connections inherited from before a fork are not usable
+                self._idle = []
+                self._open = 0
+                self._pid = os.getpid()
+            while not self._idle and self._open >= self.size:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise base.Database.OperationalError(
+                            f'No free connection in the pool of {self.size} '
+                            f'after {self.timeout} seconds'
+                        )
+                self._condition.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._open += 1
+
+        try:
+            return connect()
+        except BaseException:
+            self.discard(None)
+            raise
+
+    def release(self, connection):
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a connection that must not be reused and free its place"""
+        if connection is not None:
+            connection.close()
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pools = {}
+    pools_lock = threading.Lock()
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pool_size = kwargs.pop('pool_size', 8)
+        self.pool_timeout = kwargs.pop('pool_timeout', None)
+        return kwargs
+
+    @property
+    def pool(self):
+        with self.pools_lock:
+            pool = self.pools.get(self.alias)
+            if pool is None:
+                pool = self.pools[self.alias] = ConnectionPool(
+                    self.pool_size, self.pool_timeout
+                )
+            return pool
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+        )
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            if self.connection.in_transaction:
+                self.connection.rollback()
+        if self.errors_occurred:
+            self.pool.discard(self.connection)
+        else:
+            self.pool.release(self.connection)
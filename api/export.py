@@ -0,0 +1,99 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from api.archive import message_archive
+from api.models import Message
+from api.rendering import json_bytes, message_dicts, message_rows
+
+
+class MessageExport:
+    """
+    Incremental rendering of the whole message history, oldest first, in
+    the API message representation.
+    Rows are read with a chunked server-side cursor and encoded one chunk at
+    a time, so memory use depends on chunk_size and not on the history size.
+    `ndjson` writes one message per line, `json` a single array.
+    Archived messages come first, read segment by segment.
+    """
+    content_types = {
+        'ndjson': 'application/x-ndjson',
+        'json': 'application/json',
+    }
+    default_chunk_size = 2000
+
+    def __init__(self, output='ndjson', chunk_size=None):
+        if output not in self.content_types:
+            raise ValueError(f'Unknown export output: {output}')
+        self.output = output
+        self.chunk_size = chunk_size or self.default_chunk_size
+        self.count = 0
+
+    @property
+    def content_type(self):
+        return self.content_types[self.output]
+
+    @property
+    def filename(self):
+        return f'messages.{self.output}'
+
+    def get_rows(self):
+        return message_rows(Message.objects.order_by('id'))
+
+    def iter_rows(self):
+        """Every message row in id order, archived ones first"""
+        last_id = message_archive.last_id
+        yield from message_archive.iter_rows()
+        # Rows of the newest segment can still be in the table
+        rows = self.get_rows().filter(id__gt=last_id)
+        yield from rows.iterator(chunk_size=self.chunk_size)
+
+    def iter_bytes(self):
+        """Yield the encoded export in chunks"""
+        batch = []
+        first = True
+        for row in self.iter_rows():
+            batch.append(row)
+            if len(batch) == self.chunk_size:
+                yield self.encode(batch, first)
+                first = False
+                batch = []
+
+        tail = self.encode(batch, first) + self.end()
+        if tail:
+            yield tail
+
+    async def aiter_bytes(self):
+        """
+        Async version of iter_bytes(). Chunks are fetched in the sync thread
+        the way QuerySet.aiterator() does it; aiterator() itself cannot be
+        used because values_list() querysets open their cursor on the event
+        loop.
+        """
+        rows = self.iter_rows()
+        fetch = sync_to_async(lambda: list(islice(rows, self.chunk_size)))
+        first = True
+        while True:
+            batch = await fetch()
+            if len(batch) < self.chunk_size:
+                break
+            yield self.encode(batch, first)
+            first = False
+
+        tail = self.encode(batch, first) + self.end()
+        if tail:
+            yield tail
+
+    def encode(self, batch, first):
+        """Encode a batch of rows, `first` tells whether anything was sent"""
+        self.count += len(batch)
+        items = [json_bytes(message) for message in message_dicts(batch)]
+        if self.output == 'ndjson':
+            return b''.join(item + b'\n' for item in items)
+
+        if first:
+            return b'[' + b','.join(items)
+        return b',' + b','.join(items) if items else b''
+
+    def end(self):
+        return b']' if self.output == 'json' else b''
@@ -0,0 +1,127 @@
+"""
+Request handling shared by the DRF views in api/views.py and their async
+counterparts in api/async_views.py: query parameter parsing, feed cache
+headers and response bodies. Only the database access differs between the
+two, so validation and headers are written once.
+"""
+
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework import status
+
+from api.batching import message_batcher
+from api.compression import set_snapshot_key
+from api.models import Message
+from api.notifications import message_notifier
+from api.pagination import MessageKeysetPagination
+from api.recent_messages import recent_messages
+from api.rooms import RoomAccessDenied
+
+
+def created_message_data(message):
+    """Body of the 201 response to a message POST"""
+    return {
+        'id': message.id,
+        'text': message.text,
+        'author': message.author,
+        'created_at': message.created_at.isoformat()
+    }
+
+
+def create_message(member, text):
+    """
+    Insert a message into the global feed, through the write batcher when
+    MESSAGE_WRITE_BATCHING is enabled, and return its response body.
+    """
+    if settings.MESSAGE_WRITE_BATCHING['ENABLED']:
+        message = message_batcher.create(member, text)
+        # bulk_create() sends no post_save, see api.signals
+        message_committed(message)
+    else:
+        message = Message.objects.create(member=member, text=text)
+    return created_message_data(message)
+
+
+def message_committed(message):
+    """Once committed, add a new message to the ring and wake the long polls"""
+    if settings.RECENT_MESSAGES['ENABLED']:
+        data = created_message_data(message)
+        transaction.on_commit(lambda: recent_messages.add([data]))
+    transaction.on_commit(lambda: message_notifier.publish(message.id))
+
+
+def fetched_position(after_id, last_id):
+    """
+    Global feed position shown by a fetch: everything up to after_id, or
+    the newest message for the latest page. Clamped to last_id, so an
+    after_id beyond the newest message does not mark messages posted later
+    as read.
+    """
+    if after_id is None:
+        return last_id
+    return min(after_id, last_id)
+
+
+def room_access_error(exc, response_class):
+    """403 or 404 for a room the member cannot read, see RoomFeed"""
+    if isinstance(exc, RoomAccessDenied):
+        return response_class(
+            {'error': 'Not a member of this room'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return response_class(
+        {'error': 'Room not found'}, status=status.HTTP_404_NOT_FOUND
+    )
+
+
+class FeedViewMixin:
+    """Validators and query parameters of the global and room feeds"""
+
+    def feed_etag(self, last_id):
+        """
+        Validator of the global feed. Messages are append-only, so the
+        newest id changes exactly when any feed response could change.
+        """
+        return quote_etag(f'messages-{last_id}')
+
+    def add_feed_cache_headers(self, response, etag):
+        """Make clients revalidate the feed with If-None-Match on every poll"""
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        # Every request for this URL gets the same body until the ETag
+        # changes, so the compressed body can be shared
+        return set_snapshot_key(response, etag, self.request.get_full_path())
+
+    def get_feed_params(self, request):
+        """
+        Return ?limit= and ?after_id= (None without it) of a feed request.
+        Raises ValueError for invalid values.
+        """
+        limit = MessageKeysetPagination().get_limit(request)
+        after_id = request.GET.get('after_id')
+        if after_id is not None:
+            after_id = int(after_id)
+        return limit, after_id
+
+
+class MessageWaitMixin:
+    """Query parameters of the long-poll endpoint"""
+    default_timeout = 25
+    max_timeout = 60
+
+    def get_wait_params(self, request):
+        """
+        Return after_id, the timeout clamped to [0, max_timeout] and the
+        limit of a long-poll request. Raises ValueError for invalid values,
+        including a nan or infinite timeout.
+        """
+        after_id = int(request.GET.get('after_id', 0))
+        timeout = float(request.GET.get('timeout', self.default_timeout))
+        if not math.isfinite(timeout):
+            raise ValueError('timeout must be finite')
+        limit = MessageKeysetPagination().get_limit(request)
+        return after_id, min(max(timeout, 0), self.max_timeout), limit
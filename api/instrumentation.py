@@ -0,0 +1,273 @@
+"""
+Per-request instrumentation.
+
+InstrumentationMiddleware measures every request: database queries (count
+and time, recorded by a wrapper installed on each new connection),
+authentication, password hashing, response serialization and total time.
+The breakdown is sent back in a Server-Timing header, logged as one JSON
+line on the api.requests logger and added to histograms per URL name that
+all gunicorn workers share and MetricsView exposes in the Prometheus text
+format.
+"""
+
+import json
+import logging
+import math
+import multiprocessing
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+logger = logging.getLogger('api.requests')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings (in seconds) and query count collected for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {
+            'db': 0.0, 'auth': 0.0, 'hashing': 0.0, 'serialization': 0.0
+        }
+        self.queries = 0
+
+    def finish(self):
+        self.timings['request'] = time.perf_counter() - self.started
+
+
+@contextmanager
+def timed(name):
+    """Add the duration of the block to the current request's `name` timing"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - started
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing queries of the request"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.timings['db'] += time.perf_counter() - started
+        metrics.queries += 1
+
+
+class MetricsRegistry:
+    """
+    Histograms of request timings per view name, kept in shared memory
+    created before gunicorn forks, so every worker adds to the same numbers
+    and any of them can serve the aggregated metrics.
+    View names are registered in a shared table on first use; once it is
+    full, further names are counted under "other".
+    """
+    durations = (
+        ('request', 'api_request_duration_seconds',
+         'Total time spent handling the request'),
+        ('db', 'api_db_duration_seconds',
+         'Time spent in database queries'),
+        ('auth', 'api_auth_duration_seconds',
+         'Time spent authenticating the request'),
+        ('hashing', 'api_password_hashing_duration_seconds',
+         'Time spent hashing passwords, waiting for the pool included'),
+        ('serialization', 'api_serialization_duration_seconds',
+         'Time spent encoding response bodies'),
+    )
+    buckets = (
+        0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+    )
+    name_size = 64
+
+    def __init__(self, max_views=64):
+        self.max_views = max_views
+        # Per duration: one count per bucket plus +Inf, then the sum.
+        # The query total closes the block of each view.
+        self._series_size = len(self.buckets) + 2
+        self._stride = len(self.durations) * self._series_size + 1
+        self._values = multiprocessing.RawArray('d', max_views * self._stride)
+        self._names = multiprocessing.RawArray(
+            'c', max_views * self.name_size
+        )
+        self._view_count = multiprocessing.RawValue('i', 0)
+        self._lock = multiprocessing.Lock()
+        self._slots = {}
+
+    def observe(self, view, metrics):
+        with self._lock:
+            base = self._slot(view) * self._stride
+            for index, (key, _, _) in enumerate(self.durations):
+                value = metrics.timings[key]
+                offset = base + index * self._series_size
+                self._values[offset + bisect_left(self.buckets, value)] += 1
+                self._values[offset + self._series_size - 1] += value
+            self._values[base + self._stride - 1] += metrics.queries
+
+    def reset(self):
+        with self._lock:
+            self._values[:] = [0.0] * len(self._values)
+            self._names[:] = bytes(len(self._names))
+            self._view_count.value = 0
+            self._slots.clear()
+
+    def _slot(self, view):
+        """Return the slot of a view name, registering it if needed"""
+        slot = self._slots.get(view)
+        if slot is not None and self._get_name(slot) == view:
+            return slot
+
+        for slot in range(self._view_count.value):
+            if self._get_name(slot) == view:
+                self._slots[view] = slot
+                return slot
+
+        slot = self._view_count.value
+        if slot >= self.max_views - 1:
+            slot = self.max_views - 1
+            self._set_name(slot, 'other')
+        else:
+            self._set_name(slot, view)
+            self._view_count.value = slot + 1
+        self._slots[view] = slot
+        return slot
+
+    def _get_name(self, slot):
+        start = slot * self.name_size
+        name = self._names[start:start + self.name_size]
+        return name.rstrip(b'\0').decode()
+
+    def _set_name(self, slot, view):
+        start = slot * self.name_size
+        encoded = view.encode()[:self.name_size].ljust(self.name_size, b'\0')
+        self._names[start:start + self.name_size] = encoded
+
+    def render(self):
+        """Format all series in the Prometheus text exposition format"""
+        with self._lock:
+            values = self._values[:]
+            views = [
+                (slot, self._get_name(slot)) for slot in range(self.max_views)
+            ]
+        views = [(slot, escape_label(name)) for slot, name in views if name]
+
+        lines = []
+        bounds = [format_bound(bound) for bound in self.buckets] + ['+Inf']
+        for index, (_, metric, description) in enumerate(self.durations):
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} histogram')
+            for slot, view in views:
+                offset = slot * self._stride + index * self._series_size
+                cumulative = 0
+                for bound, count in zip(bounds, values[offset:]):
+                    cumulative += int(count)
+                    lines.append(
+                        f'{metric}_bucket{{view="{view}",le="{bound}"}} '
+                        f'{cumulative}'
+                    )
+                total = values[offset + self._series_size - 1]
+                lines.append(f'{metric}_sum{{view="{view}"}} {total}')
+                lines.append(f'{metric}_count{{view="{view}"}} {cumulative}')
+
+        lines.append('# HELP api_db_queries_total Database queries executed')
+        lines.append('# TYPE api_db_queries_total counter')
+        for slot, view in views:
+            queries = int(values[(slot + 1) * self._stride - 1])
+            lines.append(f'api_db_queries_total{{view="{view}"}} {queries}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_bound(bound):
+    return repr(float(bound)) if not math.isinf(bound) else '+Inf'
+
+
+def escape_label(value):
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+histograms = MetricsRegistry()
+
+
+class InstrumentationMiddleware:
+    """
+    Measure every request, see the module docstring. Must be the first
+    middleware so that the total covers the whole stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        metrics.finish()
+        match = request.resolver_match
+        view = match.view_name if match else '<unmatched>'
+        timings = {
+            name: round(seconds * 1000, 3)
+            for name, seconds in metrics.timings.items()
+        }
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings["db"]};desc="{metrics.queries} queries"',
+            f'auth;dur={timings["auth"]}',
+            f'hashing;dur={timings["hashing"]}',
+            f'serialization;dur={timings["serialization"]}',
+            f'total;dur={timings["request"]}',
+        ])
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'total_ms': timings['request'],
+                'db_ms': timings['db'],
+                'db_queries': metrics.queries,
+                'auth_ms': timings['auth'],
+                'hashing_ms': timings['hashing'],
+                'serialization_ms': timings['serialization'],
+            }))
+
+        histograms.observe(view, metrics)
+        return response
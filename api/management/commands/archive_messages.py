@@ -0,0 +1,62 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.archive import get_archiver
+
+
+class Command(BaseCommand):
+    help = (
+        'Move messages older than the retention period out of the messages '
+        'table into compressed archive segments (see api/archive.py). The '
+        'history API keeps serving them from the archive. With --interval '
+        'the command keeps running and archives periodically.'
+    )
+
+    def add_arguments(self, parser):
+        config = settings.MESSAGE_ARCHIVE
+        parser.add_argument(
+            '--retention-days', type=float, default=config['RETENTION_DAYS']
+        )
+        parser.add_argument(
+            '--segment-size', type=int, default=config['SEGMENT_SIZE']
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            help='Archive again every INTERVAL seconds instead of exiting'
+        )
+
+    def handle(self, *args, **options):
+        if options['segment_size'] < 1:
+            raise CommandError('--segment-size must be positive')
+
+        archiver = get_archiver()
+        archiver.retention = timedelta(days=options['retention_days'])
+        archiver.segment_size = options['segment_size']
+
+        if not options['interval']:
+            self.archive(archiver)
+            return
+
+        while True:
+            try:
+                self.archive(archiver)
+            except Exception as exc:
+                # The next round retries, e.g. after the database was locked
+                self.stderr.write(f'Archiving failed: {exc!r}')
+            finally:
+                connection.close()
+            time.sleep(options['interval'])
+
+    def archive(self, archiver):
+        started = time.monotonic()
+        archived = archiver.run()
+        self.stdout.write(json.dumps({
+            'archived': archived,
+            'archived_through_id': archiver.archive.last_id,
+            'elapsed_s': round(time.monotonic() - started, 2),
+        }))
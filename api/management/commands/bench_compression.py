@@ -0,0 +1,98 @@
+import json
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api.authentication import TokenStorage
+from api.compression import brotli, snapshot_cache
+from api.instrumentation import logger as request_logger
+from api.models import Member, Message
+
+
+class Command(BaseCommand):
+    help = (
+        'Request feed responses in-process without compression, compressed '
+        'on every request and compressed through the snapshot cache, and '
+        'print the body size and the CPU time per request of each as JSON. '
+        'Runs against the configured database; the messages and member '
+        'created for it are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        member, _ = Member.objects.get_or_create(username='bench-compression')
+        Message.objects.bulk_create(
+            [
+                Message(
+                    member=member, author=member.username,
+                    text=f'Benchmark message {i}, long enough to look like '
+                    f'what people actually write in a group chat.'
+                )
+                for i in range(options['messages'])
+            ],
+            batch_size=1000
+        )
+        token = TokenStorage.create_token(member)
+        headers = {'Authorization': f'Token {token}'}
+        # The per-request log lines would dominate the measurement
+        level = request_logger.level
+        request_logger.setLevel(logging.WARNING)
+
+        client = Client()
+        page = client.get('/api/messages/?limit=200', headers=headers).json()
+        paths = {
+            'latest_50': '/api/messages/',
+            'latest_200': '/api/messages/?limit=200',
+            'delta_20': f'/api/messages/?after_id={page["results"][-21]["id"]}',
+        }
+        modes = [
+            ('identity', None, False),
+            ('gzip_per_request', 'gzip', False),
+            ('gzip_snapshot', 'gzip', True),
+        ]
+        if brotli is not None:
+            modes += [
+                ('br_per_request', 'br', False), ('br_snapshot', 'br', True)
+            ]
+
+        try:
+            for name, path in paths.items():
+                for mode, encoding, cached in modes:
+                    self.stdout.write(json.dumps({
+                        'response': name,
+                        'mode': mode,
+                        **self.measure(
+                            client, path, headers, encoding, cached, options
+                        ),
+                    }))
+        finally:
+            request_logger.setLevel(level)
+            TokenStorage.delete_token(token)
+            Message.objects.filter(member=member).delete()
+            member.delete()
+
+    def measure(self, client, path, headers, encoding, cached, options):
+        if encoding:
+            headers = {**headers, 'Accept-Encoding': encoding}
+        response = client.get(path, headers=headers)
+        if response.get('Content-Encoding') != encoding:
+            raise AssertionError(f'{path}: not encoded with {encoding}')
+
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        for _ in range(options['requests']):
+            if not cached:
+                snapshot_cache.clear()
+            client.get(path, headers=headers)
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+        return {
+            'body_bytes': len(response.content),
+            'cpu_us': round(cpu / options['requests'] * 1e6, 1),
+            'wall_us': round(wall / options['requests'] * 1e6, 1),
+        }
@@ -0,0 +1,256 @@
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+
+from api.benchmarking import HttpConnection, obtain_token, run_load
+
+BENCH_USERNAME = 'bench-endpoints'
+BENCH_PASSWORD = 'bench-endpoints-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Endpoint benchmark suite. For every --sizes value a scratch SQLite '
+        'database is seeded with that many messages (the configured database '
+        'is not touched) and served by gunicorn with gunicorn.conf.py. Each '
+        'endpoint is then driven by concurrent keep-alive clients. Prints one '
+        'JSON line per dataset size and endpoint with throughput, latency '
+        'percentiles and database queries per request, so runs can be '
+        'diffed between commits.'
+    )
+    endpoint_names = [
+        'register', 'login', 'profile', 'messages_latest', 'messages_older',
+        'messages_delta', 'messages_create',
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 100000, 1000000]
+        )
+        parser.add_argument('--members', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--warmup', type=float, default=1.0)
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument(
+            '--endpoints', nargs='+', help='Only run these endpoints'
+        )
+        parser.add_argument('--output', help='Also append the JSON lines here')
+        parser.add_argument(
+            '--count-queries', action='store_true',
+            help='Internal: print the queries per request of every endpoint '
+            'against the configured database and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['count_queries']:
+            self.stdout.write(json.dumps(self.count_queries()))
+            return
+
+        unknown = set(options['endpoints'] or ()) - set(self.endpoint_names)
+        if unknown:
+            raise CommandError(
+                f'Unknown endpoints: {", ".join(sorted(unknown))}'
+            )
+
+        commit = self.git_commit()
+        output = open(options['output'], 'a') if options['output'] else None
+        try:
+            for size in options['sizes']:
+                for result in self.bench_size(size, options):
+                    result = {'commit': commit, 'messages': size, **result}
+                    line = json.dumps(result)
+                    self.stdout.write(line)
+                    if output:
+                        output.write(line + '\n')
+                        output.flush()
+        finally:
+            if output:
+                output.close()
+
+    def get_endpoints(self, last_id, cursor):
+        """(name, method, path, body) of every benchmarked request"""
+        usernames = (
+            f'bench-{os.getpid()}-{i}' for i in itertools.count()
+        )
+        return [
+            ('register', 'POST', '/api/register/', lambda: {
+                'username': next(usernames), 'password': BENCH_PASSWORD
+            }),
+            ('login', 'POST', '/api/login/', {
+                'username': BENCH_USERNAME, 'password': BENCH_PASSWORD
+            }),
+            ('profile', 'GET', '/api/profile/', None),
+            ('messages_latest', 'GET', '/api/messages/', None),
+            ('messages_older', 'GET', f'/api/messages/?before={cursor}', None),
+            (
+                'messages_delta', 'GET',
+                f'/api/messages/?after_id={max(last_id - 10, 0)}', None
+            ),
+            # Last, since it grows the table
+            ('messages_create', 'POST', '/api/messages/', {
+                'text': 'Benchmark message'
+            }),
+        ]
+
+    def bench_size(self, size, options):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'DJANGO_DB_PATH': os.path.join(directory, 'db.sqlite3'),
+            }
+            self.manage(env, 'migrate', '--noinput', '-v0')
+            self.manage(
+                env, 'import_data',
+                '--generate-members', str(options['members']),
+                '--generate-messages', str(size),
+                '--default-password', BENCH_PASSWORD,
+            )
+            queries = json.loads(
+                self.manage(env, 'bench_endpoints', '--count-queries')
+            )
+
+            url = f'http://127.0.0.1:{options["port"]}'
+            log = open(os.path.join(directory, 'gunicorn.log'), 'wb')
+            server = subprocess.Popen(
+                [
+                    sys.executable, '-m', 'gunicorn',
+                    '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+                    '--bind', f'127.0.0.1:{options["port"]}',
+                    'config.wsgi:application',
+                ],
+                cwd=settings.BASE_DIR, env=env, stdout=log, stderr=log,
+            )
+            try:
+                self.wait_for_server(options['port'], server)
+                yield from asyncio.run(
+                    self.drive(url, queries, options)
+                )
+            finally:
+                server.terminate()
+                server.wait()
+                log.close()
+
+    async def drive(self, url, queries, options):
+        token = await obtain_token(url, BENCH_USERNAME, BENCH_PASSWORD)
+        headers = {'Authorization': f'Token {token}'}
+
+        client = HttpConnection(url)
+        try:
+            _, _, content = await client.request(
+                'GET', '/api/messages/', headers=headers
+            )
+        finally:
+            await client.close()
+        page = json.loads(content)
+        last_id = page['results'][-1]['id'] if page['results'] else 0
+
+        results = []
+        endpoints = self.get_endpoints(last_id, page['next_cursor'] or '')
+        for name, method, path, body in endpoints:
+            if options['endpoints'] and name not in options['endpoints']:
+                continue
+            if options['warmup']:
+                await run_load(
+                    url, method, path, options['concurrency'],
+                    options['warmup'], headers=headers, body=body
+                )
+            result = await run_load(
+                url, method, path, options['concurrency'],
+                options['duration'], headers=headers, body=body
+            )
+            results.append({
+                'endpoint': name,
+                'method': method,
+                'concurrency': options['concurrency'],
+                **result,
+                'queries': queries.get(name),
+            })
+        return results
+
+    def count_queries(self):
+        """
+        Issue every request twice through the test client and count the
+        queries of the second one, i.e. with warm per-process caches.
+        """
+        client = Client()
+        credentials = {'username': BENCH_USERNAME, 'password': BENCH_PASSWORD}
+        client.post(
+            '/api/register/', credentials, content_type='application/json'
+        )
+        token = client.post(
+            '/api/login/', credentials, content_type='application/json'
+        ).json()['token']
+        headers = {'Authorization': f'Token {token}'}
+
+        page = client.get('/api/messages/', headers=headers).json()
+        last_id = page['results'][-1]['id'] if page['results'] else 0
+
+        counts = {}
+        endpoints = self.get_endpoints(last_id, page['next_cursor'] or '')
+        for name, method, path, body in endpoints:
+            executed = []
+
+            def count(execute, sql, params, many, context):
+                executed.append(sql)
+                return execute(sql, params, many, context)
+
+            for _ in range(2):
+                executed.clear()
+                data = body() if callable(body) else body
+                # Reads of GET requests go to the readonly alias
+                with contextlib.ExitStack() as stack:
+                    for alias_connection in connections.all():
+                        stack.enter_context(
+                            alias_connection.execute_wrapper(count)
+                        )
+                    client.generic(
+                        method, path, json.dumps(data) if data else '',
+                        content_type='application/json', headers=headers
+                    )
+            counts[name] = len(executed)
+        return counts
+
+    def manage(self, env, *args):
+        result = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(
+                f'manage.py {" ".join(args)} failed:\n{result.stderr}'
+            )
+        return result.stdout
+
+    def wait_for_server(self, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('gunicorn exited during startup')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'gunicorn did not listen on port {port}')
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+
+from api.benchmarking import HttpConnection, obtain_token, run_load
+from api.management.commands import bench_endpoints
+
+BENCH_USERNAME = 'bench-login'
+BENCH_PASSWORD = 'bench-login-password'
+
+
+class Command(bench_endpoints.Command):
+    help = (
+        'Login burst benchmark. A scratch SQLite database (the configured one '
+        'is not touched) with --messages messages is served by gunicorn with '
+        'gunicorn.conf.py, once per --hashing-workers value (0 hashes on the '
+        'request threads). Pollers read the feed with ?after_id= deltas, '
+        'first alone and then while --login-concurrency clients log in '
+        'continuously. Prints one JSON line per run with feed latency and '
+        'login throughput.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10000)
+        parser.add_argument(
+            '--hashing-workers', type=int, nargs='+', default=[0, 1]
+        )
+        parser.add_argument('--feed-concurrency', type=int, default=32)
+        parser.add_argument('--login-concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--port', type=int, default=8099)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'DJANGO_DB_PATH': os.path.join(directory, 'db.sqlite3'),
+                'DJANGO_REQUEST_LOG_LEVEL': 'WARNING',
+            }
+            self.manage(env, 'migrate', '--noinput', '-v0')
+            self.manage(
+                env, 'import_data', '--generate-members', '100',
+                '--generate-messages', str(options['messages']),
+            )
+            for workers in options['hashing_workers']:
+                env['DJANGO_PASSWORD_HASHING_WORKERS'] = str(workers)
+                for result in self.bench_server(env, directory, options):
+                    self.stdout.write(json.dumps({
+                        'hashing_workers': workers, **result
+                    }))
+
+    def bench_server(self, env, directory, options):
+        log = open(os.path.join(directory, 'gunicorn.log'), 'ab')
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn',
+                '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+                '--bind', f'127.0.0.1:{options["port"]}',
+                'config.wsgi:application',
+            ],
+            cwd=settings.BASE_DIR, env=env, stdout=log, stderr=log,
+        )
+        try:
+            self.wait_for_server(options['port'], server)
+            return asyncio.run(
+                self.drive(f'http://127.0.0.1:{options["port"]}', options)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+            log.close()
+
+    async def drive(self, url, options):
+        token = await obtain_token(url, BENCH_USERNAME, BENCH_PASSWORD)
+        headers = {'Authorization': f'Token {token}'}
+
+        client = HttpConnection(url)
+        try:
+            _, _, content = await client.request(
+                'GET', '/api/messages/', headers=headers
+            )
+        finally:
+            await client.close()
+        results = json.loads(content)['results']
+        last_id = results[-1]['id'] if results else 0
+        feed_path = f'/api/messages/?after_id={max(last_id - 10, 0)}'
+
+        def feed():
+            return run_load(
+                url, 'GET', feed_path, options['feed_concurrency'],
+                options['duration'], headers=headers
+            )
+
+        baseline = await feed()
+        mixed, logins = await asyncio.gather(
+            feed(),
+            run_load(
+                url, 'POST', '/api/login/', options['login_concurrency'],
+                options['duration'],
+                body={'username': BENCH_USERNAME, 'password': BENCH_PASSWORD}
+            ),
+        )
+        return [
+            {'phase': 'feed_only', 'feed': baseline},
+            {'phase': 'feed_with_logins', 'feed': mixed, 'login': logins},
+        ]
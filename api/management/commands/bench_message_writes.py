@@ -0,0 +1,83 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.batching import MessageWriteBatcher
+from api.benchmarking import summarize
+from api.models import Member, Message
+
+
+class Command(BaseCommand):
+    help = (
+        'Insert messages from concurrent threads against the configured '
+        'database, once one transaction per message and once with group '
+        'commit, and print messages/sec vs commits/sec as JSON. The rows '
+        'written by the benchmark are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument('--window-ms', type=float, default=5.0)
+        parser.add_argument('--max-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        member, _ = Member.objects.get_or_create(username='bench-message-writes')
+        try:
+            for batched in (False, True):
+                batcher = None
+                if batched:
+                    batcher = MessageWriteBatcher(
+                        options['window_ms'] / 1000, options['max_size']
+                    )
+                result = self.run(
+                    member, batcher, options['threads'], options['duration']
+                )
+                self.stdout.write(json.dumps(result))
+        finally:
+            Message.objects.filter(member=member).delete()
+            member.delete()
+
+    def run(self, member, batcher, threads, duration):
+        latencies = []
+        errors = 0
+        deadline = time.monotonic() + duration
+
+        def writer():
+            nonlocal errors
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        if batcher is None:
+                            Message.objects.create(member=member, text='benchmark')
+                        else:
+                            batcher.create(member, 'benchmark')
+                    except Exception:
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        started = time.monotonic()
+        workers = [threading.Thread(target=writer) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+
+        result = summarize(latencies, {}, errors, elapsed)
+        commits = batcher.stats()['commits'] if batcher else len(latencies)
+        result.update({
+            'mode': 'group_commit' if batcher else 'per_message',
+            'threads': threads,
+            'messages_per_s': result.pop('throughput_rps'),
+            'commits_per_s': round(commits / elapsed, 1),
+        })
+        result.pop('statuses')
+        return result
@@ -0,0 +1,66 @@
+import json
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from api.authentication import TokenStorage
+from api.instrumentation import logger as request_logger
+from api.models import Member
+
+
+class Command(BaseCommand):
+    help = (
+        'Time requests through the full middleware stack in-process, once '
+        'with every layer and once with LEAN_API_MIDDLEWARE, and print the '
+        'mean per-request time of each endpoint as JSON. Runs against the '
+        'configured database; the member created for it is deleted '
+        'afterwards.'
+    )
+    paths = ['/api/profile/', '/api/messages/', '/api/metrics/']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        member, _ = Member.objects.get_or_create(username='bench-middleware')
+        token = TokenStorage.create_token(member)
+        headers = {'Authorization': f'Token {token}'}
+        # The per-request log lines would dominate the measurement
+        level = request_logger.level
+        request_logger.setLevel(logging.WARNING)
+        try:
+            for path in self.paths:
+                full = self.best_of(False, path, headers, options)
+                lean = self.best_of(True, path, headers, options)
+                self.stdout.write(json.dumps({
+                    'path': path,
+                    'full_us': round(full * 1e6, 1),
+                    'lean_us': round(lean * 1e6, 1),
+                    'saved_us': round((full - lean) * 1e6, 1),
+                    'speedup': round(full / lean, 2),
+                }))
+        finally:
+            request_logger.setLevel(level)
+            TokenStorage.delete_token(token)
+            member.delete()
+
+    def best_of(self, lean, path, headers, options):
+        """Best mean time per request over --repeat runs"""
+        config = {'ENABLED': lean, 'PREFIX': '/api/'}
+        with override_settings(LEAN_API_MIDDLEWARE=config):
+            # The middleware reads the setting when the handler loads it
+            client = Client()
+            response = client.get(path, headers=headers)
+            if response.status_code != 200:
+                raise AssertionError(f'{path}: {response.status_code}')
+
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                for _ in range(options['requests']):
+                    client.get(path, headers=headers)
+                timings.append(time.perf_counter() - started)
+        return min(timings) / options['requests']
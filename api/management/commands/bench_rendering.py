@@ -0,0 +1,82 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from api.models import Member, Message
+from api.rendering import json_response, message_dicts, message_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Render sets of 1k/10k/100k messages against the configured database, '
+        'once through model instances and DRF JSONRenderer and once through '
+        'api.rendering, and print the best time of each as JSON. The rows '
+        'written by the benchmark are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 100000]
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        member, _ = Member.objects.get_or_create(username='bench-rendering')
+        try:
+            inserted = 0
+            for size in sorted(options['sizes']):
+                now = timezone.now()
+                Message.objects.bulk_create(
+                    [
+                        Message(member=member, author=member.username,
+                                text=f'benchmark message {i}', created_at=now)
+                        for i in range(inserted, size)
+                    ],
+                    batch_size=1000
+                )
+                inserted = size
+                queryset = Message.objects.filter(member=member)
+
+                if self.render_drf(queryset) != self.render_lean(queryset):
+                    raise AssertionError('Rendered bodies differ')
+
+                drf = self.best_of(self.render_drf, queryset, options['repeat'])
+                lean = self.best_of(self.render_lean, queryset, options['repeat'])
+                self.stdout.write(json.dumps({
+                    'messages': size,
+                    'drf_ms': round(drf * 1000, 1),
+                    'lean_ms': round(lean * 1000, 1),
+                    'speedup': round(drf / lean, 2),
+                }))
+        finally:
+            Message.objects.filter(member=member).delete()
+            member.delete()
+
+    def best_of(self, render, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render(queryset)
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def render_drf(self, queryset):
+        """The previous path: model instances, isoformat and JSONRenderer"""
+        messages_data = []
+        for message in queryset.order_by('id'):
+            messages_data.append({
+                'id': message.id,
+                'text': message.text,
+                'author': message.author,
+                'created_at': message.created_at.isoformat()
+            })
+        response = Response(messages_data)
+        return JSONRenderer().render(response.data)
+
+    def render_lean(self, queryset):
+        rows = message_rows(queryset).order_by('id')
+        return json_response(message_dicts(rows)).content
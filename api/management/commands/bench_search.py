@@ -0,0 +1,145 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.search import MessageSearch
+
+# Word ranks of the benchmarked queries in the generated vocabulary, from
+# very common to rare, so the number of matches spans several magnitudes
+QUERIES = {
+    'common': [1],
+    'frequent': [20],
+    'uncommon': [500],
+    'rare': [4000],
+    'two_words': [20, 500],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Search latency benchmark. A scratch SQLite database (the configured '
+        'one is not touched) is seeded with --size messages of random words '
+        'with a Zipf-like frequency distribution. Queries of decreasing word '
+        'frequency are then timed through MessageSearch for the first and a '
+        'later page. Prints one JSON line per query.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1000000)
+        parser.add_argument('--members', type=int, default=1000)
+        parser.add_argument('--vocabulary', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--measure', action='store_true',
+            help='Internal: time the queries against the configured database'
+        )
+
+    def handle(self, *args, **options):
+        if options['measure']:
+            for result in self.measure(options):
+                self.stdout.write(json.dumps(result))
+            return
+
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'DJANGO_DB_PATH': os.path.join(directory, 'db.sqlite3'),
+            }
+            self.manage(env, None, 'migrate', '--noinput', '-v0')
+            self.manage(
+                env, None, 'import_data',
+                '--generate-members', str(options['members'])
+            )
+            started = time.monotonic()
+            self.manage(
+                env, self.generate_messages(options),
+                'import_data', '--messages', '-'
+            )
+            self.stderr.write(
+                f'Seeded {options["size"]} messages in '
+                f'{time.monotonic() - started:.1f}s'
+            )
+            self.stdout.write(self.manage(
+                env, None, 'bench_search', '--measure',
+                '--vocabulary', str(options['vocabulary']),
+                '--repeat', str(options['repeat']),
+                '--limit', str(options['limit']),
+            ).rstrip('\n'))
+
+    def words(self, vocabulary):
+        return [f'w{rank}' for rank in range(1, vocabulary + 1)]
+
+    def generate_messages(self, options):
+        """Yield NDJSON message records of 3 to 20 random words"""
+        rng = random.Random(options['seed'])
+        words = self.words(options['vocabulary'])
+        # Zipf-like: the frequency of a word is inversely proportional to
+        # its rank. Cumulative, so choices() does not sum them on every call.
+        weights = list(
+            accumulate(1 / rank for rank in range(1, len(words) + 1))
+        )
+        authors = [f'loadtest-{i}' for i in range(options['members'])]
+        for i in range(options['size']):
+            count = rng.randint(3, 20)
+            text = ' '.join(rng.choices(words, cum_weights=weights, k=count))
+            record = {'author': authors[i % len(authors)], 'text': text}
+            yield json.dumps(record) + '\n'
+
+    def measure(self, options):
+        words = self.words(options['vocabulary'])
+        limit = options['limit']
+        for name, ranks in QUERIES.items():
+            search = MessageSearch(' '.join(words[rank - 1] for rank in ranks))
+            first, cursor = self.best_of(search, limit, None, options)
+            result = {
+                'query': name,
+                'terms': search.match,
+                'first_page_ms': round(first * 1000, 2),
+            }
+            if cursor is not None:
+                # A later page: skip ahead a few pages first
+                for _ in range(4):
+                    _, next_cursor = search.search(limit, cursor)
+                    cursor = next_cursor or cursor
+                later, _ = self.best_of(search, limit, cursor, options)
+                result['later_page_ms'] = round(later * 1000, 2)
+            yield result
+
+    def best_of(self, search, limit, cursor, options):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            _, next_cursor = search.search(limit, cursor)
+            timings.append(time.perf_counter() - started)
+        return min(timings), next_cursor
+
+    def manage(self, env, stdin_lines, *args):
+        """Run a manage.py command, feeding it stdin_lines if given"""
+        # Files rather than pipes, so output cannot block the writes to stdin
+        with tempfile.TemporaryFile('w+') as stdout, \
+                tempfile.TemporaryFile('w+') as stderr:
+            process = subprocess.Popen(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+                env=env, text=True, stdout=stdout, stderr=stderr,
+                stdin=subprocess.PIPE if stdin_lines is not None else None,
+            )
+            if stdin_lines is not None:
+                process.stdin.writelines(stdin_lines)
+                process.stdin.close()
+            if process.wait() != 0:
+                stderr.seek(0)
+                raise CommandError(
+                    f'manage.py {" ".join(args)} failed:\n{stderr.read()}'
+                )
+            stdout.seek(0)
+            return stdout.read()
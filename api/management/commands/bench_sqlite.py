@@ -0,0 +1,120 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent read/write throughput of a scratch SQLite '
+        'database shaped like the messages table, once with SQLite defaults '
+        'and a new connection per operation (the previous configuration) '
+        'and once with settings.SQLITE_PRAGMAS and persistent connections. '
+        'Prints one JSON line per configuration.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument('--rows', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        configurations = (
+            ('defaults', {}, False),
+            ('tuned', settings.SQLITE_PRAGMAS, True),
+        )
+        for name, pragmas, persistent in configurations:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, options['rows'])
+                result = self.run(path, pragmas, persistent, options)
+                result['configuration'] = name
+                self.stdout.write(json.dumps(result))
+
+    def seed(self, path, rows):
+        conn = sqlite3.connect(path)
+        conn.execute(
+            'CREATE TABLE messages (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'member_id INTEGER NOT NULL, text TEXT NOT NULL, '
+            'created_at DATETIME NOT NULL)'
+        )
+        conn.execute('CREATE INDEX messages_created_at ON messages (created_at)')
+        conn.executemany(
+            'INSERT INTO messages (member_id, text, created_at) '
+            "VALUES (?, ?, datetime('now'))",
+            ((i % 100, f'message {i}') for i in range(rows))
+        )
+        conn.commit()
+        conn.close()
+
+    def connect(self, path, pragmas):
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name}={value}')
+        return conn
+
+    def run(self, path, pragmas, persistent, options):
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def read(conn):
+            conn.execute(
+                'SELECT id, member_id, text, created_at FROM messages '
+                'ORDER BY created_at DESC, id DESC LIMIT 50'
+            ).fetchall()
+
+        def write(conn):
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT INTO messages (member_id, text, created_at) '
+                "VALUES (1, 'benchmark', datetime('now'))"
+            )
+            conn.execute('COMMIT')
+
+        def loop(operation, counter):
+            conn = self.connect(path, pragmas) if persistent else None
+            while time.monotonic() < deadline:
+                current = conn or self.connect(path, pragmas)
+                try:
+                    operation(current)
+                    outcome = counter
+                except sqlite3.OperationalError:
+                    if current.in_transaction:
+                        current.execute('ROLLBACK')
+                    outcome = 'errors'
+                finally:
+                    if conn is None:
+                        current.close()
+                with lock:
+                    counts[outcome] += 1
+            if conn is not None:
+                conn.close()
+
+        threads = [
+            threading.Thread(target=loop, args=(read, 'reads'))
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(target=loop, args=(write, 'writes'))
+            for _ in range(options['writers'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        return {
+            'readers': options['readers'],
+            'writers': options['writers'],
+            'reads_per_s': round(counts['reads'] / elapsed, 1),
+            'writes_per_s': round(counts['writes'] / elapsed, 1),
+            'errors': counts['errors'],
+        }
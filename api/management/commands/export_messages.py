@@ -0,0 +1,54 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import MessageExport
+
+
+class Command(BaseCommand):
+    help = (
+        'Write the whole message history, oldest first, as NDJSON or a JSON '
+        'array to a file or stdout. Messages are read and encoded in chunks, '
+        'so memory use does not grow with the history size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=sorted(MessageExport.content_types),
+            default='ndjson'
+        )
+        parser.add_argument(
+            '--output', default='-', help='File to write, - for stdout'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=MessageExport.default_chunk_size
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        export = MessageExport(options['format'], options['chunk_size'])
+        started = time.monotonic()
+        written = 0
+
+        if options['output'] == '-':
+            stream = sys.stdout.buffer
+        else:
+            stream = open(options['output'], 'wb')
+        try:
+            for chunk in export.iter_bytes():
+                stream.write(chunk)
+                written += len(chunk)
+        finally:
+            if stream is sys.stdout.buffer:
+                stream.flush()
+            else:
+                stream.close()
+
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            f'Exported {export.count} messages ({written} bytes) '
+            f'in {elapsed:.2f}s'
+        )
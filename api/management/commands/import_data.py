@@ -0,0 +1,153 @@
+import json
+import sys
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api.bulk_import import (
+    BulkImporter, deferred_indexes, deferred_search_index
+)
+from api.models import Message
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk load members and messages from NDJSON files (- for stdin), or '
+        'generate synthetic ones for load tests. Members are loaded before '
+        'messages. Rows are inserted in chunks of one transaction each, so a '
+        'failed run keeps the chunks committed before the error.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--members', help='NDJSON with {"username", "password"} or '
+            '{"username", "password_hash"} records'
+        )
+        parser.add_argument(
+            '--messages', help='NDJSON in the export format '
+            '{"author", "text", "created_at"}, oldest first'
+        )
+        parser.add_argument('--generate-members', type=int, default=0)
+        parser.add_argument('--generate-messages', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument(
+            '--default-password',
+            help='Password for members without one, hashed a single time '
+            '(without it they cannot log in)'
+        )
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Create members for unknown message authors'
+        )
+        parser.add_argument(
+            '--keep-indexes', action='store_true',
+            help='Do not drop the messages indexes or pause the search '
+            'index during the load'
+        )
+        parser.add_argument(
+            '--unsafe-drop-indexes', action='store_true',
+            help='Drop the messages indexes even though the table is not '
+            'empty; feed and search queries of a running site slow down '
+            'and miss new messages until the load is done'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        loads_messages = options['messages'] or options['generate_messages']
+        defer_indexes = loads_messages and not options['keep_indexes']
+        if (defer_indexes and not options['unsafe_drop_indexes']
+                and Message.objects.exists()):
+            raise CommandError(
+                'The messages table is not empty, so its indexes would be '
+                'missing for everybody using the database during the load. '
+                'Pass --keep-indexes, or --unsafe-drop-indexes if nothing '
+                'else uses it.'
+            )
+
+        importer = BulkImporter(
+            chunk_size=options['chunk_size'],
+            default_password=options['default_password'],
+            create_authors=options['create_authors'],
+            progress=self.report_progress
+        )
+        self.reported_at = 0.0
+        started = time.monotonic()
+
+        try:
+            with ExitStack() as stack:
+                if options['members']:
+                    importer.import_members(
+                        self.read_records(stack, options['members'])
+                    )
+                if options['generate_members']:
+                    importer.import_members(self.generate_members(
+                        options['generate_members'], importer
+                    ))
+
+                if defer_indexes:
+                    # Recreated and filled once all messages are in
+                    stack.enter_context(deferred_indexes(Message))
+                    stack.enter_context(deferred_search_index())
+                if options['messages']:
+                    importer.import_messages(
+                        self.read_records(stack, options['messages'])
+                    )
+                if options['generate_messages']:
+                    importer.import_messages(self.generate_messages(
+                        options['generate_messages'], importer
+                    ))
+        except (ValueError, IntegrityError) as exc:
+            raise CommandError(f'Import failed: {exc}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(json.dumps({
+            **importer.counts,
+            'elapsed_s': round(elapsed, 2),
+            'rows_per_s': round(
+                sum(importer.counts.values()) / max(elapsed, 1e-9)
+            ),
+        }))
+
+    def read_records(self, stack, path):
+        """Yield the JSON objects of an NDJSON file, skipping blank lines"""
+        if path == '-':
+            stream = sys.stdin
+        else:
+            stream = stack.enter_context(open(path, encoding='utf-8'))
+
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f'{path}:{number}: {exc}')
+            if not isinstance(record, dict):
+                raise ValueError(f'{path}:{number}: not a JSON object')
+            yield record
+
+    def generate_members(self, count, importer):
+        start = len(importer.member_ids)
+        for i in range(start, start + count):
+            yield {'username': f'loadtest-{i}'}
+
+    def generate_messages(self, count, importer):
+        authors = list(importer.member_ids)
+        if not authors:
+            raise ValueError('There are no members to author messages')
+        for i in range(count):
+            yield {
+                'author': authors[i % len(authors)],
+                'text': f'Generated message {i}',
+            }
+
+    def report_progress(self, kind, count, started):
+        now = time.monotonic()
+        if now - self.reported_at < 1:
+            return
+        self.reported_at = now
+        rate = count / max(now - started, 1e-9)
+        self.stderr.write(f'{kind}: {count} ({rate:.0f} rows/s)')
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarking import obtain_token, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive an API endpoint of a running server with concurrent keep-alive '
+        'clients and print throughput and latency percentiles as JSON. '
+        'Pass several --url values to compare servers, e.g. the sync '
+        '(gunicorn config.wsgi) and async (ASGI server with config.asgi) '
+        'deployments pinned to the same cores with taskset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', action='append', dest='urls',
+            help='Base URL of a server to test (repeatable, default http://127.0.0.1:8001)'
+        )
+        parser.add_argument('--path', default='/api/messages/?limit=50')
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--data', help='JSON request body')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--username', default='loadtest')
+        parser.add_argument('--password', default='loadtest-password')
+
+    def handle(self, *args, **options):
+        body = json.loads(options['data']) if options['data'] else None
+
+        for url in options['urls'] or ['http://127.0.0.1:8001']:
+            token = asyncio.run(
+                obtain_token(url, options['username'], options['password'])
+            )
+            result = asyncio.run(run_load(
+                url,
+                options['method'],
+                options['path'],
+                options['concurrency'],
+                options['duration'],
+                headers={'Authorization': f'Token {token}'},
+                body=body,
+            ))
+            result.update({
+                'url': url,
+                'method': options['method'],
+                'path': options['path'],
+                'concurrency': options['concurrency'],
+            })
+            self.stdout.write(json.dumps(result))
@@ -0,0 +1,62 @@
+"""
+Site middleware that stays out of the way of the API.
+
+The API authenticates with TokenAuthentication only and never reads the
+session, the CSRF cookie, request.user or flash messages, yet every /api/
+request used to load them. The classes below are drop-in subclasses of the
+Django middleware for those layers: with LEAN_API_MIDDLEWARE enabled they
+hand requests under its PREFIX straight to the next layer, while every other
+path (the admin) goes through them unchanged. Being subclasses, they still
+satisfy the admin's system checks for the middleware it needs.
+"""
+
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.middleware import csrf
+
+
+class SiteOnlyMixin:
+    """Skip the middleware for requests under the API prefix"""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        config = settings.LEAN_API_MIDDLEWARE
+        self.api_prefix = config['PREFIX'] if config['ENABLED'] else None
+
+    def is_api_request(self, request):
+        return (
+            self.api_prefix is not None
+            and request.path_info.startswith(self.api_prefix)
+        )
+
+    def __call__(self, request):
+        if self.is_api_request(request):
+            # A coroutine in async mode, which the caller awaits
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(SiteOnlyMixin, sessions_middleware.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(SiteOnlyMixin, csrf.CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if self.is_api_request(request):
+            return None
+        return super().process_view(
+            request, callback, callback_args, callback_kwargs
+        )
+
+
+class AuthenticationMiddleware(
+    SiteOnlyMixin, auth_middleware.AuthenticationMiddleware
+):
+    pass
+
+
+class MessageMiddleware(SiteOnlyMixin, messages_middleware.MessageMiddleware):
+    pass
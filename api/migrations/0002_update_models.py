@@ -15,15 +15,18 @@ class Migration(migrations.Migration):
             name='member',
             options={'ordering': ['-created_at']},
         ),
-        migrations.RenameField(
+        migrations.RemoveIndex(
+            model_name='member',
+            name='members_username_idx',
+        ),
+        migrations.RemoveIndex(
             model_name='message',
-            old_name='author',
-            new_name='member',
+            name='messages_author_idx',
         ),
         migrations.RenameField(
             model_name='message',
-            old_name='created_at',
-            new_name='timestamp',
+            old_name='author',
+            new_name='member',
         ),
         migrations.AlterField(
             model_name='member',
@@ -37,19 +40,24 @@ class Migration(migrations.Migration):
         ),
         migrations.AlterField(
             model_name='message',
-            name='timestamp',
-            field=models.DateTimeField(auto_now_add=True, db_index=True),
+            name='member',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='api.member'),
         ),
-        migrations.AlterModelOptions(
-            name='message',
-            options={'ordering': ['timestamp']},
+        migrations.AlterField(
+            model_name='message',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
         ),
-        migrations.AddIndex(
+        migrations.RenameIndex(
             model_name='message',
-            index=models.Index(fields=['timestamp'], name='messages_timesta_idx'),
+            new_name='messages_created_919c58_idx',
+            old_name='messages_created_at_idx',
         ),
         migrations.AddIndex(
             model_name='message',
-            index=models.Index(fields=['member', 'timestamp'], name='messages_member_timesta_idx'),
+            index=models.Index(fields=['member', 'created_at'], name='messages_member__4ad4b6_idx'),
+        ),
+        migrations.DeleteModel(
+            name='MemberToken',
         ),
     ]
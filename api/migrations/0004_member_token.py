@@ -0,0 +1,26 @@
+# Generated migration
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_member_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberToken',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='api.member')),
+            ],
+            options={
+                'db_table': 'member_tokens',
+            },
+        ),
+    ]
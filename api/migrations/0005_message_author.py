@@ -0,0 +1,44 @@
+# Generated migration
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_authors(apps, schema_editor):
+    """Copy each message's member username into the new author column"""
+    Member = apps.get_model('api', 'Member')
+    Message = apps.get_model('api', 'Message')
+    usernames = Member.objects.filter(id=OuterRef('member_id'))
+    Message.objects.update(
+        author=Subquery(usernames.values('username')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_member_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='author',
+            field=models.CharField(default='', editable=False, max_length=150),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_authors, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messages_created_919c58_idx',
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['created_at', 'id'], name='messages_created_0a1d52_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated migration
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text index over message text (see api/search.py).
+    messages_fts is an external content FTS5 table: it stores only the index
+    and reads the text back from messages by rowid. Triggers keep it in sync
+    with every insert, update and delete, including the bulk paths that
+    bypass Model.save().
+    """
+
+    dependencies = [
+        ('api', '0005_message_author'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE messages_fts USING fts5("
+                "text, content='messages', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')",
+                "CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages "
+                "BEGIN "
+                "INSERT INTO messages_fts(rowid, text) "
+                "VALUES (new.id, new.text); "
+                "END",
+                "CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages "
+                "BEGIN "
+                "INSERT INTO messages_fts(messages_fts, rowid, text) "
+                "VALUES ('delete', old.id, old.text); "
+                "END",
+                "CREATE TRIGGER messages_fts_update AFTER UPDATE OF text "
+                "ON messages BEGIN "
+                "INSERT INTO messages_fts(messages_fts, rowid, text) "
+                "VALUES ('delete', old.id, old.text); "
+                "INSERT INTO messages_fts(rowid, text) "
+                "VALUES (new.id, new.text); "
+                "END",
+                # Index the existing history
+                "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER messages_fts_update",
+                "DROP TRIGGER messages_fts_delete",
+                "DROP TRIGGER messages_fts_insert",
+                "DROP TABLE messages_fts",
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated migration
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_message_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255, unique=True)),
+                ('first_id', models.BigIntegerField(unique=True)),
+                ('last_id', models.BigIntegerField()),
+                ('min_created_at', models.DateTimeField()),
+                ('max_created_at', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('size', models.BigIntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'message_archive_segments',
+                'ordering': ['first_id'],
+            },
+        ),
+    ]
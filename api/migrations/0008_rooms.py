@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_archive_segment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Room',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_message_id', models.BigIntegerField(default=0)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.member')),
+            ],
+            options={
+                'db_table': 'rooms',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RoomMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_memberships', to='api.member')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='api.room')),
+            ],
+            options={
+                'db_table': 'room_memberships',
+                'constraints': [models.UniqueConstraint(fields=('member', 'room'), name='unique_room_membership')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RoomMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.CharField(editable=False, max_length=150)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_messages', to='api.member')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='api.room')),
+            ],
+            options={
+                'db_table': 'room_messages',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['room', 'created_at', 'id'], name='room_messag_room_id_2705c5_idx')],
+            },
+        ),
+    ]
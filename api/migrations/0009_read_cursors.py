@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_rooms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadCursor',
+            fields=[
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='read_cursor', serialize=False, to='api.member')),
+                ('last_read_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'read_cursors',
+            },
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='message_count',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='roommembership',
+            name='last_read_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='roommessage',
+            name='seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        # Number the existing room messages and count them per room
+        migrations.RunSQL(
+            sql=[
+                "UPDATE room_messages SET seq = numbered.seq FROM ("
+                "SELECT id, ROW_NUMBER() OVER (PARTITION BY room_id ORDER BY id) "
+                "AS seq FROM room_messages) AS numbered "
+                "WHERE numbered.id = room_messages.id",
+                "UPDATE rooms SET message_count = (SELECT COUNT(*) "
+                "FROM room_messages WHERE room_messages.room_id = rooms.id)",
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
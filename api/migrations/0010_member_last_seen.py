@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_read_cursors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.hashers import make_password, check_password
 
 
@@ -7,6 +7,9 @@ class Member(models.Model):
     username = models.CharField(max_length=150, unique=True, db_index=True)
     password = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Time of the latest authenticated request, written from the shared
+    # presence array at most once per PRESENCE['FLUSH_INTERVAL']
+    last_seen_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         db_table = 'members'
@@ -45,16 +48,159 @@ class Member(models.Model):
 class Message(models.Model):
     """Message model for chat messages"""
     member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='messages')
+    # Copy of member.username, so feed reads never join members. Usernames
+    # cannot change after registration, so the copy does not go stale.
+    author = models.CharField(max_length=150, editable=False)
     text = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'messages'
         ordering = ['created_at']
         indexes = [
-            models.Index(fields=['created_at']),
+            # Keyset pagination order of the feed
+            models.Index(fields=['created_at', 'id']),
             models.Index(fields=['member', 'created_at']),
         ]
 
     def __str__(self):
-        return f'{self.member.username}: {self.text[:50]}'
+        return f'{self.author}: {self.text[:50]}'
+
+    def save(self, *args, **kwargs):
+        """
+        Fill in the author from the member on first save. created_at is
+        assigned inside the transaction, after SQLite's write lock is taken,
+        so concurrent posts get created_at in the same order as their ids
+        and the (created_at, id) feed order agrees with id order.
+        """
+        if not self.author:
+            self.author = self.member.username
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class MemberToken(models.Model):
+    """Authentication token issued to a member at login"""
+    key = models.CharField(max_length=64, primary_key=True)
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='tokens')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'member_tokens'
+
+    def __str__(self):
+        return f'{self.member_id}: {self.key[:8]}'
+
+
+class ReadCursor(models.Model):
+    """
+    Id of the newest global feed message a member has read. The number of
+    unread messages is the newest message id minus last_read_id.
+    """
+    member = models.OneToOneField(
+        Member, on_delete=models.CASCADE, primary_key=True, related_name='read_cursor'
+    )
+    last_read_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'read_cursors'
+
+    def __str__(self):
+        return f'{self.member_id}: {self.last_read_id}'
+
+
+class ArchiveSegment(models.Model):
+    """Index entry of one compressed archive segment (see api/archive.py)"""
+    filename = models.CharField(max_length=255, unique=True)
+    first_id = models.BigIntegerField(unique=True)
+    last_id = models.BigIntegerField()
+    min_created_at = models.DateTimeField()
+    max_created_at = models.DateTimeField()
+    count = models.IntegerField()
+    size = models.BigIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'message_archive_segments'
+        ordering = ['first_id']
+
+    def __str__(self):
+        return f'{self.filename} ({self.count} messages)'
+
+
+class Room(models.Model):
+    """Chat room with its own feed, separate from the global message feed"""
+    name = models.CharField(max_length=100, unique=True)
+    created_by = models.ForeignKey(
+        Member, on_delete=models.SET_NULL, null=True, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Id of the newest message of the room, updated with every post. It
+    # validates the room feed (ETag, cached pages) without touching
+    # room_messages.
+    last_message_id = models.BigIntegerField(default=0)
+    # Number of messages posted to the room, the seq of its newest message
+    message_count = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'rooms'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class RoomMembership(models.Model):
+    """Membership of a member in a room; only members read and post"""
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='memberships')
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='room_memberships')
+    joined_at = models.DateTimeField(auto_now_add=True)
+    # seq of the newest room message the member has read
+    last_read_seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'room_memberships'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['member', 'room'], name='unique_room_membership'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.member_id} in {self.room_id}'
+
+
+class RoomMessage(models.Model):
+    """
+    Message posted to a room. Room messages live in their own table, so the
+    global feed, its archive and search index never see room traffic, and
+    every room query is confined to the room's range of the indexes below.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='messages')
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='room_messages')
+    author = models.CharField(max_length=150, editable=False)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Position of the message in its room, 1 for the first. Ids are shared
+    # by all rooms, seq counts the room's own messages.
+    seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'room_messages'
+        ordering = ['created_at']
+        indexes = [
+            # Keyset pagination order of a room feed. The index SQLite keeps
+            # for the room foreign key is (room, id) and serves the deltas.
+            models.Index(fields=['room', 'created_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f'{self.author}: {self.text[:50]}'
+
+    def save(self, *args, **kwargs):
+        """Fill in the author from the member on first save"""
+        if not self.author:
+            self.author = self.member.username
+        super().save(*args, **kwargs)
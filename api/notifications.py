@@ -0,0 +1,108 @@
+import asyncio
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.db.models import Max
+
+from api.models import Message
+from api.routers import release_read_connection
+
+
+class MessageNotifier:
+    """
+    Wakes up requests that are waiting for new messages.
+    Messages posted in this process wake the waiters immediately. Messages
+    posted by other gunicorn workers are noticed by re-reading MAX(id), which
+    is done at most once per refresh_interval for all waiters of the process.
+    """
+    refresh_interval = 1.0
+    async_poll_interval = 0.1
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._last_id = 0
+        self._refreshed_at = 0.0
+
+    @property
+    def last_id(self):
+        """Newest message id known to this process"""
+        return self._last_id
+
+    def publish(self, message_id):
+        """Record a new message id and wake up everybody waiting for it"""
+        with self._condition:
+            if message_id > self._last_id:
+                self._last_id = message_id
+                self._condition.notify_all()
+
+    def refresh(self):
+        """Pick up messages written by other processes"""
+        now = time.monotonic()
+        with self._condition:
+            if now - self._refreshed_at < self.refresh_interval:
+                return
+            self._refreshed_at = now
+
+        self.publish(self.read_last_id())
+
+    async def arefresh(self):
+        """Async version of refresh()"""
+        now = time.monotonic()
+        with self._condition:
+            if now - self._refreshed_at < self.refresh_interval:
+                return
+            self._refreshed_at = now
+
+        self.publish(await sync_to_async(self.read_last_id)())
+
+    def read_last_id(self):
+        last_id = Message.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        # Waiters must not keep a pooled read connection between refreshes
+        release_read_connection()
+        return last_id
+
+    def check_timeout(self, timeout):
+        # A nan deadline is never reached
+        if not math.isfinite(timeout):
+            raise ValueError('timeout must be finite')
+
+    def wait(self, after_id, timeout):
+        """
+        Block until a message newer than after_id exists or the timeout
+        expires. Returns True if there is something new to fetch.
+        """
+        self.check_timeout(timeout)
+        release_read_connection()
+        deadline = time.monotonic() + timeout
+        while True:
+            self.refresh()
+            with self._condition:
+                if self._last_id > after_id:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(min(remaining, self.refresh_interval))
+
+    async def await_message(self, after_id, timeout):
+        """
+        Async version of wait(). The event loop cannot block on the
+        condition, so it checks the last known id every async_poll_interval
+        seconds, which costs no database queries between refreshes.
+        """
+        self.check_timeout(timeout)
+        await sync_to_async(release_read_connection)()
+        deadline = time.monotonic() + timeout
+        while True:
+            await self.arefresh()
+            if self._last_id > after_id:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(remaining, self.async_poll_interval))
+
+
+message_notifier = MessageNotifier()
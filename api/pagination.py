@@ -0,0 +1,146 @@
+import base64
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Q
+
+from api.archive import message_archive
+from api.models import Message, RoomMessage
+from api.rendering import (
+    ROW_CREATED_AT, ROW_ID, format_created_at, message_rows
+)
+
+
+class MessageKeysetPagination:
+    """
+    Keyset pagination over (created_at, id) for the message feed.
+    Pages are read newest first from the (created_at, id) index of the
+    messages table alone, since the author name is stored on each row,
+    which keeps the cost of a page independent of the history size.
+    Pages reaching past the table are completed from the message archive.
+    """
+    default_limit = 50
+    max_limit = 200
+    archive = message_archive
+
+    def get_limit(self, request):
+        """Read ?limit= and clamp it to max_limit"""
+        limit = request.GET.get('limit')
+        if limit is None:
+            return self.default_limit
+
+        limit = int(limit)
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        return min(limit, self.max_limit)
+
+    def encode_cursor(self, created_at, message_id):
+        """Build an opaque cursor from a message's ISO created_at and id"""
+        raw = f'{created_at}|{message_id}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return the (created_at, id) pair stored in the cursor"""
+        padded = cursor + '=' * (-len(cursor) % 4)
+        try:
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            created_at, message_id = raw.split('|')
+            return datetime.fromisoformat(created_at), int(message_id)
+        except ValueError as exc:
+            raise ValueError('Invalid cursor') from exc
+
+    def paginate_queryset(self, queryset, request):
+        """
+        Return one page of message_rows() tuples in ascending order together
+        with the cursor of the next (older) page, or None when there is no
+        more history.
+        """
+        limit, queryset = self.get_page_queryset(queryset, request)
+        page = list(queryset)
+        if self.archive is not None:
+            page = self.archive.merge_older(page, self.before, limit + 1)
+        return self.build_page(page, limit)
+
+    async def apaginate_queryset(self, queryset, request):
+        """Async version of paginate_queryset() for async views"""
+        limit, queryset = self.get_page_queryset(queryset, request)
+        page = [message async for message in queryset]
+        if self.archive is not None:
+            page = await self.archive.amerge_older(
+                page, self.before, limit + 1
+            )
+        return self.build_page(page, limit)
+
+    def get_delta(self, after_id, limit):
+        """
+        Return up to `limit` message_rows() tuples newer than after_id in id
+        order. Ids grow with created_at, so a primary key range scan returns
+        the delta in order without touching older rows.
+        """
+        rows = message_rows(self.get_delta_queryset(after_id))
+        rows = list(rows.order_by('id')[:limit])
+        if self.archive is None:
+            return rows
+        return self.archive.merge_newer(rows, after_id, limit)
+
+    async def aget_delta(self, after_id, limit):
+        """Async version of get_delta()"""
+        rows = message_rows(self.get_delta_queryset(after_id))
+        rows = [row async for row in rows.order_by('id')[:limit]]
+        if self.archive is None:
+            return rows
+        return await self.archive.amerge_newer(rows, after_id, limit)
+
+    def get_delta_queryset(self, after_id):
+        return Message.objects.filter(id__gt=after_id)
+
+    def get_page_queryset(self, queryset, request):
+        """Return the page size and the queryset fetching one extra row"""
+        limit = self.get_limit(request)
+        before = request.GET.get('before')
+        # (created_at text, id) key of the cursor, in the stored format
+        self.before = None
+
+        if before:
+            created_at, message_id = self.decode_cursor(before)
+            self.before = (
+                connection.ops.adapt_datetimefield_value(created_at),
+                message_id
+            )
+            # The redundant created_at__lte bound lets SQLite seek into the
+            # index instead of scanning it from the newest row.
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at),
+                Q(created_at__lt=created_at) | Q(id__lt=message_id)
+            )
+
+        return limit, queryset.order_by('-created_at', '-id')[:limit + 1]
+
+    def build_page(self, page, limit):
+        """Turn the newest-first rows into an ascending page and next cursor"""
+        has_more = len(page) > limit
+        page = page[:limit]
+        page.reverse()
+
+        next_cursor = None
+        if has_more:
+            oldest = page[0]
+            next_cursor = self.encode_cursor(
+                format_created_at(oldest[ROW_CREATED_AT]), oldest[ROW_ID]
+            )
+
+        return page, next_cursor
+
+
+class RoomMessagePagination(MessageKeysetPagination):
+    """
+    The same keyset pagination over the messages of one room, read from the
+    (room, created_at, id) index of room_messages. Rooms are not archived.
+    """
+    archive = None
+
+    def __init__(self, room_id):
+        self.room_id = room_id
+
+    def get_delta_queryset(self, after_id):
+        return RoomMessage.objects.filter(room_id=self.room_id, id__gt=after_id)
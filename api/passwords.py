@@ -0,0 +1,102 @@
+"""
+Password hashing off the request threads.
+
+PBKDF2 at Django's default cost takes hundreds of milliseconds of CPU per
+password. Run inline, a burst of logins or registrations keeps every core
+busy and stalls message traffic served by the same workers. Hashing is
+therefore done by a small per-process PasswordHashingPool: at most WORKERS
+passwords are hashed at a time in each process, up to QUEUE_SIZE more
+requests wait for a turn, and any further request is turned away at once
+with PasswordHashingBusy instead of piling up.
+
+The PBKDF2 iteration count comes from settings.PASSWORD_HASHING. Stored
+hashes made with a different count are upgraded on the next successful
+login, in the same pool call that verifies them.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from api.instrumentation import timed
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with the iteration count taken from
+    settings.PASSWORD_HASHING, so it can be tuned per deployment.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHING['ITERATIONS']
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue of the process is full"""
+
+
+def verify_password(raw_password, encoded):
+    """
+    Check a password against its stored hash. Returns (valid, rehashed)
+    where rehashed is a new hash with the current hasher parameters when
+    the stored one is outdated, otherwise None.
+    """
+    rehashed = []
+    valid = hashers.check_password(
+        raw_password, encoded,
+        setter=lambda raw: rehashed.append(hashers.make_password(raw))
+    )
+    return valid, rehashed[0] if rehashed else None
+
+
+class PasswordHashingPool:
+    """Bounded executor for password hashing, see the module docstring"""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @property
+    def executor(self):
+        # Threads do not survive gunicorn's fork, so every worker process
+        # starts its own on first use
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix='password-hashing'
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, function, *args):
+        """Run function(*args) in the pool and wait for its result"""
+        if not self.workers:
+            with timed('hashing'):
+                return function(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy
+        try:
+            with timed('hashing'):
+                return self.executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def make_password(self, raw_password):
+        return self.run(hashers.make_password, raw_password)
+
+    def verify_password(self, raw_password, encoded):
+        """Pooled verify_password()"""
+        return self.run(verify_password, raw_password, encoded)
+
+
+config = settings.PASSWORD_HASHING
+password_hashing = PasswordHashingPool(config['WORKERS'], config['QUEUE_SIZE'])
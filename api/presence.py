@@ -0,0 +1,198 @@
+"""
+Online presence of members.
+
+TokenAuthentication reports every authenticated request to PresenceTracker,
+which keeps the time of each member's latest request in an array of 32-bit
+Unix timestamps indexed by member id, 4 bytes per member. The array lives in
+an anonymous shared memory mapping created when the app loads, so with
+preload_app every gunicorn worker records into and reads the same array.
+Recording is a single aligned 4-byte store without locking; the lock only
+guards the header (high-water member id and time of the last flush).
+
+Members seen within ONLINE_WINDOW seconds are online. Listing them scans the
+array up to the highest member id seen so far, which takes tens of
+milliseconds per million ids, so each process reuses its last scan for a
+second.
+
+Polling clients would turn a last_seen column into a write on every request,
+so Member.last_seen_at is written from the array instead: the first request
+after FLUSH_INTERVAL claims the flush for all workers and updates, in one
+transaction, the members seen since the previous flush.
+"""
+
+import logging
+import mmap
+import multiprocessing
+import struct
+import time
+from datetime import datetime, timezone as dt_timezone
+from heapq import nlargest
+from itertools import compress
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from api.cache import LRUCache
+from api.models import Member
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceTracker:
+    """Shared array of last request times by member id, see the module docstring"""
+    # Time of the last flush and highest member id recorded
+    _header = struct.Struct('<dq')
+
+    def __init__(self, max_member_id, online_window, flush_interval):
+        self.max_member_id = max_member_id
+        self.online_window = online_window
+        self.flush_interval = flush_interval
+        self._lock = multiprocessing.Lock()
+        self._buffer = mmap.mmap(-1, self._header.size + max_member_id * 4)
+        self._header.pack_into(self._buffer, 0, time.time(), 0)
+        self._seen = memoryview(self._buffer)[self._header.size:].cast('I')
+        self._online = LRUCache(1, 1.0)
+
+    def mark_seen(self, member_id):
+        """Record a request of the member, flushing if the interval passed"""
+        if self.record(member_id):
+            self.flush()
+
+    async def amark_seen(self, member_id):
+        """Async version of mark_seen()"""
+        if self.record(member_id):
+            await sync_to_async(self.flush)()
+
+    def record(self, member_id):
+        """Store the request time, returns True if a flush is due"""
+        if not 0 < member_id < self.max_member_id:
+            return False
+
+        now = time.time()
+        second = int(now)
+        if self._seen[member_id] != second:
+            self._seen[member_id] = second
+            if member_id > self._high_water():
+                with self._lock:
+                    flushed_at, high = self._header.unpack_from(self._buffer, 0)
+                    if member_id > high:
+                        self._header.pack_into(
+                            self._buffer, 0, flushed_at, member_id
+                        )
+        return now - self._flushed_at() >= self.flush_interval
+
+    def online(self):
+        """Return (member id, last seen) pairs of the members online now"""
+        online = self._online.get('online')
+        if online is None:
+            online = self.scan(int(time.time()) - self.online_window)
+            self._online.set('online', online)
+        return online
+
+    def scan(self, cutoff):
+        """(member id, last seen) pairs of the members seen since cutoff"""
+        seen = self._seen[:self._high_water() + 1]
+        # compress() and map() filter the array without a Python-level loop
+        return [
+            (member_id, seen[member_id])
+            for member_id in compress(range(len(seen)), map(cutoff.__le__, seen))
+        ]
+
+    def most_recent(self, online, limit):
+        """The `limit` most recently seen of the online() pairs"""
+        return nlargest(limit, online, key=lambda pair: (pair[1], pair[0]))
+
+    def flush(self):
+        """
+        Write last_seen_at of the members seen since the previous flush,
+        unless another thread or worker flushed within the interval
+        """
+        with self._lock:
+            previous, high = self._header.unpack_from(self._buffer, 0)
+            now = time.time()
+            if now - previous < self.flush_interval:
+                return
+            self._header.pack_into(self._buffer, 0, now, high)
+
+        # Never-seen members hold 0, which max() skips
+        seen = self.scan(max(int(previous), 1))
+        if not seen:
+            return
+
+        try:
+            self.write(seen)
+        except DatabaseError as exc:
+            logger.warning('Presence flush failed: %r', exc)
+            # Let the next request retry the same members
+            with self._lock:
+                flushed_at, high = self._header.unpack_from(self._buffer, 0)
+                if flushed_at == now:
+                    self._header.pack_into(self._buffer, 0, previous, high)
+
+    def write(self, seen):
+        adapt = connection.ops.adapt_datetimefield_value
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                'UPDATE members SET last_seen_at = %s WHERE id = %s',
+                [
+                    (adapt(datetime.fromtimestamp(second, dt_timezone.utc)),
+                     member_id)
+                    for member_id, second in seen
+                ]
+            )
+
+    def _flushed_at(self):
+        return self._header.unpack_from(self._buffer, 0)[0]
+
+    def _high_water(self):
+        return self._header.unpack_from(self._buffer, 0)[1]
+
+
+def online_members(limit):
+    """
+    Return the number of members online and the `limit` most recently seen
+    of them, newest first
+    """
+    online = presence.online()
+    recent = presence.most_recent(online, limit)
+    usernames = Member.objects.filter(
+        id__in=[member_id for member_id, _ in recent]
+    ).values_list('id', 'username')
+    return render_online(online, recent, dict(usernames))
+
+
+async def aonline_members(limit):
+    """Async version of online_members()"""
+    online = presence.online()
+    recent = presence.most_recent(online, limit)
+    usernames = Member.objects.filter(
+        id__in=[member_id for member_id, _ in recent]
+    ).values_list('id', 'username')
+    return render_online(
+        online, recent, {pk: name async for pk, name in usernames}
+    )
+
+
+def render_online(online, recent, usernames):
+    return {
+        'count': len(online),
+        'results': [
+            {
+                'id': member_id,
+                'username': usernames[member_id],
+                'last_seen': datetime.fromtimestamp(
+                    second, dt_timezone.utc
+                ).isoformat(),
+            }
+            for member_id, second in recent
+            # Deleted since their last request
+            if member_id in usernames
+        ],
+    }
+
+
+config = settings.PRESENCE
+presence = PresenceTracker(
+    config['MAX_MEMBER_ID'], config['ONLINE_WINDOW'], config['FLUSH_INTERVAL']
+)
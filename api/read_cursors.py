@@ -0,0 +1,192 @@
+"""
+Read positions of members and their unread counts.
+
+A member's position in the global feed is the id of the newest message they
+have read (ReadCursor.last_read_id), in a room it is the seq of the newest
+room message read (RoomMembership.last_read_seq). Message ids are assigned
+in order and never reused, and room messages are numbered by seq, so the
+unread counts are the newest message id minus the position and
+Room.message_count minus the seq. Both come from primary key lookups and
+the notifier's newest id instead of counting rows, whatever the size of the
+history.
+
+Positions only move forward. They advance when a member acknowledges
+messages and when they fetch the feed: a ?after_id= poll shows the client
+has everything up to after_id (never past the newest message), the latest
+page ends with the newest message.
+Writing a position on every poll would turn the polled reads into writes,
+so fetched positions are buffered per process and written in one
+transaction at most once per FLUSH_INTERVAL, merged with MAX() so that a
+slower worker never moves a position back. Acknowledgements are written
+immediately. A crash or a failed flush loses at most one interval of
+fetched positions, which the next fetch marks again.
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from api.models import ReadCursor, RoomMembership
+from api.notifications import message_notifier
+
+logger = logging.getLogger(__name__)
+
+
+class ReadPositions:
+    """Per-process buffer of fetched read positions, see the module docstring"""
+
+    def __init__(self, flush_interval=1.0):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # member id -> last read message id
+        self._feed = {}
+        # (room id, member id) -> last read seq
+        self._rooms = {}
+        self._flushed_at = time.monotonic()
+
+    def last_read_id(self, member_id):
+        """Buffered global feed position of the member, 0 if none"""
+        return self._feed.get(member_id, 0)
+
+    def last_read_seq(self, room_id, member_id):
+        """Buffered room position of the member, 0 if none"""
+        return self._rooms.get((room_id, member_id), 0)
+
+    def mark_read(self, member_id, message_id, flush=False):
+        """Record that the member has read the global feed up to message_id"""
+        if self.buffer(self._feed, member_id, message_id, flush):
+            self.flush()
+
+    async def amark_read(self, member_id, message_id):
+        """Async version of mark_read() for feed fetches"""
+        if self.buffer(self._feed, member_id, message_id, False):
+            await sync_to_async(self.flush)()
+
+    def mark_room_read(self, room_id, member_id, seq, flush=False):
+        """Record that the member has read the room up to seq"""
+        if self.buffer(self._rooms, (room_id, member_id), seq, flush):
+            self.flush()
+
+    async def amark_room_read(self, room_id, member_id, seq):
+        """Async version of mark_room_read() for feed fetches"""
+        if self.buffer(self._rooms, (room_id, member_id), seq, False):
+            await sync_to_async(self.flush)()
+
+    def buffer(self, pending, key, position, flush):
+        """Keep the highest position per key, returns True if a flush is due"""
+        with self._lock:
+            if position > pending.get(key, 0):
+                pending[key] = position
+            return flush or (
+                time.monotonic() - self._flushed_at >= self.flush_interval
+            )
+
+    def flush(self):
+        """Write the buffered positions in one transaction"""
+        with self._lock:
+            feed, rooms = self._feed, self._rooms
+            self._feed, self._rooms = {}, {}
+            self._flushed_at = time.monotonic()
+        if not feed and not rooms:
+            return
+
+        try:
+            self.write(feed, rooms)
+        except DatabaseError as exc:
+            logger.warning(
+                'Dropped %d read positions: %r', len(feed) + len(rooms), exc
+            )
+
+    def write(self, feed, rooms):
+        updated_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        with transaction.atomic(), connection.cursor() as cursor:
+            if feed:
+                # Members deleted since their fetch are skipped, the foreign
+                # key would otherwise roll back the whole batch
+                cursor.executemany(
+                    'INSERT INTO read_cursors (member_id, last_read_id, '
+                    'updated_at) SELECT %s, %s, %s '
+                    'WHERE EXISTS (SELECT 1 FROM members WHERE id = %s) '
+                    'ON CONFLICT (member_id) DO UPDATE SET '
+                    'last_read_id = MAX(last_read_id, excluded.last_read_id), '
+                    'updated_at = excluded.updated_at',
+                    [
+                        (member_id, last_read_id, updated_at, member_id)
+                        for member_id, last_read_id in feed.items()
+                    ]
+                )
+            if rooms:
+                cursor.executemany(
+                    'UPDATE room_memberships '
+                    'SET last_read_seq = MAX(last_read_seq, %s) '
+                    'WHERE room_id = %s AND member_id = %s',
+                    [
+                        (seq, room_id, member_id)
+                        for (room_id, member_id), seq in rooms.items()
+                    ]
+                )
+
+
+def unread_counts(member):
+    """
+    Return the member's global feed position and unread count, plus the
+    unread count of every room they have joined.
+    """
+    message_notifier.refresh()
+    stored = ReadCursor.objects.filter(member=member).values_list(
+        'last_read_id', flat=True
+    ).first()
+    rooms = list(room_positions(member))
+    return render_counts(member, message_notifier.last_id, stored, rooms)
+
+
+async def aunread_counts(member):
+    """Async version of unread_counts()"""
+    await message_notifier.arefresh()
+    stored = await ReadCursor.objects.filter(member=member).values_list(
+        'last_read_id', flat=True
+    ).afirst()
+    rooms = [row async for row in room_positions(member)]
+    return render_counts(member, message_notifier.last_id, stored, rooms)
+
+
+def room_positions(member):
+    return RoomMembership.objects.filter(member=member).order_by(
+        'room__name'
+    ).values_list(
+        'room_id', 'room__name', 'room__message_count', 'last_read_seq'
+    )
+
+
+def render_counts(member, last_id, stored, rooms):
+    last_read_id = max(stored or 0, read_positions.last_read_id(member.id))
+    return {
+        'last_id': last_id,
+        'last_read_id': last_read_id,
+        'unread': max(last_id - last_read_id, 0),
+        'rooms': [
+            {
+                'id': room_id,
+                'name': name,
+                'unread': max(
+                    message_count - max(
+                        last_read_seq,
+                        read_positions.last_read_seq(room_id, member.id)
+                    ),
+                    0
+                ),
+            }
+            for room_id, name, message_count, last_read_seq in rooms
+        ],
+    }
+
+
+read_positions = ReadPositions(settings.READ_CURSORS['FLUSH_INTERVAL'])
+# Do not lose the last interval when a worker exits normally
+atexit.register(read_positions.flush)
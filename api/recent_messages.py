@@ -0,0 +1,348 @@
+import mmap
+import multiprocessing
+import struct
+
+from django.conf import settings
+
+from api.models import Message
+from api.notifications import message_notifier
+from api.pagination import MessageKeysetPagination
+from api.rendering import (
+    ROW_CREATED_AT, ROW_ID, format_created_at, json_bytes, message_dicts,
+    message_rows,
+)
+
+# Slot lengths with a special meaning
+GAP = -1  # no message has this id
+TOO_LARGE = -2  # the message does not fit in a slot
+
+# Read outcomes besides a result
+MISSING = object()  # a slot is empty or overwritten, reloading may help
+UNAVAILABLE = object()  # the ring cannot answer, use the database
+
+
+class RecentMessageBuffer:
+    """
+    Ring of the newest messages, each stored as its pre-rendered JSON in a
+    fixed-size slot of an anonymous shared memory mapping.
+    The mapping is created when the app loads, so with preload_app every
+    gunicorn worker forked afterwards reads and appends to the same ring.
+    Message `id` lives in slot `id % size` together with its id, so a read
+    can tell a stored message from an overwritten or never filled slot.
+    Reads only answer when every id of the requested range is present;
+    otherwise the window is reloaded from the database once, and callers
+    fall back to their regular query if it still cannot be answered.
+
+    The latest page is read in id order, while the feed pages by
+    (created_at, id). Message.save() keeps the two in agreement, but
+    imports and direct writes can store any created_at, so every message is
+    checked against its neighbours when it is stored. After an inversion
+    the ring stops answering pages until `size` newer messages, all in
+    order, have replaced the ids involved; deltas go by id and are not
+    affected.
+
+    The newest stored id in the shared header is what every worker reads to
+    find the latest messages, so reads answer without a database query.
+    Messages enter the ring when they are saved (see api.signals) or posted
+    through the write batcher. Writes that bypass both, such as a bulk
+    import, are picked up once the message notifier has seen a newer id.
+    Deleted messages are turned into gaps.
+    """
+    # Newest id, id before which pages are not answered, newest created_at
+    _header = struct.Struct('<qq32s')
+    _slot = struct.Struct('<qi32s')
+
+    def __init__(self, size, slot_size):
+        self.size = size
+        self.slot_size = slot_size
+        self.max_body_size = slot_size - self._slot.size
+        self._lock = multiprocessing.Lock()
+        self._buffer = mmap.mmap(-1, self._header.size + size * slot_size)
+
+    def last_id(self):
+        """Newest message id stored in the ring"""
+        with self._lock:
+            return self._header.unpack_from(self._buffer, 0)[0]
+
+    def add(self, messages, gaps=()):
+        """
+        Store messages in their API representation, plus the ids that are
+        known not to exist so reads can skip over them.
+        """
+        encoded = [
+            (message['id'], message['created_at'], json_bytes(message))
+            for message in messages
+        ]
+        with self._lock:
+            for message_id in gaps:
+                self._write(message_id, GAP)
+            for message_id, created_at, body in encoded:
+                self._write(message_id, len(body), created_at, body)
+
+    def discard(self, message_ids):
+        """
+        Mark deleted messages as gaps. Ids are not reused, so they stay
+        gaps; ids newer than the ring are left to the next load.
+        """
+        with self._lock:
+            last_id = self._header.unpack_from(self._buffer, 0)[0]
+            for message_id in message_ids:
+                if message_id <= last_id:
+                    self._write(message_id, GAP)
+
+    def clear(self):
+        with self._lock:
+            self._buffer[:] = bytes(len(self._buffer))
+
+    def page(self, limit):
+        """
+        Return (last_id, body) for the latest feed page, rendered exactly
+        like MessageListCreateView, or None if the ring cannot answer.
+        """
+        return self._answer(lambda: self._read_page(limit))
+
+    async def apage(self, limit):
+        """Async version of page()"""
+        return await self._aanswer(lambda: self._read_page(limit))
+
+    def delta(self, after_id, limit):
+        """Return (last_id, body) for the messages newer than after_id"""
+        return self._answer(lambda: self._read_delta(after_id, limit))
+
+    async def adelta(self, after_id, limit):
+        """Async version of delta()"""
+        return await self._aanswer(lambda: self._read_delta(after_id, limit))
+
+    def load(self, low_id):
+        """Fill the ring with the newest messages that have an id > low_id"""
+        rows = message_rows(Message.objects.filter(id__gt=low_id))
+        rows = list(rows.order_by('-id')[:self.size])
+        if rows:
+            older = list(self._newest_before(rows[-1][ROW_ID]))
+            self._store(low_id, rows, older)
+
+    async def aload(self, low_id):
+        """Async version of load()"""
+        rows = message_rows(Message.objects.filter(id__gt=low_id))
+        rows = [row async for row in rows.order_by('-id')[:self.size]]
+        if rows:
+            older = [row async for row in self._newest_before(rows[-1][ROW_ID])]
+            self._store(low_id, rows, older)
+
+    def _newest_before(self, message_id):
+        """
+        The newest message by (created_at, id) among the ids below the
+        loaded ones, which have to be older than all of them. Walks the
+        (created_at, id) index backwards, past the loaded messages only.
+        """
+        return message_rows(
+            Message.objects.filter(id__lt=message_id)
+        ).order_by('-created_at', '-id')[:1]
+
+    def _answer(self, read):
+        last_id = self.last_id()
+        if last_id < message_notifier.last_id:
+            # Written without going through the ring, e.g. an import
+            self.load(last_id)
+
+        result = read()
+        if result is MISSING:
+            self.load(max(self.last_id() - self.size, 0))
+            result = read()
+        if result is MISSING or result is UNAVAILABLE:
+            return None
+        return result
+
+    async def _aanswer(self, read):
+        last_id = self.last_id()
+        if last_id < message_notifier.last_id:
+            await self.aload(last_id)
+
+        result = read()
+        if result is MISSING:
+            await self.aload(max(self.last_id() - self.size, 0))
+            result = read()
+        if result is MISSING or result is UNAVAILABLE:
+            return None
+        return result
+
+    def _store(self, low_id, rows, older=()):
+        """
+        Store newest-first rows and mark the ids between them as gaps.
+        `older` holds the newest row below them by (created_at, id), if any.
+        """
+        if not rows:
+            return
+        if len(rows) == self.size:
+            # Older ids were cut off by the limit, not missing
+            low_id = rows[-1][ROW_ID] - 1
+
+        present = {row[ROW_ID] for row in rows}
+        gaps = [
+            message_id for message_id in range(low_id + 1, rows[0][ROW_ID])
+            if message_id not in present
+        ]
+        self.add(message_dicts(rows), gaps)
+        if older:
+            with self._lock:
+                if older[0][ROW_CREATED_AT] > rows[-1][ROW_CREATED_AT]:
+                    self._disorder(rows[0][ROW_ID])
+                # Later messages have to be newer than this one as well
+                self._write_header(
+                    newest=format_created_at(older[0][ROW_CREATED_AT])
+                )
+
+    def _read_page(self, limit):
+        with self._lock:
+            last_id, disordered_until, _ = self._header.unpack_from(
+                self._buffer, 0
+            )
+            if last_id < disordered_until:
+                # Id order is not the feed order in this window
+                return UNAVAILABLE
+
+            entries = []
+            message_id = last_id
+            while message_id > 0 and len(entries) <= limit:
+                if last_id - message_id >= self.size:
+                    return UNAVAILABLE
+                entry = self._read(message_id)
+                if entry is MISSING or entry is UNAVAILABLE:
+                    return entry
+                if entry is not None:
+                    entries.append(entry)
+                message_id -= 1
+
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        entries.reverse()
+
+        next_cursor = None
+        if has_more:
+            oldest_id, oldest_created_at, _ = entries[0]
+            next_cursor = MessageKeysetPagination().encode_cursor(
+                oldest_created_at, oldest_id
+            )
+
+        body = b''.join([
+            b'{"results":[',
+            b','.join(body for _, _, body in entries),
+            b'],"next_cursor":',
+            json_bytes(next_cursor),
+            b'}',
+        ])
+        return last_id, body
+
+    def _read_delta(self, after_id, limit):
+        with self._lock:
+            last_id = self._header.unpack_from(self._buffer, 0)[0]
+            if after_id < 0 or last_id - after_id > self.size:
+                return UNAVAILABLE
+
+            bodies = []
+            message_id = after_id + 1
+            while message_id <= last_id and len(bodies) < limit:
+                entry = self._read(message_id)
+                if entry is MISSING or entry is UNAVAILABLE:
+                    return entry
+                if entry is not None:
+                    bodies.append(entry[2])
+                message_id += 1
+
+        return last_id, b'[' + b','.join(bodies) + b']'
+
+    def _offset(self, message_id):
+        return self._header.size + (message_id % self.size) * self.slot_size
+
+    def _read(self, message_id):
+        """Return (id, created_at, body), or None for a gap"""
+        offset = self._offset(message_id)
+        slot_id, length, created_at = self._slot.unpack_from(
+            self._buffer, offset
+        )
+        if slot_id != message_id:
+            return MISSING
+        if length == TOO_LARGE:
+            return UNAVAILABLE
+        if length == GAP:
+            return None
+
+        start = offset + self._slot.size
+        return (
+            message_id,
+            created_at.rstrip(b'\0').decode(),
+            self._buffer[start:start + length],
+        )
+
+    def _write(self, message_id, length, created_at='', body=b''):
+        offset = self._offset(message_id)
+        slot_id = self._slot.unpack_from(self._buffer, offset)[0]
+        if slot_id > message_id:
+            return
+
+        if length != GAP:
+            self._check_order(message_id, created_at)
+        if length > self.max_body_size:
+            length = TOO_LARGE
+        self._slot.pack_into(
+            self._buffer, offset, message_id, length, created_at.encode()
+        )
+        if length > 0:
+            start = offset + self._slot.size
+            self._buffer[start:start + length] = body
+
+        self._write_header(message_id, newest=created_at)
+
+    def _check_order(self, message_id, created_at):
+        """Flag pages as unavailable if created_at is out of id order"""
+        last_id, _, newest = self._header.unpack_from(self._buffer, 0)
+        created_at = created_at.encode()
+        if message_id > last_id:
+            # Every message stored so far has a lower id
+            inverted = created_at < newest.rstrip(b'\0')
+        else:
+            lower = self._neighbour_created_at(message_id, -1, last_id)
+            higher = self._neighbour_created_at(message_id, 1, last_id)
+            inverted = (
+                (lower is not None and lower > created_at)
+                or (higher is not None and higher < created_at)
+            )
+        if inverted:
+            self._disorder(max(message_id, last_id))
+
+    def _neighbour_created_at(self, message_id, step, last_id):
+        """
+        created_at of the nearest stored message in direction step, skipping
+        gaps, or None if an empty slot or the end of the window comes first
+        """
+        message_id += step
+        while 0 < message_id <= last_id and last_id - message_id < self.size:
+            slot_id, length, created_at = self._slot.unpack_from(
+                self._buffer, self._offset(message_id)
+            )
+            if slot_id != message_id:
+                return None
+            if length != GAP:
+                return created_at.rstrip(b'\0')
+            message_id += step
+        return None
+
+    def _disorder(self, message_id):
+        """Stop answering pages until message_id has left the window"""
+        self._write_header(disordered_until=message_id + self.size)
+
+    def _write_header(self, last_id=0, disordered_until=0, newest=''):
+        """Raise the header fields to at least the given values"""
+        header = self._header.unpack_from(self._buffer, 0)
+        self._header.pack_into(
+            self._buffer, 0,
+            max(header[0], last_id),
+            max(header[1], disordered_until),
+            max(header[2], newest.encode()),
+        )
+
+
+recent_messages = RecentMessageBuffer(
+    settings.RECENT_MESSAGES['SIZE'],
+    settings.RECENT_MESSAGES['SLOT_SIZE'],
+)
@@ -0,0 +1,160 @@
+"""
+Rooms: chat feeds of their own next to the global message feed.
+
+Room messages are stored in room_messages and every read is confined to the
+room's range of its (room, created_at, id) and (room, id) indexes, so the
+cost and the payload of a room feed follow that room's activity instead of
+the total traffic.
+
+Room.last_message_id is bumped in the transaction of every post. It is read
+together with the membership check in a single query and validates the
+room feed: it is the ETag, it answers up-to-date ?after_id= polls without
+reading room_messages, and it is part of the key of the per-process cache of
+rendered latest pages, so a cached page can never be stale.
+Room.message_count is bumped in the same transaction and numbers the room's
+messages (RoomMessage.seq) for the unread counts of api/read_cursors.py.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.http import quote_etag
+
+from api.cache import LRUCache
+from api.models import Room, RoomMembership, RoomMessage
+from api.read_cursors import read_positions
+from api.rendering import ROW_ID
+
+# Rendered latest pages by (room id, last message id, limit). Entries are
+# replaced by newer keys rather than invalidated, so they never expire.
+page_cache = LRUCache(settings.ROOMS['PAGE_CACHE_SIZE'], float('inf'))
+
+
+class RoomAccessDenied(Exception):
+    """Raised when a member reads or posts to a room they have not joined"""
+
+
+class RoomFeed:
+    """The feed of one room as seen by one member"""
+
+    def __init__(self, room_id, member):
+        self.room_id = room_id
+        self.member = member
+        self.message_count = 0
+
+    def get_last_message_id(self):
+        """
+        Return the id of the room's newest message, 0 for an empty room,
+        and load the room's message_count with it.
+        Raises Room.DoesNotExist or RoomAccessDenied when the member cannot
+        read the room.
+        """
+        counters = self.counters().first()
+        if counters is None:
+            self.deny(Room.objects.filter(id=self.room_id).exists())
+        last_id, self.message_count = counters
+        return last_id
+
+    async def aget_last_message_id(self):
+        """Async version of get_last_message_id()"""
+        counters = await self.counters().afirst()
+        if counters is None:
+            self.deny(await Room.objects.filter(id=self.room_id).aexists())
+        last_id, self.message_count = counters
+        return last_id
+
+    def counters(self):
+        return RoomMembership.objects.filter(
+            room_id=self.room_id, member=self.member
+        ).values_list('room__last_message_id', 'room__message_count')
+
+    def deny(self, room_exists):
+        if not room_exists:
+            raise Room.DoesNotExist
+        raise RoomAccessDenied
+
+    def etag(self, last_id):
+        return quote_etag(f'room-{self.room_id}-{last_id}')
+
+    def get_cached_page(self, last_id, limit):
+        """Return the rendered latest page, or None if it is not cached"""
+        return page_cache.get((self.room_id, last_id, limit))
+
+    def cache_page(self, last_id, limit, body):
+        page_cache.set((self.room_id, last_id, limit), body)
+
+    def mark_read(self):
+        """
+        Record that the member has read the whole room, as of the last
+        get_last_message_id()
+        """
+        read_positions.mark_room_read(
+            self.room_id, self.member.id, self.message_count
+        )
+
+    async def amark_read(self):
+        """Async version of mark_read()"""
+        await read_positions.amark_room_read(
+            self.room_id, self.member.id, self.message_count
+        )
+
+    def mark_delta_read(self, rows, limit):
+        """
+        Record that the member has read the room up to the last message of
+        a ?after_id= delta. A delta shorter than `limit` reaches the newest
+        message, so it needs no seq lookup.
+        """
+        if len(rows) < limit:
+            self.mark_read()
+        else:
+            read_positions.mark_room_read(
+                self.room_id, self.member.id, self.get_seq(rows[-1][ROW_ID])
+            )
+
+    async def amark_delta_read(self, rows, limit):
+        """Async version of mark_delta_read()"""
+        if len(rows) < limit:
+            await self.amark_read()
+        else:
+            await read_positions.amark_room_read(
+                self.room_id, self.member.id,
+                await self.aget_seq(rows[-1][ROW_ID])
+            )
+
+    def get_seq(self, message_id):
+        """seq of the room's newest message up to message_id, 0 if none"""
+        return self.seq_queryset(message_id).first() or 0
+
+    async def aget_seq(self, message_id):
+        """Async version of get_seq()"""
+        return await self.seq_queryset(message_id).afirst() or 0
+
+    def seq_queryset(self, message_id):
+        return RoomMessage.objects.filter(
+            room_id=self.room_id, id__lte=message_id
+        ).order_by('-id').values_list('seq', flat=True)
+
+    def post(self, text):
+        """
+        Store a message, number it and make it the room's newest in one
+        transaction
+        """
+        with transaction.atomic():
+            Room.objects.filter(id=self.room_id).update(
+                message_count=F('message_count') + 1
+            )
+            seq = Room.objects.values_list(
+                'message_count', flat=True
+            ).get(id=self.room_id)
+            message = RoomMessage.objects.create(
+                room_id=self.room_id, member=self.member, text=text, seq=seq
+            )
+            Room.objects.filter(
+                id=self.room_id, last_message_id__lt=message.id
+            ).update(last_message_id=message.id)
+        return message
+
+    async def apost(self, text):
+        """Async version of post()"""
+        return await sync_to_async(self.post)(text)
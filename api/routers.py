@@ -0,0 +1,90 @@
+"""
+Routing of reads to the read-only database alias.
+
+ReadOnlyRequestMiddleware marks GET and HEAD requests. While such a
+request is handled, ReadOnlyRouter sends its reads to
+settings.READ_ONLY_DATABASE['READ_ALIAS']. That alias opens the same SQLite
+file read-only from a small per-process pool (see
+api/db_backends/sqlite_pool), so feed, profile and search reads never
+hold a connection of the default alias and never take its write lock.
+Everything else goes to the default database:
+- writes, which GET requests also make, e.g. when sweeping expired tokens;
+- reads inside transactions, so they see the transaction's own writes;
+- reads outside requests.
+Both aliases read the same file, so there is no replication lag.
+
+Pooled connections are returned at the end of the request; code that
+blocks for long, like the long-poll wait, returns its connection earlier
+with release_read_connection().
+"""
+
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+config = settings.READ_ONLY_DATABASE
+
+_read_only = ContextVar('read_only_request', default=False)
+
+
+def release_read_connection():
+    """Give this thread's read-only connection back to the pool"""
+    connection = connections[config['READ_ALIAS']]
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+class ReadOnlyRouter:
+    """Send the reads of read-only requests to the read-only alias"""
+
+    def db_for_read(self, model, **hints):
+        if (
+            _read_only.get()
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return config['READ_ALIAS']
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != config['READ_ALIAS']
+
+
+class ReadOnlyRequestMiddleware:
+    """Mark GET and HEAD requests for ReadOnlyRouter"""
+    sync_capable = True
+    async_capable = True
+    methods = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = _read_only.set(self.is_read_only(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _read_only.reset(token)
+
+    async def __acall__(self, request):
+        token = _read_only.set(self.is_read_only(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            _read_only.reset(token)
+
+    def is_read_only(self, request):
+        return config['ENABLED'] and request.method in self.methods
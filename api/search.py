@@ -0,0 +1,121 @@
+import base64
+import html
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connections, router
+
+from api.models import Message
+from api.rendering import ROW_ID, message_dicts
+
+# Column layout of the rows returned by MessageSearch.search(), extending
+# the message_rows() layout
+ROW_SNIPPET, ROW_RANK = 4, 5
+
+_terms = re.compile(r'\w+')
+
+
+class MessageSearch:
+    """
+    Ranked full-text search over message text through the messages_fts
+    FTS5 index (see migration 0006).
+    Matches are ordered by bm25 relevance, best first, with the message id
+    as tie-breaker, and paginated by keyset over that (rank, id) pair.
+    Scoring every match of a common word costs about a second at 1M
+    messages, so only the newest `max_ranked` matches are ranked; FTS5
+    finds those in rowid order without scoring them.
+    Ranks depend on index statistics, so messages posted between two page
+    requests can shift the order slightly.
+    Every word of the query must match; FTS5 operators are not exposed.
+    Snippets are HTML escaped, with the matched words wrapped in
+    `highlight`. FTS5 marks them with control characters that escaping
+    leaves alone, which are then replaced by the tags.
+    """
+    highlight = ('<mark>', '</mark>')
+    markers = ('\x02', '\x03')
+    ellipsis = '…'
+    snippet_tokens = 16
+    max_ranked = 10000
+
+    def __init__(self, query):
+        terms = _terms.findall(query or '')
+        if not terms:
+            raise ValueError('Search query is empty')
+        # Quoted strings keep words like AND, OR, NEAR from being operators
+        self.match = ' '.join(f'"{term}"' for term in terms)
+
+    def encode_cursor(self, rank, message_id):
+        """Build an opaque cursor from a result's rank and id"""
+        raw = f'{rank!r}|{message_id}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return the (rank, id) pair stored in the cursor"""
+        padded = cursor + '=' * (-len(cursor) % 4)
+        try:
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            rank, message_id = raw.split('|')
+            return float(rank), int(message_id)
+        except ValueError as exc:
+            raise ValueError('Invalid cursor') from exc
+
+    def search(self, limit, cursor=None):
+        """
+        Return one page of (id, text, author, created_at, snippet, rank)
+        rows together with the cursor of the next page, or None when there
+        are no more matches.
+        """
+        params = [
+            *self.markers, self.ellipsis, self.snippet_tokens,
+            self.match, self.match, self.max_ranked
+        ]
+        after = ''
+        if cursor:
+            rank, message_id = self.decode_cursor(cursor)
+            after = (
+                'AND (messages_fts.rank > %s OR (messages_fts.rank = %s '
+                'AND messages_fts.rowid > %s)) '
+            )
+            params += [rank, rank, message_id]
+        params.append(limit + 1)
+
+        with connections[router.db_for_read(Message)].cursor() as db:
+            db.execute(
+                'SELECT m.id, m.text, m.author, CAST(m.created_at AS text), '
+                'snippet(messages_fts, 0, %s, %s, %s, %s), messages_fts.rank '
+                'FROM messages_fts JOIN messages AS m '
+                'ON m.id = messages_fts.rowid '
+                'WHERE messages_fts MATCH %s '
+                'AND messages_fts.rowid >= (SELECT COALESCE(MIN(rowid), 0) '
+                'FROM (SELECT rowid FROM messages_fts '
+                'WHERE messages_fts MATCH %s ORDER BY rowid DESC LIMIT %s)) '
+                + after +
+                'ORDER BY messages_fts.rank, messages_fts.rowid LIMIT %s',
+                params
+            )
+            rows = db.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self.encode_cursor(last[ROW_RANK], last[ROW_ID])
+        return rows, next_cursor
+
+    async def asearch(self, limit, cursor=None):
+        """Async version of search() for async views"""
+        return await sync_to_async(self.search)(limit, cursor)
+
+    def result_dicts(self, rows):
+        """Build the public message representation plus the snippet"""
+        results = message_dicts(rows)
+        for result, row in zip(results, rows):
+            result['snippet'] = self.render_snippet(row[ROW_SNIPPET])
+        return results
+
+    def render_snippet(self, snippet):
+        """Escape the snippet text and turn the markers into `highlight`"""
+        snippet = html.escape(snippet)
+        for marker, tag in zip(self.markers, self.highlight):
+            snippet = snippet.replace(marker, tag)
+        return snippet
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from api.models import Member, Message
+from api.models import Member, Message, Room
+from api.passwords import password_hashing
 
 
 class MemberSerializer(serializers.ModelSerializer):
@@ -28,11 +29,14 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ['username', 'password']
 
     def create(self, validated_data):
-        """Create a new member with hashed password"""
+        """
+        Create a new member with hashed password. Hashing runs in the
+        password pool and raises PasswordHashingBusy when it is full.
+        """
         member = Member(
-            username=validated_data['username']
+            username=validated_data['username'],
+            password=password_hashing.make_password(validated_data['password'])
         )
-        member.set_password(validated_data['password'])
         member.save()
         return member
 
@@ -48,7 +52,7 @@ class LoginSerializer(serializers.Serializer):
 
 class MessageSerializer(serializers.ModelSerializer):
     """Serializer for Message model with username from member"""
-    username = serializers.CharField(source='member.username', read_only=True)
+    username = serializers.CharField(source='author', read_only=True)
     
     class Meta:
         model = Message
@@ -66,3 +70,25 @@ class MessageCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = ['text']
+
+
+class RoomSerializer(serializers.ModelSerializer):
+    """Serializer for Room model with the id of its newest message"""
+
+    class Meta:
+        model = Room
+        fields = ['id', 'name', 'created_at', 'last_message_id']
+        read_only_fields = fields
+
+
+class RoomJoinSerializer(serializers.Serializer):
+    """Serializer for joining a room by name"""
+    name = serializers.CharField(
+        min_length=1,
+        max_length=100
+    )
+
+
+class ReadCursorSerializer(serializers.Serializer):
+    """Serializer for acknowledging messages up to an id"""
+    last_read_id = serializers.IntegerField(min_value=0)
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.authentication import member_cache
+from api.feeds import message_committed
+from api.instrumentation import record_query
+from api.models import Member, Message
+from api.recent_messages import recent_messages
+
+
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def invalidate_cached_member(sender, instance, **kwargs):
+    """Drop the member from the authentication cache when it changes"""
+    member_cache.delete(instance.pk)
+
+
+@receiver(post_save, sender=Message)
+def publish_message(sender, instance, created, raw=False, **kwargs):
+    """Put messages saved anywhere, e.g. in the admin, into the ring"""
+    if created and not raw:
+        message_committed(instance)
+
+
+@receiver(post_delete, sender=Message)
+def evict_message(sender, instance, **kwargs):
+    """Stop serving deleted messages, e.g. of a deleted member, from the ring"""
+    if settings.RECENT_MESSAGES['ENABLED']:
+        message_id = instance.pk
+        transaction.on_commit(lambda: recent_messages.discard([message_id]))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Count and time the queries of every request on this connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
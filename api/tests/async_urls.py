@@ -0,0 +1,6 @@
+from django.urls import include, path
+
+# The URLs config/asgi.py serves, for tests running under WSGI settings
+urlpatterns = [
+    path('api/', include('api.async_urls')),
+]
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.authentication import TokenStorage
+from api.models import Member
+from api.read_cursors import read_positions
+from api.recent_messages import recent_messages
+
+
+def recent_messages_enabled(enabled):
+    return override_settings(
+        RECENT_MESSAGES={**settings.RECENT_MESSAGES, 'ENABLED': enabled}
+    )
+
+
+class APITestCase(TransactionTestCase):
+    """
+    Runs every request through the real stack: transactions commit, so
+    on_commit hooks fill the ring and wake the notifier as in production,
+    and GET requests read through the readonly alias.
+    """
+    databases = {'default', settings.READ_ONLY_DATABASE['READ_ALIAS']}
+
+    def setUp(self):
+        # The ring and buffered read positions outlive the flushed tables
+        recent_messages.clear()
+        read_positions.flush()
+        self.member = Member.objects.create(username='alice')
+        self.client = self.login(self.member)
+
+    def tearDown(self):
+        # Not at exit, when the test database is gone
+        read_positions.flush()
+
+    def login(self, member):
+        client = APIClient()
+        token = TokenStorage.create_token(member)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return client
+
+    def post_messages(self, *texts, client=None):
+        client = client or self.client
+        return [
+            client.post(
+                '/api/messages/', {'text': text}, format='json'
+            ).json()['id']
+            for text in texts
+        ]
@@ -0,0 +1,104 @@
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.utils import timezone
+
+from api.archive import MessageArchive, MessageArchiver
+from api.export import MessageExport
+from api.models import ArchiveSegment, Message
+from api.pagination import MessageKeysetPagination
+from api.tests.base import APITestCase, recent_messages_enabled
+
+
+@recent_messages_enabled(False)
+class MessageArchiveTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.archive = MessageArchive(path)
+        for patcher in (
+            mock.patch.object(MessageKeysetPagination, 'archive', self.archive),
+            mock.patch('api.export.message_archive', self.archive),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.ids = self.post_messages('a', 'b', 'c', 'd', 'e')
+
+    def archiver(self, keep_latest=2):
+        return MessageArchiver(
+            self.archive, retention=timedelta(days=30), segment_size=2,
+            keep_latest=keep_latest,
+        )
+
+    def run_archiver(self, archiver=None):
+        return (archiver or self.archiver()).run(
+            now=timezone.now() + timedelta(days=31)
+        )
+
+    def walk(self):
+        """Ids of the whole feed, fetched two messages per page"""
+        ids = []
+        response = self.client.get('/api/messages/?limit=2').json()
+        while True:
+            ids += [message['id'] for message in reversed(response['results'])]
+            if response['next_cursor'] is None:
+                return ids
+            response = self.client.get(
+                f'/api/messages/?limit=2&before={response["next_cursor"]}'
+            ).json()
+
+    def delta(self, after_id):
+        response = self.client.get(f'/api/messages/?after_id={after_id}')
+        return [message['id'] for message in response.json()]
+
+    def export(self):
+        body = b''.join(MessageExport('ndjson', 2).iter_bytes())
+        return [json.loads(line)['id'] for line in body.splitlines()]
+
+    def test_history_reads_span_archive_and_table(self):
+        self.assertEqual(self.run_archiver(), 3)
+        self.assertEqual(ArchiveSegment.objects.count(), 2)
+        self.assertEqual(
+            list(Message.objects.values_list('id', flat=True)), self.ids[3:]
+        )
+
+        self.assertEqual(self.walk(), self.ids[::-1])
+        self.assertEqual(self.delta(0), self.ids)
+        self.assertEqual(self.delta(self.ids[1]), self.ids[2:])
+        self.assertEqual(self.export(), self.ids)
+
+    def test_retention(self):
+        Message.objects.filter(id__gte=self.ids[1]).update(
+            created_at=timezone.now() + timedelta(days=10)
+        )
+        self.assertEqual(self.run_archiver(self.archiver(keep_latest=0)), 1)
+        self.assertEqual(self.archive.last_id, self.ids[0])
+
+    def test_rows_indexed_but_not_deleted(self):
+        # As after a crash between indexing a segment and deleting its rows
+        with mock.patch.object(MessageArchiver, 'delete_archived'):
+            self.run_archiver()
+        self.assertEqual(Message.objects.count(), 5)
+
+        self.assertEqual(self.walk(), self.ids[::-1])
+        self.assertEqual(self.delta(0), self.ids)
+        self.assertEqual(self.export(), self.ids)
+
+        # The next run deletes them
+        self.assertEqual(self.run_archiver(), 0)
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_archived_messages_leave_search(self):
+        self.run_archiver()
+        response = self.client.get('/api/messages/search/?q=a')
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get('/api/messages/search/?q=e')
+        self.assertEqual(
+            [message['id'] for message in response.json()['results']],
+            [self.ids[4]]
+        )
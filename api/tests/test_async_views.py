@@ -0,0 +1,63 @@
+import json
+
+from django.conf import settings
+from django.test import AsyncClient, override_settings
+
+from api.authentication import TokenStorage
+from api.batching import message_batcher
+from api.models import Message
+from api.notifications import message_notifier
+from api.recent_messages import recent_messages
+from api.tests.base import APITestCase
+
+
+@override_settings(ROOT_URLCONF='api.tests.async_urls')
+class AsyncMessageViewTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        token = TokenStorage.create_token(self.member)
+        self.headers = {'Authorization': f'Token {token}'}
+        self.async_client = AsyncClient()
+
+    async def post(self, body):
+        return await self.async_client.post(
+            '/api/messages/', body, content_type='application/json',
+            headers=self.headers
+        )
+
+    async def test_malformed_json_is_rejected(self):
+        response = await self.post('{"text": ')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+    async def test_missing_text_is_rejected(self):
+        response = await self.post('{}')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Message text is required'})
+
+    async def test_post_reaches_ring_and_notifier(self):
+        response = await self.post(json.dumps({'text': 'hello'}))
+        self.assertEqual(response.status_code, 201)
+        message_id = response.json()['id']
+        self.assertEqual(recent_messages.last_id(), message_id)
+        self.assertEqual(message_notifier.last_id, message_id)
+
+        response = await self.async_client.get(
+            '/api/messages/', headers=self.headers
+        )
+        self.assertEqual(
+            [message['text'] for message in response.json()['results']],
+            ['hello']
+        )
+
+    async def test_post_goes_through_write_batching(self):
+        config = {**settings.MESSAGE_WRITE_BATCHING, 'ENABLED': True}
+        written = message_batcher.stats()['messages']
+        with override_settings(MESSAGE_WRITE_BATCHING=config):
+            response = await self.post(json.dumps({'text': 'hello'}))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(message_batcher.stats()['messages'], written + 1)
+        self.assertTrue(
+            await Message.objects.filter(id=response.json()['id']).aexists()
+        )
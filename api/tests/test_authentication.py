@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import TokenAuthentication, TokenStorage, member_cache
+from api.models import Member
+
+
+class MemberCacheTests(TestCase):
+
+    def setUp(self):
+        self.member = Member.objects.create(username='alice')
+        self.token = TokenStorage.create_token(self.member)
+
+    def authenticate(self):
+        request = APIRequestFactory().get(
+            '/api/profile/', HTTP_AUTHORIZATION=f'Token {self.token}'
+        )
+        return TokenAuthentication().authenticate(request)
+
+    def test_member_is_cached(self):
+        self.authenticate()
+        self.assertEqual(member_cache.get(self.member.id), self.member)
+        # Presence would flush last_seen_at once its interval has passed
+        presence = {**settings.PRESENCE, 'ENABLED': False}
+        with override_settings(PRESENCE=presence), self.assertNumQueries(0):
+            member, _ = self.authenticate()
+        self.assertEqual(member.username, 'alice')
+
+    def test_cached_member_is_a_copy(self):
+        member, _ = self.authenticate()
+        member.username = 'changed'
+        member, _ = self.authenticate()
+        self.assertEqual(member.username, 'alice')
+
+    def test_save_invalidates(self):
+        self.authenticate()
+        self.member.username = 'alice2'
+        self.member.save()
+        self.assertIsNone(member_cache.get(self.member.id))
+        member, _ = self.authenticate()
+        self.assertEqual(member.username, 'alice2')
+
+    def test_delete_invalidates(self):
+        self.authenticate()
+        member_id = self.member.id
+        self.member.delete()
+        self.assertIsNone(member_cache.get(member_id))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
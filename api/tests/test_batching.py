@@ -0,0 +1,64 @@
+import threading
+import time
+
+from django.db import IntegrityError, connection
+from django.test import TransactionTestCase
+
+from api.batching import MessageWriteBatcher
+from api.models import Member, Message
+
+
+class MessageWriteBatcherTests(TransactionTestCase):
+
+    def setUp(self):
+        self.member = Member.objects.create(username='alice')
+        # A long window, so batches are closed by max_size
+        self.batcher = MessageWriteBatcher(window=5, max_size=3)
+
+    def create_concurrently(self, texts):
+        """Queue one create per text, in order, and return their outcomes"""
+        results = [None] * len(texts)
+
+        def create(index, text):
+            try:
+                results[index] = self.batcher.create(self.member, text)
+            except Exception as exc:
+                results[index] = exc
+            finally:
+                connection.close()
+
+        threads = []
+        for index, text in enumerate(texts):
+            thread = threading.Thread(target=create, args=(index, text))
+            thread.start()
+            threads.append(thread)
+            # Wait for it to be queued before starting the next one
+            while len(self.batcher._pending) <= index and thread.is_alive():
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_batch_is_one_commit_in_arrival_order(self):
+        messages = self.create_concurrently(['a', 'b', 'c'])
+        self.assertEqual(self.batcher.stats(), {'commits': 1, 'messages': 3})
+        self.assertEqual(
+            list(Message.objects.order_by('id').values_list('text', flat=True)),
+            ['a', 'b', 'c']
+        )
+        ids = [message.id for message in messages]
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(message.author == 'alice' for message in messages))
+
+    def test_failed_batch_raises_in_every_request(self):
+        results = self.create_concurrently(['a', None, 'c'])
+        for result in results:
+            self.assertIsInstance(result, IntegrityError)
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(self.batcher.stats(), {'commits': 0, 'messages': 0})
+
+    def test_next_batch_after_a_failure(self):
+        self.create_concurrently(['a', None, 'c'])
+        messages = self.create_concurrently(['d', 'e', 'f'])
+        self.assertEqual([message.text for message in messages], ['d', 'e', 'f'])
+        self.assertEqual(self.batcher.stats(), {'commits': 1, 'messages': 3})
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TransactionTestCase
+
+from api.models import Member, Message
+
+
+class ImportDataTests(TransactionTestCase):
+
+    def write_records(self, *records):
+        """NDJSON file of the records, removed after the test"""
+        descriptor, path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(descriptor, 'w') as stream:
+            for record in records:
+                stream.write(json.dumps(record) + '\n')
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_data(self, *args):
+        call_command('import_data', *args, stdout=StringIO(), stderr=StringIO())
+
+    def message_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE tbl_name = 'messages' "
+                "AND type IN ('index', 'trigger') ORDER BY name"
+            )
+            return [name for (name,) in cursor.fetchall()]
+
+    def search(self, word):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM messages_fts WHERE messages_fts MATCH %s',
+                [word]
+            )
+            return [rowid for (rowid,) in cursor.fetchall()]
+
+    def test_import_into_empty_table(self):
+        indexes = self.message_indexes()
+        members = self.write_records({'username': 'alice'}, {'username': 'bob'})
+        messages = self.write_records(
+            {'author': 'alice', 'text': 'hello lantern',
+             'created_at': '2026-01-01T10:00:00+00:00'},
+            {'author': 'bob', 'text': 'hi'},
+        )
+        self.import_data('--members', members, '--messages', messages,
+                         '--chunk-size', '1')
+
+        self.assertEqual(Member.objects.count(), 2)
+        first, second = Message.objects.order_by('id')
+        self.assertEqual((first.author, first.member.username), ('alice', 'alice'))
+        self.assertEqual(first.created_at.isoformat(), '2026-01-01T10:00:00+00:00')
+        self.assertEqual(second.text, 'hi')
+        # Indexes and the search trigger are back, and the rows are indexed
+        self.assertEqual(self.message_indexes(), indexes)
+        self.assertEqual(self.search('lantern'), [first.id])
+
+    def test_refuses_to_drop_indexes_of_a_used_table(self):
+        Message.objects.create(
+            member=Member.objects.create(username='alice'), text='old'
+        )
+        indexes = self.message_indexes()
+        messages = self.write_records({'author': 'alice', 'text': 'new'})
+        with self.assertRaisesMessage(CommandError, '--unsafe-drop-indexes'):
+            self.import_data('--messages', messages)
+        self.assertEqual(Message.objects.count(), 1)
+
+        self.import_data('--messages', messages, '--keep-indexes')
+        self.import_data('--messages', messages, '--unsafe-drop-indexes')
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertEqual(self.message_indexes(), indexes)
+        self.assertEqual(len(self.search('new')), 2)
+
+    def test_invalid_records(self):
+        Member.objects.create(username='alice')
+        for record, error in [
+            (['alice', 'text'], 'not a JSON object'),
+            ({'author': 'nobody', 'text': 'x'}, 'Unknown author'),
+        ]:
+            with self.subTest(record=record):
+                messages = self.write_records(record)
+                with self.assertRaisesMessage(CommandError, error):
+                    self.import_data('--messages', messages)
+        self.assertFalse(Message.objects.exists())
+
+    def test_create_authors_and_generated_messages(self):
+        messages = self.write_records({'author': 'carol', 'text': 'hey'})
+        self.import_data('--messages', messages, '--create-authors')
+        self.import_data('--generate-messages', '5', '--keep-indexes')
+        self.assertEqual(
+            Message.objects.filter(member__username='carol').count(), 6
+        )
@@ -0,0 +1,62 @@
+import gzip
+import json
+
+from django.test import Client
+
+from api.compression import accepted_encodings, snapshot_cache
+from api.tests.base import APITestCase, recent_messages_enabled
+
+
+class CompressionTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        snapshot_cache.clear()
+        self.ids = self.post_messages(
+            *[f'message {i} ' * 10 for i in range(10)]
+        )
+
+    def get(self, path, **headers):
+        return self.client.get(
+            path, headers={'Accept-Encoding': 'gzip', **headers}
+        )
+
+    def test_feed_is_gzipped_with_weak_etag(self):
+        for enabled in (True, False):
+            with self.subTest(ring=enabled), recent_messages_enabled(enabled):
+                response = self.get('/api/messages/')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                page = json.loads(gzip.decompress(response.content))
+                self.assertEqual(page['results'][-1]['id'], self.ids[-1])
+
+                response = self.get(
+                    '/api/messages/', If_None_Match=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_snapshots_are_compressed_once(self):
+        first = self.get('/api/messages/').content
+        hits = snapshot_cache.hits
+        self.assertEqual(self.get('/api/messages/').content, first)
+        self.assertEqual(snapshot_cache.hits, hits + 1)
+
+    def test_plain_without_accept_encoding(self):
+        response = self.client.get('/api/messages/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(json.loads(response.content)['results']), 10)
+
+    def test_admin_is_not_compressed(self):
+        response = Client().get(
+            '/admin/login/', headers={'Accept-Encoding': 'gzip'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(response.content), 512)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, br, identity;q=0, *;q=0.1'),
+            ['br', 'gzip', '*']
+        )
@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from api import routers
+from api.db_backends.sqlite_pool.base import ConnectionPool
+from api.tests.base import APITestCase, recent_messages_enabled
+
+READ_ALIAS = routers.config['READ_ALIAS']
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def connect(self):
+        return mock.Mock(name='connection')
+
+    def test_reuses_released_connections(self):
+        pool = ConnectionPool(1)
+        connection = pool.acquire(self.connect)
+        pool.release(connection)
+        self.assertIs(pool.acquire(self.connect), connection)
+
+    def test_times_out_when_exhausted(self):
+        pool = ConnectionPool(1, timeout=0.05)
+        connection = pool.acquire(self.connect)
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.acquire(self.connect)
+
+        # A discarded connection frees its place
+        pool.discard(connection)
+        connection.close.assert_called_once_with()
+        self.assertIsNot(pool.acquire(self.connect), connection)
+
+    def test_waiters_get_released_connections(self):
+        pool = ConnectionPool(1, timeout=5)
+        connection = pool.acquire(self.connect)
+        acquired = []
+        waiter = threading.Thread(
+            target=lambda: acquired.append(pool.acquire(self.connect))
+        )
+        waiter.start()
+        pool.release(connection)
+        waiter.join()
+        self.assertEqual(acquired, [connection])
+
+    def test_failed_connect_frees_its_place(self):
+        pool = ConnectionPool(1, timeout=0)
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.acquire(mock.Mock(side_effect=sqlite3.OperationalError))
+        self.assertIsNotNone(pool.acquire(self.connect))
+
+
+@recent_messages_enabled(False)
+class ReadOnlyRouterTests(APITestCase):
+
+    def queries(self, alias, method, path, **kwargs):
+        with CaptureQueriesContext(connections[alias]) as context:
+            response = getattr(self.client, method)(path, **kwargs)
+        self.assertLess(response.status_code, 300)
+        return len(context.captured_queries)
+
+    def test_get_requests_read_from_the_read_alias(self):
+        self.post_messages('a')
+        self.assertGreater(self.queries(READ_ALIAS, 'get', '/api/messages/'), 0)
+
+    def test_other_requests_use_the_default_alias(self):
+        self.assertEqual(
+            self.queries(
+                READ_ALIAS, 'post', '/api/messages/', data={'text': 'a'},
+                format='json'
+            ),
+            0
+        )
+
+    def test_reads_in_transactions_and_outside_requests(self):
+        router = routers.ReadOnlyRouter()
+        self.assertIsNone(router.db_for_read(None))
+        token = routers._read_only.set(True)
+        try:
+            self.assertEqual(router.db_for_read(None), READ_ALIAS)
+            with transaction.atomic():
+                self.assertIsNone(router.db_for_read(None))
+        finally:
+            routers._read_only.reset(token)
+        self.assertEqual(router.db_for_write(None), DEFAULT_DB_ALIAS)
@@ -0,0 +1,35 @@
+import json
+
+from api.export import MessageExport
+from api.tests.base import APITestCase
+
+
+class MessageExportTests(APITestCase):
+
+    def export(self, output, chunk_size):
+        return b''.join(MessageExport(output, chunk_size).iter_bytes())
+
+    def test_chunk_boundaries(self):
+        ids = self.post_messages('a', 'b', 'c', 'd')
+        for chunk_size in (1, 2, 3, 10):
+            with self.subTest(chunk_size=chunk_size):
+                array = json.loads(self.export('json', chunk_size))
+                self.assertEqual([message['id'] for message in array], ids)
+                lines = self.export('ndjson', chunk_size).splitlines()
+                self.assertEqual([json.loads(line) for line in lines], array)
+
+    def test_empty_history(self):
+        self.assertEqual(self.export('json', 2), b'[]')
+        self.assertEqual(self.export('ndjson', 2), b'')
+
+    def test_endpoint(self):
+        ids = self.post_messages('a', 'b')
+        response = self.client.get('/api/messages/export/?output=json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('messages.json', response['Content-Disposition'])
+        array = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([message['text'] for message in array], ['a', 'b'])
+        self.assertEqual(array[0]['id'], ids[0])
+
+        response = self.client.get('/api/messages/export/?output=xml')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,27 @@
+import json
+
+from rest_framework.test import APIClient
+
+from api.tests.base import APITestCase
+
+
+class MetricsTests(APITestCase):
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/metrics/').status_code, 401)
+
+    def test_histograms_include_requests(self):
+        self.client.get('/api/profile/')
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'api_request_duration_seconds_count', response.content)
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/profile/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_request_log_line(self):
+        with self.assertLogs('api.requests', 'INFO') as logs:
+            self.client.get('/api/profile/')
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['path'], line['status']), ('/api/profile/', 200))
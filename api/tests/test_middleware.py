@@ -0,0 +1,30 @@
+from django.test import Client, override_settings
+
+from api.tests.base import APITestCase
+
+
+class LeanAPIMiddlewareTests(APITestCase):
+
+    def test_api_requests_skip_site_middleware(self):
+        response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, 200)
+        request = response.wsgi_request
+        self.assertFalse(hasattr(request, 'session'))
+        self.assertFalse(hasattr(request, '_messages'))
+
+    def test_admin_keeps_site_middleware(self):
+        response = Client(enforce_csrf_checks=True).get('/admin/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+        self.assertIn('csrftoken', response.cookies)
+
+        response = Client(enforce_csrf_checks=True).post(
+            '/admin/login/', {'username': 'alice', 'password': 'x'}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(LEAN_API_MIDDLEWARE={'ENABLED': False, 'PREFIX': '/api/'})
+    def test_disabled(self):
+        response = self.login(self.member).get('/api/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
@@ -0,0 +1,80 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api.models import Member
+from api.passwords import (
+    PasswordHashingBusy, PasswordHashingPool, password_hashing
+)
+from api.tests.base import APITestCase
+
+FAST_HASHING = {
+    'ITERATIONS': 1000, 'WORKERS': 1, 'QUEUE_SIZE': 8, 'RETRY_AFTER': 1,
+}
+
+
+class PasswordHashingPoolTests(APITestCase):
+
+    def test_full_pool_turns_requests_away(self):
+        pool = PasswordHashingPool(workers=1, queue_size=1)
+        release = threading.Event()
+        threads = [
+            threading.Thread(target=pool.run, args=(release.wait,))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        # One call runs, the other waits for the worker
+        while pool._slots._value:
+            time.sleep(0.001)
+        with self.assertRaises(PasswordHashingBusy):
+            pool.run(int)
+
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(pool.run(int, '7'), 7)
+
+    def test_no_workers_hashes_inline(self):
+        pool = PasswordHashingPool(workers=0, queue_size=0)
+        self.assertEqual(pool.run(threading.get_ident), threading.get_ident())
+
+
+@override_settings(PASSWORD_HASHING=FAST_HASHING)
+class PasswordViewTests(APITestCase):
+
+    def post(self, path, username='bob', password='secret-password'):
+        return APIClient().post(
+            path, {'username': username, 'password': password}, format='json'
+        )
+
+    def test_busy_pool_answers_503_with_retry_after(self):
+        Member.objects.create(username='bob', password=make_password('x'))
+        with mock.patch.object(
+            password_hashing, 'run', side_effect=PasswordHashingBusy
+        ):
+            for path, username in [
+                ('/api/login/', 'bob'), ('/api/register/', 'carol')
+            ]:
+                with self.subTest(path=path):
+                    response = self.post(path, username=username)
+                    self.assertEqual(response.status_code, 503)
+                    self.assertEqual(response['Retry-After'], '1')
+
+    def test_outdated_hash_is_upgraded_at_login(self):
+        with override_settings(
+            PASSWORD_HASHING={**FAST_HASHING, 'ITERATIONS': 500}
+        ):
+            member = Member.objects.create(
+                username='bob', password=make_password('secret-password')
+            )
+        self.assertEqual(self.post('/api/login/').status_code, 200)
+        member.refresh_from_db()
+        self.assertTrue(member.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertEqual(self.post('/api/login/').status_code, 200)
+        response = self.post('/api/login/', password='wrong')
+        self.assertEqual(response.status_code, 401)
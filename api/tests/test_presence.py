@@ -0,0 +1,46 @@
+import time
+
+from api.models import Member
+from api.presence import PresenceTracker, presence
+from api.tests.base import APITestCase
+
+
+class PresenceTrackerTests(APITestCase):
+
+    def test_online_members_by_recency(self):
+        tracker = PresenceTracker(100, online_window=60, flush_interval=60)
+        now = int(time.time())
+        tracker._seen[3] = now - 120
+        for member_id in (5, 7, 100):
+            tracker.record(member_id)
+        # Pin the recorded times, which may fall on the next second
+        tracker._seen[5] = now
+        tracker._seen[7] = now - 1
+        # 100 is beyond max_member_id and not tracked
+        self.assertEqual(tracker._high_water(), 7)
+
+        online = tracker.scan(now - 60)
+        self.assertEqual(sorted(online), [(5, now), (7, now - 1)])
+        self.assertEqual(tracker.most_recent(online, 1), [(5, now)])
+
+    def test_flush_writes_last_seen(self):
+        tracker = PresenceTracker(1000, online_window=60, flush_interval=0)
+        other = Member.objects.create(username='bob')
+        self.assertTrue(tracker.record(self.member.id))
+        tracker.flush()
+
+        self.member.refresh_from_db()
+        other.refresh_from_db()
+        self.assertAlmostEqual(
+            self.member.last_seen_at.timestamp(), time.time(), delta=2
+        )
+        self.assertIsNone(other.last_seen_at)
+
+    def test_online_endpoint(self):
+        self.client.get('/api/profile/')
+        presence._online.clear()
+        response = self.client.get('/api/members/online/?limit=5').json()
+        self.assertGreaterEqual(response['count'], 1)
+        self.assertIn(
+            'alice', [member['username'] for member in response['results']]
+        )
@@ -0,0 +1,47 @@
+from api.models import Member, ReadCursor
+from api.read_cursors import read_positions
+from api.tests.base import APITestCase, recent_messages_enabled
+
+
+class ReadPositionTests(APITestCase):
+
+    def unread(self):
+        read_positions.flush()
+        return self.client.get('/api/messages/unread/').json()
+
+    def test_acknowledge_and_count(self):
+        ids = self.post_messages('a', 'b', 'c')
+        # Counted from the ids, which other tests have used before
+        self.assertEqual(self.unread()['unread'], ids[-1])
+        self.client.post(
+            '/api/messages/read/', {'last_read_id': ids[0]}, format='json'
+        )
+        self.assertEqual(self.unread()['unread'], 2)
+
+    def test_after_id_is_clamped_to_newest_message(self):
+        ids = self.post_messages('a', 'b')
+        for enabled in (True, False):
+            with recent_messages_enabled(enabled):
+                self.client.get('/api/messages/?after_id=100000')
+            self.assertEqual(self.unread()['last_read_id'], ids[-1])
+
+        self.post_messages('c')
+        self.assertEqual(self.unread()['unread'], 1)
+
+    def test_wait_after_id_is_clamped_to_newest_message(self):
+        ids = self.post_messages('a', 'b')
+        self.client.get('/api/messages/wait/?after_id=100000&timeout=0')
+        self.assertEqual(self.unread()['last_read_id'], ids[-1])
+
+    def test_flush_skips_deleted_members(self):
+        ids = self.post_messages('a', 'b')
+        deleted = Member.objects.create(username='bob')
+        read_positions.mark_read(deleted.id, ids[-1])
+        read_positions.mark_read(self.member.id, ids[0])
+        deleted.delete()
+
+        read_positions.flush()
+        self.assertEqual(
+            list(ReadCursor.objects.values_list('member_id', 'last_read_id')),
+            [(self.member.id, ids[0])]
+        )
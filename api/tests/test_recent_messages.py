@@ -0,0 +1,93 @@
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from api.models import Member, Message
+from api.recent_messages import recent_messages
+from api.tests.base import APITestCase, recent_messages_enabled
+
+
+class FeedPaginationTests(APITestCase):
+
+    def walk(self, limit=1):
+        """Ids of the whole feed, fetched page by page from the newest"""
+        ids = []
+        response = self.client.get(f'/api/messages/?limit={limit}').json()
+        while True:
+            ids += [message['id'] for message in reversed(response['results'])]
+            if response['next_cursor'] is None:
+                return ids
+            response = self.client.get(
+                f'/api/messages/?limit={limit}'
+                f'&before={response["next_cursor"]}'
+            ).json()
+
+    def walk_with_and_without_ring(self):
+        with recent_messages_enabled(True):
+            with_ring = self.walk()
+        with recent_messages_enabled(False):
+            without_ring = self.walk()
+        return with_ring, without_ring
+
+    def test_ring_pages_match_database(self):
+        ids = self.post_messages('a', 'b', 'c', 'd')
+        with_ring, without_ring = self.walk_with_and_without_ring()
+        self.assertEqual(with_ring, ids[::-1])
+        self.assertEqual(without_ring, ids[::-1])
+
+    def test_created_at_out_of_id_order(self):
+        ids = self.post_messages('a', 'b', 'c')
+        start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        for message_id, minute in zip(ids, (1, 3, 2)):
+            Message.objects.filter(id=message_id).update(
+                created_at=start + timedelta(minutes=minute)
+            )
+        # As after an import: the ring is filled from the database
+        recent_messages.clear()
+
+        with_ring, without_ring = self.walk_with_and_without_ring()
+        self.assertEqual(without_ring, [ids[1], ids[2], ids[0]])
+        self.assertEqual(with_ring, without_ring)
+
+    def test_delta_from_ring(self):
+        ids = self.post_messages('a', 'b', 'c')
+        with recent_messages_enabled(True):
+            response = self.client.get(f'/api/messages/?after_id={ids[0]}')
+        self.assertEqual(
+            [message['id'] for message in response.json()], ids[1:]
+        )
+
+
+@recent_messages_enabled(True)
+class RingUpdateTests(APITestCase):
+
+    def page_ids(self):
+        _, body = recent_messages.page(10)
+        return [message['id'] for message in json.loads(body)['results']]
+
+    def test_reads_without_queries(self):
+        ids = self.post_messages('a')
+        # Fills the ring below the posted message once
+        self.assertEqual(self.page_ids(), ids)
+        ids += self.post_messages('b')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.page_ids(), ids)
+            recent_messages.delta(ids[0], 10)
+
+    def test_messages_saved_outside_the_api(self):
+        ids = self.post_messages('a')
+        self.page_ids()
+        message = Message.objects.create(member=self.member, text='admin')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.page_ids(), ids + [message.id])
+
+    def test_deleted_messages_are_evicted(self):
+        ids = self.post_messages('a', 'b')
+        bob = Member.objects.create(username='bob')
+        bob_ids = self.post_messages('c', 'd', client=self.login(bob))
+        self.page_ids()
+        bob.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.page_ids(), ids)
+        response = self.client.get(f'/api/messages/?after_id={ids[0]}')
+        self.assertEqual([message['id'] for message in response.json()], ids[1:])
+        self.assertFalse(Message.objects.filter(id__in=bob_ids).exists())
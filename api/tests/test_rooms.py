@@ -0,0 +1,80 @@
+from django.test import override_settings
+
+from api.models import Member, RoomMessage
+from api.read_cursors import read_positions
+from api.tests.base import APITestCase
+
+
+class RoomTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.room_id = self.client.post(
+            '/api/rooms/', {'name': 'general'}, format='json'
+        ).json()['id']
+        self.bob = Member.objects.create(username='bob')
+        self.bob_client = self.login(self.bob)
+        self.bob_client.post('/api/rooms/', {'name': 'general'}, format='json')
+        self.url = f'/api/rooms/{self.room_id}/messages/'
+
+    def post_room_messages(self, *texts):
+        return [
+            self.bob_client.post(self.url, {'text': text}, format='json')
+            .json()['id']
+            for text in texts
+        ]
+
+    def room_unread(self):
+        read_positions.flush()
+        rooms = self.client.get('/api/messages/unread/').json()['rooms']
+        return {room['id']: room['unread'] for room in rooms}[self.room_id]
+
+    def test_seq_numbers_room_messages(self):
+        ids = self.post_room_messages('a', 'b', 'c')
+        self.assertEqual(
+            list(RoomMessage.objects.order_by('id').values_list('id', 'seq')),
+            list(zip(ids, [1, 2, 3]))
+        )
+        self.assertEqual(self.room_unread(), 3)
+
+    def test_latest_page_and_cursor(self):
+        ids = self.post_room_messages('a', 'b', 'c')
+        page = self.client.get(f'{self.url}?limit=2').json()
+        self.assertEqual([m['id'] for m in page['results']], ids[1:])
+        self.assertEqual(self.room_unread(), 0)
+
+        older = self.client.get(
+            f'{self.url}?limit=2&before={page["next_cursor"]}'
+        ).json()
+        self.assertEqual([m['id'] for m in older['results']], ids[:1])
+        self.assertIsNone(older['next_cursor'])
+
+    def test_delta_marks_returned_messages_read(self):
+        ids = self.post_room_messages('a', 'b', 'c', 'd')
+        delta = self.client.get(f'{self.url}?after_id={ids[0]}&limit=2').json()
+        self.assertEqual([m['id'] for m in delta], ids[1:3])
+        self.assertEqual(self.room_unread(), 1)
+
+        delta = self.client.get(f'{self.url}?after_id={ids[2]}').json()
+        self.assertEqual([m['id'] for m in delta], ids[3:])
+        self.assertEqual(self.room_unread(), 0)
+
+    def test_read_endpoint(self):
+        ids = self.post_room_messages('a', 'b', 'c')
+        response = self.client.post(
+            f'/api/rooms/{self.room_id}/read/', {'last_read_id': ids[0]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.room_unread(), 2)
+
+    def test_non_members_are_denied(self):
+        carol = self.login(Member.objects.create(username='carol'))
+        self.assertEqual(carol.get(self.url).status_code, 403)
+        response = self.client.get('/api/rooms/999999/messages/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ROOT_URLCONF='api.tests.async_urls')
+class AsyncRoomTests(RoomTests):
+    """The same requests answered by the async views"""
@@ -0,0 +1,26 @@
+from api.tests.base import APITestCase
+
+
+class SearchTests(APITestCase):
+
+    def search(self, query):
+        return self.client.get(f'/api/messages/search/?q={query}').json()
+
+    def test_every_word_must_match(self):
+        ids = self.post_messages('hello world', 'hello there')
+        self.assertEqual(
+            [result['id'] for result in self.search('hello world')['results']],
+            ids[:1]
+        )
+
+    def test_empty_query_is_rejected(self):
+        response = self.client.get('/api/messages/search/?q=%20')
+        self.assertEqual(response.status_code, 400)
+
+    def test_snippets_are_escaped(self):
+        self.post_messages('<img src=x onerror=alert(1)> hello & "bye"')
+        self.assertEqual(
+            self.search('hello')['results'][0]['snippet'],
+            '&lt;img src=x onerror=alert(1)&gt; <mark>hello</mark> '
+            '&amp; &quot;bye&quot;'
+        )
@@ -0,0 +1,71 @@
+import os
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from api.authentication import TokenStorage
+from api.models import Member, MemberToken
+from api.token_backends import DatabaseTokenBackend, MemoryTokenBackend
+
+
+class DatabaseTokenBackendTests(TestCase):
+
+    def setUp(self):
+        self.member = Member.objects.create(username='alice')
+        self.backend = DatabaseTokenBackend(ttl=3600, sweep_interval=3600)
+
+    def expire(self, token):
+        MemberToken.objects.filter(key=token).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_tokens_are_shared_through_the_table(self):
+        self.backend.save_token('a' * 64, self.member.id)
+        other_worker = DatabaseTokenBackend(ttl=3600)
+        self.assertEqual(other_worker.get_member_id('a' * 64), self.member.id)
+
+    def test_expired_tokens_are_rejected(self):
+        self.backend.save_token('a' * 64, self.member.id)
+        self.expire('a' * 64)
+        other_worker = DatabaseTokenBackend(ttl=3600)
+        self.assertIsNone(other_worker.get_member_id('a' * 64))
+
+    def test_ttl_sets_expiry(self):
+        self.backend.save_token('a' * 64, self.member.id)
+        expires_at = MemberToken.objects.get(key='a' * 64).expires_at
+        self.assertAlmostEqual(
+            (expires_at - timezone.now()).total_seconds(), 3600, delta=5
+        )
+
+    def test_sweep_deletes_expired_tokens_only(self):
+        self.backend.save_token('a' * 64, self.member.id)
+        self.backend.save_token('b' * 64, self.member.id)
+        self.expire('a' * 64)
+        self.assertEqual(self.backend.sweep(), 1)
+        self.assertEqual(
+            list(MemberToken.objects.values_list('key', flat=True)), ['b' * 64]
+        )
+
+    def test_lookup_starts_the_sweeper(self):
+        self.assertIsNone(self.backend.get_member_id('a' * 64))
+        self.assertEqual(self.backend._sweeper_pid, os.getpid())
+
+
+class MemoryTokenBackendTests(TestCase):
+
+    def test_expired_tokens_are_rejected(self):
+        backend = MemoryTokenBackend(ttl=0)
+        backend.save_token('a' * 64, 1)
+        self.assertIsNone(backend.get_member_id('a' * 64))
+
+
+class TokenStorageTests(TestCase):
+
+    def test_tokens_are_random(self):
+        member = Member.objects.create(username='alice')
+        first = TokenStorage.create_token(member)
+        second = TokenStorage.create_token(member)
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(first), 64)
+        self.assertEqual(TokenStorage.get_member_id(second), member.id)
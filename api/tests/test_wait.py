@@ -0,0 +1,29 @@
+from api.tests.base import APITestCase
+
+
+class MessageWaitTests(APITestCase):
+
+    def test_invalid_timeouts_are_rejected(self):
+        for timeout in ('nan', 'NaN', 'inf', '-inf', 'abc'):
+            with self.subTest(timeout=timeout):
+                response = self.client.get(
+                    f'/api/messages/wait/?after_id=0&timeout={timeout}'
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_timeout_without_new_messages(self):
+        ids = self.post_messages('a')
+        response = self.client.get(
+            f'/api/messages/wait/?after_id={ids[0]}&timeout=0'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_returns_newer_messages(self):
+        ids = self.post_messages('a', 'b')
+        response = self.client.get(
+            f'/api/messages/wait/?after_id={ids[0]}&timeout=1'
+        )
+        self.assertEqual(
+            [message['id'] for message in response.json()], ids[1:]
+        )
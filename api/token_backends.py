@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from api.cache import LRUCache
+from api.models import MemberToken
+
+logger = logging.getLogger(__name__)
+
+
+class BaseTokenBackend:
+    """
+    Interface of the storages behind TokenStorage.
+    A backend maps token keys to member ids and forgets them after `ttl`
+    seconds.
+    """
+
+    def __init__(self, ttl, **options):
+        self.ttl = ttl
+
+    def save_token(self, token, member_id):
+        raise NotImplementedError
+
+    def get_member_id(self, token):
+        raise NotImplementedError
+
+    async def aget_member_id(self, token):
+        return self.get_member_id(token)
+
+    def delete_token(self, token):
+        raise NotImplementedError
+
+
+class MemoryTokenBackend(BaseTokenBackend):
+    """
+    Per-process dictionary of tokens.
+    Only suitable for a single worker: tokens are not shared between
+    gunicorn workers and are lost when a worker restarts.
+    """
+
+    def __init__(self, ttl, **options):
+        super().__init__(ttl)
+        self._tokens = {}
+
+    def save_token(self, token, member_id):
+        self._tokens[token] = (member_id, time.time() + self.ttl)
+
+    def get_member_id(self, token):
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+
+        member_id, expires_at = entry
+        if expires_at <= time.time():
+            self._tokens.pop(token, None)
+            return None
+        return member_id
+
+    def delete_token(self, token):
+        self._tokens.pop(token, None)
+
+
+class DatabaseTokenBackend(BaseTokenBackend):
+    """
+    Tokens stored in the member_tokens table, shared by all workers and kept
+    across restarts.
+    Lookups go through a bounded in-process LRU cache so the hot path stays a
+    dictionary hit. Cached entries are trusted for at most `cache_ttl`
+    seconds, which bounds how long a token deleted by another worker keeps
+    working here. Expired rows are removed by a daemon thread that every
+    process starts the first time it saves or looks up a token in the
+    table, so workers that only authenticate sweep as well.
+    """
+
+    def __init__(self, ttl, cache_size=10000, cache_ttl=60,
+                 sweep_interval=600, **options):
+        super().__init__(ttl)
+        self.sweep_interval = sweep_interval
+        self._cache = LRUCache(cache_size, cache_ttl)
+        self._lock = threading.Lock()
+        self._sweeper_pid = None
+
+    def save_token(self, token, member_id):
+        expires_at = timezone.now() + timedelta(seconds=self.ttl)
+        MemberToken.objects.update_or_create(
+            key=token,
+            defaults={'member_id': member_id, 'expires_at': expires_at}
+        )
+        self._remember(token, member_id, expires_at)
+        self.start_sweeper()
+
+    def get_member_id(self, token):
+        member_id = self._cache.get(token)
+        if member_id is not None:
+            return member_id
+
+        self.start_sweeper()
+        row = MemberToken.objects.filter(
+            key=token, expires_at__gt=timezone.now()
+        ).values_list('member_id', 'expires_at').first()
+        return self._remember_row(token, row)
+
+    async def aget_member_id(self, token):
+        member_id = self._cache.get(token)
+        if member_id is not None:
+            return member_id
+
+        self.start_sweeper()
+        row = await MemberToken.objects.filter(
+            key=token, expires_at__gt=timezone.now()
+        ).values_list('member_id', 'expires_at').afirst()
+        return self._remember_row(token, row)
+
+    def delete_token(self, token):
+        MemberToken.objects.filter(key=token).delete()
+        self._cache.delete(token)
+
+    def _remember_row(self, token, row):
+        if row is None:
+            return None
+
+        member_id, expires_at = row
+        self._remember(token, member_id, expires_at)
+        return member_id
+
+    def _remember(self, token, member_id, expires_at):
+        """Cache the token, never beyond its own expiry"""
+        remaining = (expires_at - timezone.now()).total_seconds()
+        self._cache.set(token, member_id, timeout=remaining)
+
+    def start_sweeper(self):
+        """
+        Start the expiry sweep thread for this process. Threads do not
+        survive the fork of preloaded gunicorn workers, so this is checked
+        against the current pid.
+        """
+        pid = os.getpid()
+        if self._sweeper_pid == pid:
+            return
+        with self._lock:
+            if self._sweeper_pid == pid:
+                return
+            self._sweeper_pid = pid
+
+        thread = threading.Thread(
+            target=self._sweep_forever, name='token-sweeper', daemon=True
+        )
+        thread.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            close_old_connections()
+            try:
+                self.sweep()
+            except Exception:
+                # The next round retries, e.g. after the database was locked
+                logger.exception('Expired token sweep failed')
+            finally:
+                connection.close()
+
+    def sweep(self):
+        """Delete expired tokens, returns the number of removed rows"""
+        deleted, _ = MemberToken.objects.filter(
+            expires_at__lte=timezone.now()
+        ).delete()
+        return deleted
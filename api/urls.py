@@ -3,12 +3,50 @@ from api.views import (
     RegisterView,
     LoginView,
     ProfileView,
-    MessageListCreateView
+    OnlineMembersView,
+    MessageListCreateView,
+    MessageWaitView,
+    MessageExportView,
+    MessageSearchView,
+    UnreadCountView,
+    MessageReadView,
+    RoomListView,
+    RoomLeaveView,
+    RoomReadView,
+    RoomMessageListCreateView,
+    MetricsView
 )
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('profile/', ProfileView.as_view(), name='profile'),
+    path(
+        'members/online/', OnlineMembersView.as_view(), name='members-online'
+    ),
     path('messages/', MessageListCreateView.as_view(), name='messages'),
+    path('messages/wait/', MessageWaitView.as_view(), name='messages-wait'),
+    path(
+        'messages/export/', MessageExportView.as_view(), name='messages-export'
+    ),
+    path(
+        'messages/search/', MessageSearchView.as_view(), name='messages-search'
+    ),
+    path(
+        'messages/unread/', UnreadCountView.as_view(), name='messages-unread'
+    ),
+    path('messages/read/', MessageReadView.as_view(), name='messages-read'),
+    path('rooms/', RoomListView.as_view(), name='rooms'),
+    path(
+        'rooms/<int:room_id>/leave/', RoomLeaveView.as_view(),
+        name='rooms-leave'
+    ),
+    path(
+        'rooms/<int:room_id>/read/', RoomReadView.as_view(), name='rooms-read'
+    ),
+    path(
+        'rooms/<int:room_id>/messages/', RoomMessageListCreateView.as_view(),
+        name='rooms-messages'
+    ),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
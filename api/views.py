@@ -2,16 +2,52 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.db import IntegrityError
-from api.models import Member, Message
+from django.db.models import Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from api.models import Member, Message, Room, RoomMembership, RoomMessage
 from api.serializers import (
     RegisterSerializer,
     LoginSerializer,
     MemberSerializer,
     MessageSerializer,
-    MessageCreateSerializer
+    MessageCreateSerializer,
+    RoomSerializer,
+    RoomJoinSerializer,
+    ReadCursorSerializer
 )
 from api.authentication import TokenAuthentication, TokenStorage
+from api.compression import set_snapshot_key
+from api.export import MessageExport
+from api.feeds import (
+    FeedViewMixin, MessageWaitMixin, create_message, created_message_data,
+    fetched_position, room_access_error,
+)
+from api.instrumentation import histograms
+from api.notifications import message_notifier
+from api.passwords import PasswordHashingBusy, password_hashing
+from api.presence import online_members
+from api.pagination import MessageKeysetPagination, RoomMessagePagination
+from api.read_cursors import read_positions, unread_counts
+from api.recent_messages import recent_messages
+from api.rooms import RoomAccessDenied, RoomFeed
+from api.search import MessageSearch
+from api.rendering import (
+    ROW_ID, json_bytes, json_response, message_dicts, message_rows,
+    raw_json_response
+)
+
+
+def hashing_busy_response():
+    """503 for requests turned away by the full password hashing pool"""
+    response = Response(
+        {'error': 'Too many login attempts in progress, try again shortly'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(settings.PASSWORD_HASHING['RETRY_AFTER'])
+    return response
 
 
 class RegisterView(APIView):
@@ -41,6 +77,8 @@ class RegisterView(APIView):
                     {'error': 'Username already exists'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            except PasswordHashingBusy:
+                return hashing_busy_response()
         
         return Response(
             {'error': 'Invalid username or password'},
@@ -67,7 +105,15 @@ class LoginView(APIView):
         
         try:
             member = Member.objects.get(username=username)
-            if member.check_password(password):
+            valid, rehashed = password_hashing.verify_password(
+                password, member.password
+            )
+            if valid:
+                if rehashed:
+                    # The hasher settings changed since this hash was made
+                    Member.objects.filter(
+                        pk=member.pk, password=member.password
+                    ).update(password=rehashed)
                 token = TokenStorage.create_token(member)
                 user_data = {
                     'id': member.id,
@@ -90,6 +136,8 @@ class LoginView(APIView):
                 {'error': 'Invalid username or password'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
+        except PasswordHashingBusy:
+            return hashing_busy_response()
 
 
 class ProfileView(APIView):
@@ -107,13 +155,38 @@ class ProfileView(APIView):
             'id': member.id,
             'username': member.username
         }
-        return Response(user_data, status=status.HTTP_200_OK)
+        return json_response(user_data, status=status.HTTP_200_OK)
 
 
-class MessageListCreateView(APIView):
+class OnlineMembersView(APIView):
+    """
+    Members online now, i.e. with a request within
+    PRESENCE['ONLINE_WINDOW'] seconds.
+    GET /api/members/online/?limit=<n> - Get their number and the most
+    recently seen of them, newest first
+    Requires authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = MessageKeysetPagination().get_limit(request)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return json_response(online_members(limit), status=status.HTTP_200_OK)
+
+
+class MessageListCreateView(FeedViewMixin, APIView):
     """
     List all messages or create a new message.
-    GET /api/messages/ - Get all messages sorted by created_at
+    GET /api/messages/ - Get the latest page of messages sorted by created_at
+    GET /api/messages/?before=<cursor> - Get the page of older messages
+    GET /api/messages/?after_id=<id> - Get only messages newer than <id>
+    GET requests carry an ETag and answer 304 when nothing was posted since.
     POST /api/messages/ - Create a new message
     Both require authentication.
     """
@@ -121,34 +194,456 @@ class MessageListCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Get all messages with user data, sorted by created_at"""
-        messages = Message.objects.select_related('member').all().order_by('created_at')
-        
-        messages_data = []
-        for message in messages:
-            messages_data.append({
-                'id': message.id,
-                'text': message.text,
-                'author': message.member.username,
-                'created_at': message.created_at.isoformat()
-            })
-        
-        return Response(messages_data, status=status.HTTP_200_OK)
+        """
+        Get a page of messages with user data, sorted by created_at.
+        Without parameters the latest page is returned together with a cursor
+        for older history (?before=<cursor>). With ?after_id=<id> only
+        messages newer than the given id are returned as a plain list, so
+        polling clients fetch just what they have not seen yet.
+        Rows are rendered through api.rendering, without model instances or
+        DRF renderers.
+        """
+        if settings.RECENT_MESSAGES['ENABLED']:
+            response = self.get_recent(request)
+            if response is not None:
+                return response
+
+        # SQLite answers MAX(id) from the end of the primary key
+        last_id = Message.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        etag = self.feed_etag(last_id)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self.add_feed_cache_headers(not_modified, etag)
+
+        pagination = MessageKeysetPagination()
+        rows = message_rows(Message.objects.all())
+
+        try:
+            limit, after_id = self.get_feed_params(request)
+            if after_id is None:
+                rows, next_cursor = pagination.paginate_queryset(rows, request)
+            else:
+                rows = pagination.get_delta(after_id, limit)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid pagination parameters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if after_id is not None:
+            read_positions.mark_read(
+                request.user.id, fetched_position(after_id, last_id)
+            )
+        elif rows and not request.query_params.get('before'):
+            read_positions.mark_read(
+                request.user.id, max(row[ROW_ID] for row in rows)
+            )
+
+        messages_data = message_dicts(rows)
+
+        if after_id is not None:
+            response = json_response(messages_data, status=status.HTTP_200_OK)
+        else:
+            response = json_response(
+                {
+                    'results': messages_data,
+                    'next_cursor': next_cursor
+                },
+                status=status.HTTP_200_OK
+            )
+        return self.add_feed_cache_headers(response, etag)
+
+    def get_recent(self, request):
+        """
+        Answer the latest page and ?after_id= deltas from the ring of recent
+        messages shared by all workers, without querying the database.
+        Returns None for requests the ring cannot answer: older pages,
+        invalid parameters or ids that are no longer in the ring.
+        """
+        if request.query_params.get('before'):
+            return None
+
+        try:
+            limit, after_id = self.get_feed_params(request)
+        except ValueError:
+            return None
+
+        if after_id is None:
+            result = recent_messages.page(limit)
+        else:
+            result = recent_messages.delta(after_id, limit)
+        if result is None:
+            return None
+
+        last_id, body = result
+        # The client has everything up to after_id, the latest page ends
+        # with the newest message
+        read_positions.mark_read(
+            request.user.id, fetched_position(after_id, last_id)
+        )
+        etag = self.feed_etag(last_id)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self.add_feed_cache_headers(not_modified, etag)
+        return self.add_feed_cache_headers(raw_json_response(body), etag)
 
     def post(self, request):
         """Create a new message for authenticated user"""
         serializer = MessageCreateSerializer(data=request.data)
         if serializer.is_valid():
-            message = serializer.save(member=request.user)
-            response_data = {
-                'id': message.id,
-                'text': message.text,
-                'author': message.member.username,
-                'created_at': message.created_at.isoformat()
-            }
+            response_data = create_message(
+                request.user, serializer.validated_data['text']
+            )
             return Response(response_data, status=status.HTTP_201_CREATED)
         
         return Response(
             {'error': 'Message text is required'},
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class MessageWaitView(MessageWaitMixin, APIView):
+    """
+    Long-poll for new messages.
+    GET /api/messages/wait/?after_id=<id>&timeout=<seconds>
+    Responds as soon as messages newer than <id> exist, or with an empty
+    list once the timeout (25s by default, at most 60s) has passed.
+    Requires authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            after_id, timeout, limit = self.get_wait_params(request)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid after_id or timeout'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        has_new = message_notifier.wait(after_id, timeout)
+        read_positions.mark_read(
+            request.user.id,
+            fetched_position(after_id, message_notifier.last_id)
+        )
+        if not has_new:
+            return json_response([], status=status.HTTP_200_OK)
+
+        if settings.RECENT_MESSAGES['ENABLED']:
+            result = recent_messages.delta(after_id, limit)
+            if result is not None:
+                return set_snapshot_key(
+                    raw_json_response(result[1], status=status.HTTP_200_OK),
+                    'messages-delta', result[0], after_id, limit
+                )
+
+        rows = MessageKeysetPagination().get_delta(after_id, limit)
+
+        return json_response(message_dicts(rows), status=status.HTTP_200_OK)
+
+
+class MessageExportView(APIView):
+    """
+    Download the whole message history, oldest first.
+    GET /api/messages/export/?output=ndjson|json
+    The response is streamed while it is read from the database, so memory
+    use stays constant however long the history is.
+    Requires authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            export = MessageExport(request.query_params.get('output', 'ndjson'))
+        except ValueError:
+            return Response(
+                {'error': 'output must be ndjson or json'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            export.iter_bytes(), content_type=export.content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{export.filename}"'
+        )
+        return response
+
+
+class MessageSearchView(APIView):
+    """
+    Full-text search over the message history.
+    GET /api/messages/search/?q=<words>&cursor=<cursor>&limit=<n>
+    Returns the best matching messages first, each with a snippet of its
+    text where the matched words are highlighted, and the cursor of the next
+    page of matches.
+    Requires authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            search = MessageSearch(request.query_params.get('q'))
+        except ValueError:
+            return Response(
+                {'error': 'Search query is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = MessageKeysetPagination().get_limit(request)
+            rows, next_cursor = search.search(
+                limit, request.query_params.get('cursor')
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid pagination parameters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return json_response(
+            {
+                'results': search.result_dicts(rows),
+                'next_cursor': next_cursor
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class UnreadCountView(APIView):
+    """
+    Unread counts of the authenticated member.
+    GET /api/messages/unread/ - Get the member's position in the global
+    feed, the number of messages newer than it and the unread count of
+    every joined room
+    Requires authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return json_response(
+            unread_counts(request.user), status=status.HTTP_200_OK
+        )
+
+
+class MessageReadView(APIView):
+    """
+    Acknowledge the global feed up to a message.
+    POST /api/messages/read/ - Mark the messages up to last_read_id as read
+    and return the unread counts. Positions never move back.
+    Requires authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = ReadCursorSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {'error': 'A non-negative last_read_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Positions past the newest message would hide future messages
+        last_id = Message.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        read_positions.mark_read(
+            request.user.id,
+            min(serializer.validated_data['last_read_id'], last_id),
+            flush=True
+        )
+        return json_response(
+            unread_counts(request.user), status=status.HTTP_200_OK
+        )
+
+
+class RoomListView(APIView):
+    """
+    List the rooms of the authenticated member or join a room.
+    GET /api/rooms/ - Get the rooms the member has joined, by name
+    POST /api/rooms/ - Join the room with the given name, creating it if
+    it does not exist yet
+    Both require authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        rooms = Room.objects.filter(memberships__member=request.user)
+        return Response(
+            RoomSerializer(rooms, many=True).data, status=status.HTTP_200_OK
+        )
+
+    def post(self, request):
+        serializer = RoomJoinSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {'error': 'Room name is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        room, created = Room.objects.get_or_create(
+            name=serializer.validated_data['name'],
+            defaults={'created_by': request.user}
+        )
+        RoomMembership.objects.get_or_create(room=room, member=request.user)
+        return Response(
+            RoomSerializer(room).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class RoomLeaveView(APIView):
+    """
+    Leave a room.
+    POST /api/rooms/<room_id>/leave/
+    Requires authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, room_id):
+        deleted, _ = RoomMembership.objects.filter(
+            room_id=room_id, member=request.user
+        ).delete()
+        if not deleted:
+            return Response(
+                {'error': 'Not a member of this room'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RoomReadView(APIView):
+    """
+    Acknowledge a room up to a message.
+    POST /api/rooms/<room_id>/read/ - Mark the room's messages up to
+    last_read_id as read and return the unread counts. Positions never move
+    back.
+    Requires authentication and membership of the room.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, room_id):
+        feed = RoomFeed(room_id, request.user)
+        try:
+            feed.get_last_message_id()
+        except (Room.DoesNotExist, RoomAccessDenied) as exc:
+            return room_access_error(exc, Response)
+
+        serializer = ReadCursorSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {'error': 'A non-negative last_read_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        read_positions.mark_room_read(
+            room_id, request.user.id,
+            feed.get_seq(serializer.validated_data['last_read_id']),
+            flush=True
+        )
+        return json_response(
+            unread_counts(request.user), status=status.HTTP_200_OK
+        )
+
+
+class RoomMessageListCreateView(FeedViewMixin, APIView):
+    """
+    The message feed of one room, with the query parameters, ETag handling
+    and response format of MessageListCreateView.
+    GET /api/rooms/<room_id>/messages/ - Get the latest page of the room
+    GET /api/rooms/<room_id>/messages/?before=<cursor> - Get older messages
+    GET /api/rooms/<room_id>/messages/?after_id=<id> - Get newer messages
+    POST /api/rooms/<room_id>/messages/ - Post a message to the room
+    Both require authentication and membership of the room.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, room_id):
+        feed = RoomFeed(room_id, request.user)
+        try:
+            last_id = feed.get_last_message_id()
+        except (Room.DoesNotExist, RoomAccessDenied) as exc:
+            return room_access_error(exc, Response)
+
+        etag = feed.etag(last_id)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return self.add_feed_cache_headers(not_modified, etag)
+
+        pagination = RoomMessagePagination(room_id)
+
+        try:
+            limit, after_id = self.get_feed_params(request)
+            if after_id is not None:
+                # Nothing newer than the room's newest message to read
+                rows = []
+                if after_id < last_id:
+                    rows = pagination.get_delta(after_id, limit)
+                feed.mark_delta_read(rows, limit)
+                body = json_bytes(message_dicts(rows))
+            elif request.query_params.get('before'):
+                body = self.render_page(pagination, feed, request)
+            else:
+                feed.mark_read()
+                body = feed.get_cached_page(last_id, limit)
+                if body is None:
+                    body = self.render_page(pagination, feed, request)
+                    feed.cache_page(last_id, limit, body)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid pagination parameters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return self.add_feed_cache_headers(raw_json_response(body), etag)
+
+    def render_page(self, pagination, feed, request):
+        rows = message_rows(RoomMessage.objects.filter(room_id=feed.room_id))
+        rows, next_cursor = pagination.paginate_queryset(rows, request)
+        return json_bytes({
+            'results': message_dicts(rows),
+            'next_cursor': next_cursor
+        })
+
+    def post(self, request, room_id):
+        feed = RoomFeed(room_id, request.user)
+        try:
+            feed.get_last_message_id()
+        except (Room.DoesNotExist, RoomAccessDenied) as exc:
+            return room_access_error(exc, Response)
+
+        serializer = MessageCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {'error': 'Message text is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        message = feed.post(serializer.validated_data['text'])
+        return Response(
+            created_message_data(message), status=status.HTTP_201_CREATED
+        )
+
+
+class MetricsView(APIView):
+    """
+    Request timing histograms per URL name, aggregated over all workers.
+    GET /api/metrics/
+    Served in the Prometheus text exposition format.
+    Requires authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return HttpResponse(
+            histograms.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+from urllib.parse import quote
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -79,6 +80,134 @@ REST_FRAMEWORK = {
         "api.authentication.TokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.rendering.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+# Authentication token storage (see api/token_backends.py)
+# DatabaseTokenBackend shares tokens between gunicorn workers through the
+# member_tokens table; lookups are served from a per-process LRU cache whose
+# entries are re-checked against the database after CACHE_TTL seconds.
+TOKEN_STORAGE = {
+    "BACKEND": "api.token_backends.DatabaseTokenBackend",
+    "TTL": 60 * 60 * 24 * 7,
+    "CACHE_SIZE": 10000,
+    "CACHE_TTL": 60,
+    "SWEEP_INTERVAL": 60 * 10,
+}
+
+# Per-process cache of members resolved by TokenAuthentication
+MEMBER_CACHE = {
+    "SIZE": 10000,
+    "TTL": 60,
+}
+
+# Online presence (see api/presence.py)
+# Authenticated requests record the member's request time in an array shared
+# by all gunicorn workers, 4 bytes per member id below MAX_MEMBER_ID; higher
+# ids are not tracked. Members seen within ONLINE_WINDOW seconds are online.
+# members.last_seen_at is written by one worker at most once per
+# FLUSH_INTERVAL seconds.
+PRESENCE = {
+    "ENABLED": os.environ.get("DJANGO_PRESENCE", "1") == "1",
+    "MAX_MEMBER_ID": 1 << 20,
+    "ONLINE_WINDOW": 60,
+    "FLUSH_INTERVAL": 60,
+}
+
+# Group commit for POST /api/messages/ (see api/batching.py)
+# When enabled, messages posted concurrently within WINDOW_MS in the same
+# worker are inserted in one transaction. Each batch waits up to WINDOW_MS
+# before committing, so this trades a little latency for write throughput.
+MESSAGE_WRITE_BATCHING = {
+    "ENABLED": os.environ.get("DJANGO_MESSAGE_BATCHING") == "1",
+    "WINDOW_MS": 5,
+    "MAX_SIZE": 100,
+}
+
+# Newest messages kept pre-rendered in memory shared by all gunicorn workers
+# (see api/recent_messages.py). The latest feed page and ?after_id= deltas
+# inside the last SIZE ids are answered without querying the database.
+# Messages whose JSON exceeds SLOT_SIZE bytes are always read from SQLite.
+RECENT_MESSAGES = {
+    "ENABLED": os.environ.get("DJANGO_RECENT_MESSAGES", "1") == "1",
+    "SIZE": 1024,
+    "SLOT_SIZE": 2048,
+}
+
+# Room feeds (see api/rooms.py)
+# Each process keeps up to PAGE_CACHE_SIZE rendered latest pages of room
+# feeds, keyed by the room's newest message id so they never go stale.
+ROOMS = {
+    "PAGE_CACHE_SIZE": 1000,
+}
+
+# Read positions and unread counts (see api/read_cursors.py)
+# Positions advanced by fetching the feed are buffered per process and
+# written at most once per FLUSH_INTERVAL seconds; explicit acknowledgements
+# are written immediately.
+READ_CURSORS = {
+    "FLUSH_INTERVAL": float(os.environ.get("DJANGO_READ_CURSOR_FLUSH_INTERVAL", "1")),
+}
+
+# Retention of old messages (see api/archive.py)
+# Messages older than RETENTION_DAYS are moved out of the messages table
+# into gzip compressed segments of SEGMENT_SIZE messages under PATH, which
+# the history API and the export read back transparently. Run
+# `manage.py archive_messages --interval INTERVAL` to archive periodically.
+# CACHE_SIZE is the number of parsed segments each process keeps in memory.
+MESSAGE_ARCHIVE = {
+    "PATH": os.environ.get(
+        "DJANGO_ARCHIVE_PATH", str(BASE_DIR / "persistent" / "archive")
+    ),
+    "RETENTION_DAYS": int(os.environ.get("DJANGO_RETENTION_DAYS", "30")),
+    "SEGMENT_SIZE": 10000,
+    "INTERVAL": 60 * 60,
+    "CACHE_SIZE": 16,
+}
+
+# Per-request instrumentation (see api/instrumentation.py)
+# Set DJANGO_REQUEST_LOG_LEVEL=INFO to log every request as one JSON line on
+# the api.requests logger, with its database, authentication, hashing and
+# serialization timings. It is off by default so logs do not grow by a line
+# per request; the Server-Timing header and the histograms served on
+# /api/metrics/ are kept either way.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api.requests": {
+            "handlers": ["console"],
+            "level": os.environ.get("DJANGO_REQUEST_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
+}
+
+# Requests under PREFIX skip the session, CSRF, authentication and messages
+# middleware, which only the admin uses; the API authenticates by token.
+# Set DJANGO_LEAN_API_MIDDLEWARE=0 to run every request through them.
+LEAN_API_MIDDLEWARE = {
+    "ENABLED": os.environ.get("DJANGO_LEAN_API_MIDDLEWARE", "1") == "1",
+    "PREFIX": "/api/",
+}
+
+# Compression of API responses (see api/compression.py)
+# API bodies of at least MIN_SIZE bytes are sent gzip compressed, or brotli
+# compressed when the optional brotli package is installed. Compressed feed
+# snapshots are cached per process, CACHE_SIZE entries, until a new message
+# changes them. Set DJANGO_RESPONSE_COMPRESSION=0 to send plain bodies.
+RESPONSE_COMPRESSION = {
+    "ENABLED": os.environ.get("DJANGO_RESPONSE_COMPRESSION", "1") == "1",
+    "MIN_SIZE": 512,
+    "GZIP_LEVEL": 6,
+    "BROTLI_QUALITY": 5,
+    "CACHE_SIZE": 256,
 }
 
 # drf-spectacular configuration
@@ -90,12 +219,19 @@ SPECTACULAR_SETTINGS = {
 }
 
 MIDDLEWARE = [
+    # First, so the timings it reports cover the whole stack
+    "api.instrumentation.InstrumentationMiddleware",
+    "api.compression.CompressionMiddleware",
+    # Reads of GET and HEAD requests use the read-only database alias
+    "api.routers.ReadOnlyRequestMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    # Session, CSRF, authentication and messages are skipped for /api/
+    # requests when LEAN_API_MIDDLEWARE is enabled (see api/middleware.py)
+    "api.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
+    "api.middleware.CsrfViewMiddleware",
+    "api.middleware.AuthenticationMiddleware",
+    "api.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -117,18 +253,119 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
+
+# Serve the hot API endpoints with async views (set by config/asgi.py)
+ASYNC_API = os.environ.get("DJANGO_ASYNC_API") == "1"
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuning, applied by init_command to every new connection.
+# - journal_mode=WAL lets readers run while a write is in progress. It adds
+#   db.sqlite3-wal/-shm files next to the database, which must stay on a
+#   local filesystem together with it.
+# - synchronous=NORMAL only fsyncs at WAL checkpoints. Committed data
+#   survives an application crash, but the last transactions can be lost
+#   on power failure or an OS crash. Set SQLITE_SYNCHRONOUS=full to fsync
+#   every commit.
+# - busy_timeout makes a connection wait for the write lock instead of
+#   failing immediately with "database is locked".
+# - cache_size (negative = KiB) and mmap_size (bytes) keep the hot pages in
+#   memory; temp_store keeps sort/temporary tables off disk.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "wal"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "normal"),
+    "busy_timeout": 5000,
+    "cache_size": -20000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "memory",
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "persistent" / "db" / "db.sqlite3",
+        "NAME": os.environ.get(
+            "DJANGO_DB_PATH", BASE_DIR / "persistent" / "db" / "db.sqlite3"
+        ),
+        # Keep connections open between requests instead of reconnecting
+        # (and re-running the pragmas) for every request. Not under ASGI,
+        # where Django advises against persistent connections: async views
+        # query from sync_to_async threads, and the per-request cleanup
+        # does not close the connections opened there.
+        "CONN_MAX_AGE": int(
+            os.environ.get("DJANGO_CONN_MAX_AGE", 0 if ASYNC_API else 600)
+        ),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": "".join(
+                f"PRAGMA {name}={value};" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            # Take the write lock when a transaction starts, so concurrent
+            # writers wait on busy_timeout instead of failing on lock upgrade
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
+# Read-only connections for GET and HEAD requests (see api/routers.py)
+# Reads of safe API requests go to the READ_ALIAS database: the same file
+# opened with mode=ro and query_only, from a pool of POOL_SIZE connections
+# per worker process. A request that finds every connection in use for
+# POOL_TIMEOUT seconds fails with OperationalError. Writes, and reads inside
+# transactions, stay on the default database. Set DJANGO_READ_ONLY_DB=0 to
+# send everything there.
+READ_ONLY_DATABASE = {
+    "ENABLED": os.environ.get("DJANGO_READ_ONLY_DB", "1") == "1",
+    "READ_ALIAS": "readonly",
+    "POOL_SIZE": int(os.environ.get("DJANGO_READ_POOL_SIZE", "8")),
+    "POOL_TIMEOUT": 5,
+}
+
+DATABASES[READ_ONLY_DATABASE["READ_ALIAS"]] = {
+    "ENGINE": "api.db_backends.sqlite_pool",
+    "NAME": "file:{}?mode=ro".format(quote(str(DATABASES["default"]["NAME"]))),
+    # Connections go back to the pool at the end of every request
+    "CONN_MAX_AGE": 0,
+    "OPTIONS": {
+        # journal_mode and synchronous are properties of the writer
+        "init_command": "".join(
+            f"PRAGMA {name}={value};"
+            for name, value in SQLITE_PRAGMAS.items()
+            if name not in ("journal_mode", "synchronous")
+        ) + "PRAGMA query_only=1;",
+        "pool_size": READ_ONLY_DATABASE["POOL_SIZE"],
+        "pool_timeout": READ_ONLY_DATABASE["POOL_TIMEOUT"],
+    },
+    "TEST": {"MIRROR": "default"},
+}
+
+DATABASE_ROUTERS = ["api.routers.ReadOnlyRouter"]
+
+
+# Password hashing (see api/passwords.py)
+# Passwords are hashed with PBKDF2 at ITERATIONS rounds; hashes stored with
+# another count are upgraded on the next login. Each process hashes at most
+# WORKERS passwords at a time with up to QUEUE_SIZE more requests waiting;
+# beyond that login and registration answer 503 with Retry-After:
+# RETRY_AFTER seconds. WORKERS=0 hashes inline on the request thread.
+PASSWORD_HASHING = {
+    "ITERATIONS": int(os.environ.get("DJANGO_PASSWORD_ITERATIONS", "1000000")),
+    "WORKERS": int(os.environ.get("DJANGO_PASSWORD_HASHING_WORKERS", "1")),
+    "QUEUE_SIZE": 8,
+    "RETRY_AFTER": 1,
+}
+
+# Django's defaults, with PBKDF2 replaced by the configurable subclass
+PASSWORD_HASHERS = [
+    "api.passwords.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
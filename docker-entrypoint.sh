@@ -3,11 +3,10 @@ set -euxo pipefail
 
 echo "==> Django Pre-Start Script"
 
-# Remove existing database for fresh start on each deploy
-echo "==> Removing existing database..."
+# The database is kept across deploys; old messages are moved into
+# /app/persistent/archive by the archiver program (see supervisord.conf)
 if [ -f "/app/persistent/db/db.sqlite3" ]; then
-    rm -f /app/persistent/db/db.sqlite3
-    echo "==> Database removed successfully"
+    echo "==> Using existing database"
 else
     echo "==> No existing database found, creating new one"
 fi
@@ -15,6 +14,7 @@ fi
 # Create persistent dirs
 /bin/mkdir -p /app/persistent/db
 /bin/mkdir -p /app/persistent/media
+/bin/mkdir -p /app/persistent/archive
 
 # Run migrations
 echo "==> Running database migrations..."
@@ -4,8 +4,11 @@
 bind = "127.0.0.1:8001"
 
 # Worker processes
+# Threaded workers keep long-polling clients (/api/messages/wait/) parked on
+# a cheap thread instead of blocking a whole process per connection.
 workers = 2
-worker_class = "sync"
+worker_class = "gthread"
+threads = 64
 worker_connections = 1000
 max_requests = 10000
 max_requests_jitter = 1000
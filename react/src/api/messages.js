@@ -1,12 +1,40 @@
 import instance from './axiosInterceptors';
 
 /**
- * Get all chat messages
- * @returns {Promise<Array<{id: number, username: string, text: string, timestamp: string}>>} Response with array of messages
+ * Get a page of chat history, newest page first
+ * @param {string} [before] - Cursor returned as next_cursor by the previous page
+ * @returns {Promise<{results: Array<{id: number, author: string, text: string, created_at: string}>, next_cursor: string|null}>} Page of messages and cursor for older history
  * @throws {Error} If authentication fails or request is invalid
  */
-export const getMessages = async () => {
-  const response = await instance.get('/api/messages/');
+export const getMessageHistory = async (before) => {
+  const params = before ? { before } : undefined;
+  const response = await instance.get('/api/messages/', { params });
+  return response.data;
+};
+
+/**
+ * Get chat messages newer than the last one already loaded
+ * @param {number} afterId - Only return messages with id greater than this one
+ * @returns {Promise<Array<{id: number, author: string, text: string, created_at: string}>>} Response with array of messages
+ * @throws {Error} If authentication fails or request is invalid
+ */
+export const getMessages = async (afterId) => {
+  const response = await instance.get('/api/messages/', {
+    params: { after_id: afterId },
+  });
+  return response.data;
+};
+
+/**
+ * Wait for messages newer than the last one already loaded (long-poll)
+ * @param {number} afterId - Only return messages with id greater than this one
+ * @returns {Promise<Array<{id: number, author: string, text: string, created_at: string}>>} New messages, empty if none arrived before the server timeout
+ * @throws {Error} If authentication fails or request is invalid
+ */
+export const waitForMessages = async (afterId) => {
+  const response = await instance.get('/api/messages/wait/', {
+    params: { after_id: afterId },
+  });
   return response.data;
 };
 
@@ -1,17 +1,31 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { getMessages, sendMessage } from '../../api/messages';
+import {
+  getMessageHistory,
+  getMessages,
+  sendMessage,
+  waitForMessages,
+} from '../../api/messages';
 import './styles.css';
 
+const RETRY_DELAY = 3000;
+
+const delay = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 const Chat = () => {
   const [messages, setMessages] = useState([]);
   const [messageText, setMessageText] = useState('');
   const [loading, setLoading] = useState(true);
   const [sending, setSending] = useState(false);
   const [error, setError] = useState('');
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const messagesEndRef = useRef(null);
+  const messagesContainerRef = useRef(null);
+  const olderCursorRef = useRef(null);
+  const prependedHeightRef = useRef(null);
   const navigate = useNavigate();
-  const intervalRef = useRef(null);
+  const lastIdRef = useRef(0);
+  const historyLoadedRef = useRef(false);
 
   useEffect(() => {
     const token = localStorage.getItem('token');
@@ -20,20 +34,52 @@ const Chat = () => {
       return;
     }
 
-    loadMessages();
+    let active = true;
 
-    intervalRef.current = setInterval(() => {
-      loadMessages(true);
-    }, 3000);
+    const listen = async () => {
+      await loadMessages();
+      while (active) {
+        if (!historyLoadedRef.current) {
+          await loadMessages(true);
+          if (!historyLoadedRef.current) {
+            await delay(RETRY_DELAY);
+          }
+          continue;
+        }
 
-    return () => {
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current);
+        try {
+          // The server holds the request open until new messages arrive
+          const data = await waitForMessages(lastIdRef.current);
+          if (active) {
+            appendMessages(data);
+          }
+        } catch (error) {
+          console.error('Error waiting for messages:', error);
+          if (error.response && error.response.status === 401) {
+            localStorage.removeItem('token');
+            navigate('/login');
+            return;
+          }
+          await delay(RETRY_DELAY);
+        }
       }
     };
+
+    listen();
+
+    return () => {
+      active = false;
+    };
   }, [navigate]);
 
   useEffect(() => {
+    const container = messagesContainerRef.current;
+    if (prependedHeightRef.current !== null && container) {
+      // Older history was added above, keep the visible messages in place
+      container.scrollTop = container.scrollHeight - prependedHeightRef.current;
+      prependedHeightRef.current = null;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -41,14 +87,38 @@ const Chat = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
 
+  const appendMessages = (data) => {
+    if (!data || data.length === 0) {
+      return;
+    }
+    lastIdRef.current = Math.max(lastIdRef.current, data[data.length - 1].id);
+    // Long-polls and sends can overlap, so only append what is not shown yet
+    setMessages((prev) => {
+      const shownId = prev.length > 0 ? prev[prev.length - 1].id : 0;
+      return [...prev, ...data.filter((message) => message.id > shownId)];
+    });
+  };
+
   const loadMessages = async (silent = false) => {
     try {
       if (!silent) {
         setLoading(true);
       }
       setError('');
-      const data = await getMessages();
-      setMessages(data || []);
+      if (!historyLoadedRef.current) {
+        const page = await getMessageHistory();
+        const results = page?.results || [];
+        olderCursorRef.current = page?.next_cursor || null;
+        if (results.length > 0) {
+          lastIdRef.current = results[results.length - 1].id;
+        }
+        setMessages(results);
+        historyLoadedRef.current = true;
+        return;
+      }
+
+      const data = await getMessages(lastIdRef.current);
+      appendMessages(data);
     } catch (error) {
       console.error('Error loading messages:', error);
       if (!silent) {
@@ -65,6 +135,33 @@ const Chat = () => {
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (loadingOlder || !olderCursorRef.current) {
+      return;
+    }
+
+    try {
+      setLoadingOlder(true);
+      const page = await getMessageHistory(olderCursorRef.current);
+      olderCursorRef.current = page?.next_cursor || null;
+      const results = page?.results || [];
+      if (results.length > 0) {
+        prependedHeightRef.current = messagesContainerRef.current?.scrollHeight ?? null;
+        setMessages((prev) => [...results, ...prev]);
+      }
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
+  const handleMessagesScroll = (e) => {
+    if (e.currentTarget.scrollTop === 0) {
+      loadOlderMessages();
+    }
+  };
+
   const handleSendMessage = async (e) => {
     e.preventDefault();
     
@@ -117,7 +214,14 @@ const Chat = () => {
         </div>
       </div>
 
-      <div className="chat-messages">
+      <div
+        className="chat-messages"
+        ref={messagesContainerRef}
+        onScroll={handleMessagesScroll}
+      >
+        {loadingOlder && (
+          <div className="chat-loading">Загрузка истории...</div>
+        )}
         {loading ? (
           <div className="chat-loading">Загрузка сообщений...</div>
         ) : error ? (